@@ -1,25 +1,163 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from typing import Dict, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db
+from database import AsyncSessionLocal
 from models import User
+from services.cluster import cluster
 
 SECRET_KEY = "your-secret-key-change-in-production-uptimeguard-ai-2024"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# "stateless" trusts signed uid/ver claims; "strict" looks the user up on every request
+AUTH_MODE = os.getenv("AUTH_MODE", "stateless")
+TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))
+PASSWORD_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("AUTH_HASH_MAX_PENDING", "64"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+AuthenticatedUser = namedtuple("AuthenticatedUser", ["id", "email", "token_version"])
+
+# passlib and jose are imported on first use, not at startup: a stamped database never
+# hashes a password while booting, and cached tokens are never decoded again
+_pwd_context = {"context": None}
+
+def get_pwd_context():
+    """The bcrypt CryptContext, created on first use"""
+    if _pwd_context["context"] is None:
+        from passlib.context import CryptContext
+        _pwd_context["context"] = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context["context"]
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of decoded, signature-checked tokens with a TTL per entry"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[AuthenticatedUser]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return user
+
+    def put(self, token: str, user: AuthenticatedUser, token_exp: float):
+        # Never cache past the token's own expiry
+        ttl = min(self.ttl_seconds, token_exp - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (user, time.monotonic() + ttl)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard_user(self, user_id: int):
+        with self._lock:
+            for token in [t for t, (user, _) in self._entries.items() if user.id == user_id]:
+                del self._entries[token]
+
+
+token_cache = VerifiedTokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS)
+# user id -> current token version; tokens carrying an older version are revoked
+token_versions: Dict[int, int] = {}
+
+def load_token_versions(db: Session):
+    """Prime the in-memory token versions at startup"""
+    token_versions.clear()
+    token_versions.update(db.execute(select(User.id, User.token_version)).all())
+
+async def revoke_user_tokens(db: AsyncSession, user_id: int) -> int:
+    """Invalidate every token issued to a user by bumping their token version"""
+    await db.execute(
+        update(User).where(User.id == user_id).values(token_version=User.token_version + 1)
+    )
+    await db.commit()
+    version = await db.scalar(select(User.token_version).where(User.id == user_id))
+    token_versions[user_id] = version
+    token_cache.discard_user(user_id)
+    if cluster.enabled:
+        # The other workers keep their own versions and token caches; sync_cluster() applies this there
+        await asyncio.to_thread(cluster.state.publish, {f"token_version:{user_id}": version})
+    return version
+
+def apply_token_version(user_id: int, version: int):
+    """Adopt a token version bumped by another worker"""
+    if version > token_versions.get(user_id, -1):
+        token_versions[user_id] = version
+        token_cache.discard_user(user_id)
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool so it never blocks the event loop.
+
+    At most max_pending hash operations may be running or queued; beyond
+    that callers get a 503 right away instead of piling up behind bcrypt.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many login attempts in progress, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    @property
+    def queue_depth(self) -> int:
+        """Operations waiting for a free worker"""
+        return max(0, self.pending - self.workers)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -28,26 +166,49 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email(db, email)
     if not user:
         return False
-    if not verify_password(password, user.password_hash):
+    if not await password_hasher.verify(password, user.password_hash):
         return False
     return user
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def create_user_token(user: User, expires_delta: Optional[timedelta] = None) -> str:
+    """Issue a token whose claims are enough to authorize without a user lookup"""
+    return create_access_token(
+        data={"sub": user.email, "uid": user.id, "ver": user.token_version or 0},
+        expires_delta=expires_delta,
+    )
+
+async def _lookup_user(email: str) -> Optional[AuthenticatedUser]:
+    async with AsyncSessionLocal() as db:
+        user = await get_user_by_email(db, email=email)
+    if user is None:
+        return None
+    token_versions[user.id] = user.token_version or 0
+    return AuthenticatedUser(user.id, user.email, user.token_version or 0)
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> AuthenticatedUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    strict = AUTH_MODE == "strict"
+    # Strict mode never trusts the cache: deletions and revocations by other processes apply at once
+    cached = None if strict else token_cache.get(token)
+    if cached is not None and token_versions.get(cached.id) == cached.token_version:
+        return cached
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -55,7 +216,21 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = get_user_by_email(db, email=email)
-    if user is None:
-        raise credentials_exception
+
+    # Tokens issued before the uid/ver claims existed count as version 0
+    user_id, version = payload.get("uid"), payload.get("ver", 0)
+    if strict or user_id is None:
+        user = await _lookup_user(email)
+        if user is None or user.token_version != version:
+            raise credentials_exception
+    else:
+        if user_id not in token_versions:
+            user = await _lookup_user(email)
+            if user is None or user.id != user_id:
+                raise credentials_exception
+        if token_versions[user_id] != version:
+            raise credentials_exception
+        user = AuthenticatedUser(user_id, email, version)
+    if not strict:
+        token_cache.put(token, user, payload["exp"])
     return user
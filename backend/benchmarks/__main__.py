@@ -0,0 +1,95 @@
+"""Latency and throughput benchmarks for the backend.
+
+Run from backend/ (needs requirements-dev.txt):
+
+    python -m benchmarks                           # in-process app on a throwaway database
+    python -m benchmarks --url http://localhost:8001
+    python -m benchmarks --save baseline.json
+    python -m benchmarks --baseline baseline.json  # exits 1 on regression
+"""
+import argparse
+import asyncio
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime
+
+
+def _isolate_environment(directory: str):
+    """Point the app at throwaway state; must run before anything imports database.py"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    os.environ["MAINTENANCE_SIGNAL_FILE"] = os.path.join(directory, "maintenance")
+    os.environ["RISK_MODEL_DIR"] = os.path.join(directory, "risk_models")
+    # The login scenario deliberately hammers one account from one client
+    os.environ.setdefault("LOGIN_ATTEMPTS_PER_IP", "1000000")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n")[0])
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("-c", "--concurrency", type=int, default=10)
+    parser.add_argument("-n", "--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--login-requests", type=int, default=50, help="requests for the bcrypt-bound login")
+    parser.add_argument("--scenarios", default="metrics_live,incidents,maintenance,login,update_risk",
+                        help="comma-separated subset of endpoints to drive")
+    parser.add_argument("--skip-http", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--save", metavar="PATH", help="write results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+
+    workdir = None
+    if not args.url:
+        workdir = tempfile.TemporaryDirectory(prefix="uptimeguard-bench-")
+        _isolate_environment(workdir.name)
+
+    from benchmarks import http_bench, micro_bench, report
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in http_bench.SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(http_bench.SCENARIOS)})")
+
+    results = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "target": args.url or "in-process",
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+        },
+    }
+    try:
+        # Micro-benchmarks first, before the app's worker threads exist
+        if not args.skip_micro:
+            results["micro"] = micro_bench.run()
+        if not args.skip_http:
+            results["http"] = asyncio.run(http_bench.run(
+                scenarios, requests=args.requests, login_requests=args.login_requests,
+                concurrency=args.concurrency, url=args.url,
+            ))
+    finally:
+        if workdir is not None:
+            workdir.cleanup()
+
+    report.print_table(results)
+    if args.save:
+        report.save(results, args.save)
+        print(f"\n✅ Results saved to {args.save}")
+    if args.baseline:
+        regressions = report.compare(results, report.load(args.baseline), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\n✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
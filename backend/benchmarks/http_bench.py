@@ -0,0 +1,101 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+import httpx
+from benchmarks.micro_bench import UPDATE
+from benchmarks.report import summarize
+
+ADMIN = {"email": "admin@uptimeguard.ai", "password": "admin123"}
+# name -> (method, path, JSON body, needs a bearer token)
+SCENARIOS = {
+    "metrics_live": ("GET", "/metrics/live", None, False),
+    "incidents": ("GET", "/incidents?limit=50", None, False),
+    "maintenance": ("GET", "/maintenance", None, False),
+    "login": ("POST", "/auth/login", ADMIN, False),
+    "update_risk": ("POST", "/predict/update-risk", UPDATE, True),
+}
+SEED_INCIDENTS = 1000
+WARMUP_REQUESTS = 10
+
+
+def seed_incidents(count: int = SEED_INCIDENTS, seed: int = 1234):
+    """Give the in-process database a realistic incidents table to page through"""
+    from sqlalchemy import insert
+    from database import SessionLocal
+    from models import Incident
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    rows = [
+        {
+            "timestamp": now - timedelta(minutes=rng.uniform(0, 60 * 24 * 30)),
+            "severity": rng.choice(["low", "medium", "high", "critical"]),
+            "message": f"Benchmark incident {i}",
+            "status": rng.choice(["active", "resolved"]),
+        }
+        for i in range(count)
+    ]
+    db = SessionLocal()
+    try:
+        db.execute(insert(Incident), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run_scenario(client: httpx.AsyncClient, method: str, path: str, body: Optional[dict],
+                       headers: Dict[str, str], requests: int, concurrency: int) -> dict:
+    for _ in range(WARMUP_REQUESTS):
+        await client.request(method, path, json=body, headers=headers)
+
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        # Workers share one iterator, so exactly `requests` calls are made in total
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def _run_all(client: httpx.AsyncClient, scenarios: Iterable[str], requests: int,
+                   login_requests: int, concurrency: int) -> Dict[str, dict]:
+    response = await client.post("/auth/login", json=ADMIN)
+    response.raise_for_status()
+    auth = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    results = {}
+    for name in scenarios:
+        method, path, body, needs_auth = SCENARIOS[name]
+        count = login_requests if name == "login" else requests
+        results[name] = await run_scenario(
+            client, method, path, body, auth if needs_auth else {}, count, concurrency
+        )
+    return results
+
+
+async def run(scenarios: Iterable[str], requests: int = 500, login_requests: int = 50,
+              concurrency: int = 10, url: Optional[str] = None) -> Dict[str, dict]:
+    """Benchmark a server at url, or the app in-process (with its lifespan) when url is None"""
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+            return await _run_all(client, scenarios, requests, login_requests, concurrency)
+
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        seed_incidents()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await _run_all(client, scenarios, requests, login_requests, concurrency)
@@ -0,0 +1,102 @@
+import random
+import timeit
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from schemas import IncidentResponse, MetricsResponse
+from services import fast_json
+from services.metrics_simulator import MetricsSimulator
+from services.risk_predictor import RiskPredictor
+from services.scenario_replay import Scenario, replay
+
+UPDATE = {
+    "update_title": "Payments schema rollout",
+    "update_type": "major",
+    "services_affected": ["payments", "api", "web", "worker"],
+    "db_migration": True,
+    "expected_minutes": 25,
+    "description": "Schema migration and refactor of the payments ledger",
+}
+
+
+def _measure(fn: Callable[[], object], min_time: float, repeat: int) -> dict:
+    """Best-of-repeat time per call, with the loop count sized to run at least min_time"""
+    timer = timeit.Timer(fn)
+    calls = 1
+    while timer.timeit(calls) < min_time:
+        calls *= 2
+    best = min(timer.repeat(repeat=repeat, number=calls))
+    return {"calls": calls, "per_call_us": round(1e6 * best / calls, 3)}
+
+
+def incident_rows(count: int = 50, seed: int = 1234) -> List[tuple]:
+    """Rows shaped like the incidents list query: IncidentResponse's fields, in order"""
+    rng = random.Random(seed)
+    now = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        opened = now - timedelta(seconds=rng.randint(0, 86400), microseconds=rng.choice([0, rng.randint(1, 999999)]))
+        last_seen = opened + timedelta(minutes=rng.randint(0, 30))
+        resolved = rng.random() < 0.5
+        rows.append((
+            i, opened, rng.choice(["low", "medium", "high", "critical"]),
+            f"Error rate spike detected: {rng.uniform(0, 50):.2f}% ✓", "resolved" if resolved else "active",
+            rng.randint(1, 20), last_seen, last_seen + timedelta(minutes=10) if resolved else None,
+        ))
+    return rows
+
+
+def _pydantic_body(model, rows) -> bytes:
+    """What FastAPI returns for a response_model endpoint: validate, encode, json.dumps"""
+    return JSONResponse(jsonable_encoder([model(**row) for row in rows])).body
+
+
+def check_json_compatibility(seed: int = 1234):
+    """Raise if the fast encoding paths would change a single response byte"""
+    fields = tuple(IncidentResponse.model_fields)
+    incidents = [dict(zip(fields, row)) for row in incident_rows(500, seed)]
+    simulator = MetricsSimulator()
+    metrics = [simulator.generate_metrics(maintenance_enabled=i % 7 == 0) for i in range(500)]
+    # Floats json.dumps prints in exponent form, where orjson would differ
+    metrics += [dict(metrics[0], cpu=value) for value in (1e-05, 1.5e16, 0.0001, 9.999e15, 0.0, -0.0)]
+
+    for model, rows in ((IncidentResponse, incidents), (MetricsResponse, metrics)):
+        expected = _pydantic_body(model, rows)
+        plain = [model(**row).model_dump() for row in rows]
+        for name, body in (("render_json", fast_json.render_json(plain)), ("dumps", fast_json.dumps(plain))):
+            if body != expected:
+                raise AssertionError(f"{name} output differs from the {model.__name__} response")
+        if fast_json.orjson is None:
+            continue
+        # Wherever the guard lets orjson through, its bytes must match exactly
+        for row, item in zip(rows, plain):
+            if not fast_json._orjson_compatible(item):
+                continue
+            if fast_json.orjson.dumps(item, option=fast_json.orjson.OPT_UTC_Z) != _pydantic_body(model, [row])[1:-1]:
+                raise AssertionError(f"orjson output differs from the {model.__name__} response for {row}")
+
+
+def run(min_time: float = 0.2, repeat: int = 5, seed: int = 1234) -> Dict[str, dict]:
+    check_json_compatibility(seed)
+    simulator = MetricsSimulator(seed=seed)
+    predictor = RiskPredictor()
+    fields = tuple(IncidentResponse.model_fields)
+    rows = incident_rows(50, seed)
+    day = Scenario(start="2024-01-01T00:00:00", duration_hours=24, interval_seconds=3, hosts=10, seed=seed)
+    results = {
+        "generate_metrics": _measure(simulator.generate_metrics, min_time, repeat),
+        "generate_metrics_maintenance": _measure(
+            lambda: simulator.generate_metrics(maintenance_enabled=True), min_time, repeat),
+        "predict_risk": _measure(lambda: predictor.predict_risk(**UPDATE), min_time, repeat),
+        "predict_batch_100": _measure(lambda: predictor.predict_batch([UPDATE] * 100), min_time, repeat),
+        "scenario_replay_10_hosts_1_day": _measure(lambda: replay(day), min_time, repeat),
+        "incidents_encode_pydantic_50": _measure(
+            lambda: _pydantic_body(IncidentResponse, [dict(zip(fields, row)) for row in rows]), min_time, repeat),
+        "incidents_encode_rows_50": _measure(
+            lambda: fast_json.render_json([dict(zip(fields, row)) for row in rows]), min_time, repeat),
+    }
+    if fast_json.orjson is not None:
+        results["incidents_encode_orjson_50"] = _measure(
+            lambda: fast_json.orjson.dumps([dict(zip(fields, row)) for row in rows]), min_time, repeat)
+    return results
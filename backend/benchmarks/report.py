@@ -0,0 +1,77 @@
+import json
+import math
+from typing import Dict, List
+
+# (metric, True if higher is better, smallest absolute change worth reporting) compared in
+# regression mode; the floors keep scheduler noise on sub-millisecond timings from failing a run
+HTTP_CHECKS = (
+    ("p50_ms", False, 0.5),
+    ("p95_ms", False, 0.5),
+    ("p99_ms", False, 1.0),
+    ("throughput_rps", True, 0.0),
+)
+MICRO_CHECKS = (("per_call_us", False, 0.5),)
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    """Latency percentiles in milliseconds and throughput for one endpoint run"""
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "mean_ms": round(1000 * sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "p50_ms": round(1000 * percentile(ordered, 50), 3),
+        "p95_ms": round(1000 * percentile(ordered, 95), 3),
+        "p99_ms": round(1000 * percentile(ordered, 99), 3),
+        "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Describe every metric that is more than tolerance worse than the baseline"""
+    regressions = []
+    for section, checks in (("http", HTTP_CHECKS), ("micro", MICRO_CHECKS)):
+        for name, current in results.get(section, {}).items():
+            previous = baseline.get(section, {}).get(name)
+            if previous is None:
+                continue
+            for metric, higher_is_better, min_delta in checks:
+                old, new = previous.get(metric), current.get(metric)
+                if not old or new is None or abs(new - old) < min_delta:
+                    continue
+                change = (new - old) / old
+                if (-change if higher_is_better else change) > tolerance:
+                    regressions.append(f"{section}.{name}.{metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def print_table(results: dict):
+    http: Dict[str, dict] = results.get("http", {})
+    if http:
+        print(f"{'endpoint':<16}{'reqs':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+        for name, row in http.items():
+            print(f"{name:<16}{row['requests']:>7}{row['errors']:>8}{row['p50_ms']:>10.2f}"
+                  f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['throughput_rps']:>10.1f}")
+    micro: Dict[str, dict] = results.get("micro", {})
+    if micro:
+        print(f"\n{'micro-benchmark':<32}{'calls':>10}{'us/call':>12}")
+        for name, row in micro.items():
+            print(f"{name:<32}{row['calls']:>10}{row['per_call_us']:>12.2f}")
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(results: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
@@ -1,20 +1,271 @@
-from sqlalchemy import create_engine
+import asyncio
+import hashlib
+import heapq
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import islice
+from sqlalchemy import create_engine, event, inspect, text, DateTime
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./uptimeguard.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./uptimeguard.db")
+ASYNC_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Per-host tables are spread over this many SQLite files; shard 0 is the main database
+DB_SHARDS = int(os.getenv("DB_SHARDS", "1"))
+SHARDED_TABLES = (
+    "incidents", "incident_archive", "metric_samples", "metric_rollups", "status_intervals", "sla_days",
 )
+
+# WAL lets readers proceed while a writer commits; NORMAL sync is durable
+# across application crashes and much cheaper than FULL under WAL
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-20000")),  # negative = KiB
+    "temp_store": "MEMORY",
+}
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def _create_engines(url: str):
+    """Sync and async engine for one database, each with its own connection pool"""
+    # Synchronous engine for startup and background threads (sampler, batch writers)
+    sync = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+    )
+    # Async engine used by request handlers so queries don't block the event loop
+    # aiosqlite defaults to NullPool; pool explicitly so connections (and their pragmas) are reused
+    asynchronous = create_async_engine(
+        url.replace("sqlite://", "sqlite+aiosqlite://", 1),
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+    )
+    if url.startswith("sqlite"):
+        event.listen(sync, "connect", _apply_sqlite_pragmas)
+        event.listen(asynchronous.sync_engine, "connect", _apply_sqlite_pragmas)
+    return sync, asynchronous
+
+engine, async_engine = _create_engines(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def to_utc_naive(value: datetime) -> datetime:
+    """Timestamps are stored as naive UTC; convert aware datetimes from clients"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _shard_url(shard: int) -> str:
+    """sqlite:///./uptimeguard.db -> sqlite:///./uptimeguard.shard-1.db"""
+    base, extension = os.path.splitext(SQLALCHEMY_DATABASE_URL)
+    return f"{base}.shard-{shard}{extension or '.db'}"
+
+
+class ShardRouter:
+    """Spreads per-host rows over several SQLite files, each with its own writer lock.
+
+    A host always maps to the same shard (CRC32 of its name) and shard 0 is the
+    main database, so with one shard nothing moves. Every shard keeps a sync
+    and an async engine, and with them its own pool of WAL connections. Rows
+    with an autoincrement id are identified across shards by the global id
+    local_id * count + shard, which also tells which file holds the row; with
+    one shard it is simply the local id.
+    """
+
+    def __init__(self, count: int):
+        if count < 1:
+            raise ValueError("DB_SHARDS must be at least 1")
+        if count > 1 and (not SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+                          or SQLALCHEMY_DATABASE_URL in ("sqlite://", "sqlite:///:memory:")):
+            raise ValueError("DB_SHARDS > 1 needs a file-based SQLite DATABASE_URL")
+        self.count = count
+        self.engines = [engine]
+        self.async_engines = [async_engine]
+        self._sessions = [SessionLocal]
+        self._async_sessions = [AsyncSessionLocal]
+        for shard in range(1, count):
+            sync, asynchronous = _create_engines(_shard_url(shard))
+            self.engines.append(sync)
+            self.async_engines.append(asynchronous)
+            self._sessions.append(sessionmaker(autocommit=False, autoflush=False, bind=sync))
+            self._async_sessions.append(async_sessionmaker(asynchronous, autoflush=False, expire_on_commit=False))
+        self._executor = ThreadPoolExecutor(max_workers=count, thread_name_prefix="shard") if count > 1 else None
+
+    def shard_for(self, host: str) -> int:
+        return zlib.crc32(host.encode()) % self.count if self.count > 1 else 0
+
+    def global_id(self, shard: int, local_id: int) -> int:
+        return local_id * self.count + shard
+
+    def locate(self, global_id: int) -> Tuple[int, int]:
+        """(shard, local id) of a global id"""
+        local_id, shard = divmod(global_id, self.count)
+        return shard, local_id
+
+    def local_bound(self, shard: int, global_id: int) -> int:
+        """Smallest local id in shard whose global id is not below global_id (for keyset cursors)"""
+        return -((shard - global_id) // self.count)
+
+    def session(self, shard: int) -> Session:
+        return self._sessions[shard]()
+
+    def async_session(self, shard: int) -> AsyncSession:
+        return self._async_sessions[shard]()
+
+    def group(self, rows: Iterable, host: Callable[[Any], str]) -> Dict[int, list]:
+        """Split rows into per-shard lists, keeping their order"""
+        groups: Dict[int, list] = {}
+        for row in rows:
+            groups.setdefault(self.shard_for(host(row)), []).append(row)
+        return groups
+
+    def _call(self, shard: int, fn: Callable, args: tuple):
+        db = self.session(shard)
+        try:
+            return fn(db, shard, *args)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def for_each(self, batches: Dict[int, Any], fn: Callable[[Session, int, Any], Any]) -> Dict[int, Any]:
+        """Run fn(session, shard, batch) for every shard with a batch, in parallel when
+        there are several. fn commits itself, so a failing shard never rolls back the
+        others; the first error is raised once all of them have finished. Blocking"""
+        if len(batches) <= 1:
+            return {shard: self._call(shard, fn, (batch,)) for shard, batch in batches.items()}
+        futures = {shard: self._executor.submit(self._call, shard, fn, (batch,)) for shard, batch in batches.items()}
+        wait(futures.values())
+        return {shard: future.result() for shard, future in futures.items()}
+
+    def map(self, fn: Callable[..., Any], *args) -> List[Any]:
+        """fn(session, shard, *args) on every shard; results in shard order. Blocking"""
+        results = self.for_each({shard: args for shard in range(self.count)},
+                                lambda db, shard, batch: fn(db, shard, *batch))
+        return [results[shard] for shard in range(self.count)]
+
+    async def gather(self, fn: Callable[..., Any], *args) -> List[Any]:
+        """fn(session, shard, *args) on every shard concurrently through the async engines"""
+        async def call(shard: int):
+            async with self.async_session(shard) as db:
+                return await db.run_sync(fn, shard, *args)
+        return list(await asyncio.gather(*(call(shard) for shard in range(self.count))))
+
+    async def run(self, host: str, fn: Callable[..., Any], /, *args, **kwargs):
+        """fn(session, *args, **kwargs) on the shard holding host's rows"""
+        async with self.async_session(self.shard_for(host)) as db:
+            return await db.run_sync(fn, *args, **kwargs)
+
+    def create_all(self):
+        """Create and migrate the sharded tables in every shard besides the main database"""
+        tables = [Base.metadata.tables[name] for name in SHARDED_TABLES]
+        for shard_engine in self.engines[1:]:
+            Base.metadata.create_all(bind=shard_engine, tables=tables)
+            sync_schema(shard_engine, tables)
+
+    async def dispose(self):
+        for shard_engine in self.async_engines[1:]:
+            await shard_engine.dispose()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+def merge_newest_first(streams: Iterable[Iterable], key: Callable, limit: Optional[int] = None) -> list:
+    """k-way heap merge of per-shard results that are each sorted newest first"""
+    return list(islice(heapq.merge(*streams, key=key, reverse=True), limit))
+
+
+shards = ShardRouter(DB_SHARDS)
+
+def schema_fingerprint() -> str:
+    """Digest of every table, column and index the models declare, and of the shard count;
+    import models first"""
+    parts = [f"shards:{shards.count}"]
+    for table in Base.metadata.sorted_tables:
+        parts.append(table.name)
+        parts.extend(f"{c.name}:{type(c.type).__name__}:{c.nullable}" for c in table.columns)
+        parts.extend(sorted(index.name for index in table.indexes))
+    return hashlib.blake2b("\n".join(parts).encode(), digest_size=8).hexdigest()
+
+def schema_stamp() -> Optional[Tuple[str, Optional[int]]]:
+    """(fingerprint, shard count) the database was last stamped with; a single-row read"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(
+                text("SELECT fingerprint, shards FROM schema_version ORDER BY id DESC LIMIT 1")
+            ).first()
+    except OperationalError:  # no schema_version table (or shards column) yet
+        return None
+
+def sharded_rows_exist() -> bool:
+    """True if the main database holds rows in any of the sharded tables; one probe per table"""
+    with engine.connect() as conn:
+        existing = set(inspect(conn).get_table_names())
+        return any(
+            conn.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).first() is not None
+            for name in SHARDED_TABLES if name in existing
+        )
+
+def stamp_schema(fingerprint: str):
+    """Record that the schema (and startup rows) are in place for this fingerprint"""
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO schema_version (fingerprint, shards, applied_at) "
+                 "VALUES (:fingerprint, :shards, :applied_at)"),
+            {"fingerprint": fingerprint, "shards": shards.count, "applied_at": datetime.utcnow()},
+        )
+
+def sync_schema(bind=None, tables=None):
+    """Add columns and indexes that create_all() skips on tables that already exist"""
+    bind = bind if bind is not None else engine
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in tables if tables is not None else Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(bind.dialect)}"
+                if column.default is not None and column.default.is_scalar:
+                    ddl += f" DEFAULT {column.default.arg!r}"
+                conn.execute(text(ddl))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+            # SQLite's CURRENT_TIMESTAMP omits microseconds; pad those rows so that
+            # string comparisons against bound datetimes (keyset cursors) stay exact
+            for column in table.columns:
+                if isinstance(column.type, DateTime) and column.server_default is not None:
+                    conn.execute(text(
+                        f"UPDATE {table.name} SET {column.name} = {column.name} || '.000000' "
+                        f"WHERE length({column.name}) = 19"
+                    ))
@@ -1,19 +1,71 @@
+import asyncio
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
-from database import engine, Base, get_db
+from database import (
+    engine, Base, SessionLocal, async_engine, shards, sync_schema, schema_fingerprint, schema_stamp, stamp_schema,
+    sharded_rows_exist,
+)
 from models import User, MaintenanceState
-from auth import get_password_hash
-from routes import auth_routes, metrics_routes, incident_routes, maintenance_routes, predict_routes
+from auth import get_password_hash, load_token_versions, password_hasher, token_cache
+from routes import (
+    auth_routes, metrics_routes, incident_routes, maintenance_routes, predict_routes, internal_routes,
+    status_routes, sla_routes,
+)
+from services.cluster import FileLock, cluster
+from services.event_broadcaster import broadcaster
+from services.instrumentation import instrumentation, InstrumentationMiddleware
+from services.maintenance_cache import maintenance_cache
+from services.response_cache import response_cache
+from services.fast_json import FastJSONResponse
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Skip table creation, migrations and default rows when the database is stamped with the
+# current schema fingerprint; FAST_START=0 runs them on every start
+FAST_START = os.getenv("FAST_START", "1") != "0"
+schema_lock = FileLock(f"{cluster.lock.path}.schema")
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Create default admin user on startup"""
-    db: Session = next(get_db())
+# Time every statement on both engines (the async engine runs on a sync core)
+instrumentation.instrument_engine(engine, "sync")
+instrumentation.instrument_engine(async_engine.sync_engine, "async")
+for shard in range(1, shards.count):
+    instrumentation.instrument_engine(shards.engines[shard], f"shard{shard}")
+    instrumentation.instrument_engine(shards.async_engines[shard].sync_engine, f"shard{shard}-async")
+
+def runtime_stats():
+    """Worker pool, stream and buffer levels reported on /internal/metrics"""
+    ingest = metrics_routes.ingest_buffer
+    return [
+        ("uptimeguard_password_hash_pending", "gauge", "bcrypt operations running or queued",
+         password_hasher.pending),
+        ("uptimeguard_password_hash_queue_depth", "gauge", "bcrypt operations waiting for a worker",
+         password_hasher.queue_depth),
+        ("uptimeguard_password_hash_rejected_total", "counter", "Logins refused because the bcrypt pool was full",
+         password_hasher.rejected),
+        ("uptimeguard_login_throttled_total", "counter", "Logins refused by the rate limiter",
+         auth_routes.login_limiter.throttled),
+        ("uptimeguard_token_cache_entries", "gauge", "Verified tokens held in the cache", len(token_cache)),
+        ("uptimeguard_stream_subscribers", "gauge", "Open /metrics/stream connections",
+         broadcaster.subscriber_count),
+        ("uptimeguard_stream_dropped_total", "counter", "Stream messages dropped for slow subscribers",
+         broadcaster.dropped),
+        ("uptimeguard_ingest_buffered", "gauge", "Ingested samples waiting to be written", ingest.buffered),
+        ("uptimeguard_ingest_accepted_total", "counter", "Ingested samples accepted", ingest.accepted),
+        ("uptimeguard_ingest_rejected_total", "counter", "Ingested samples refused with 429", ingest.rejected),
+        ("uptimeguard_ingest_write_failures_total", "counter", "Ingest flushes that failed and were retried",
+         ingest.write_failures),
+        ("uptimeguard_response_cache_hits_total", "counter", "GET responses served pre-serialized",
+         response_cache.hits),
+        ("uptimeguard_response_cache_misses_total", "counter", "GET responses rebuilt from the database",
+         response_cache.misses),
+    ]
+
+instrumentation.add_collector(runtime_stats)
+
+def create_default_rows() -> bool:
+    """Create the default admin user and the maintenance row; False if that failed"""
+    db: Session = SessionLocal()
     try:
         admin_email = "admin@uptimeguard.ai"
         admin = db.query(User).filter(User.email == admin_email).first()
@@ -35,14 +87,85 @@ async def lifespan(app: FastAPI):
             db.add(maintenance)
             db.commit()
             print("✅ Maintenance state initialized")
+        return True
     except Exception as e:
         print(f"❌ Error during startup: {e}")
+        return False
     finally:
         db.close()
-    yield
-    # Cleanup (if needed)
 
-app = FastAPI(title="UptimeGuard AI API", version="1.0.0", lifespan=lifespan)
+def prepare_database() -> bool:
+    """Create tables, migrate them and add the default rows unless the database is already
+    stamped with the current schema; True if that work ran"""
+    fingerprint = schema_fingerprint()
+    stamp = schema_stamp()
+    stamped_shards = stamp[1] if stamp is not None else None
+    if stamped_shards is None and sharded_rows_exist():
+        # Set up before the shard count was recorded, so every row is in the main database
+        stamped_shards = 1
+    if stamped_shards is not None and stamped_shards != shards.count:
+        # Hosts would hash to different files, existing rows would no longer be found
+        # and their incident ids would be read as another shard's
+        raise RuntimeError(f"The database was set up with DB_SHARDS={stamped_shards}, not {shards.count}")
+    if FAST_START and stamp is not None and stamp[0] == fingerprint:
+        return False
+    # Workers start together in multi-worker mode, so one at a time; later ones find the stamp
+    if cluster.enabled:
+        schema_lock.acquire(blocking=True)
+    try:
+        stamp = schema_stamp()
+        if FAST_START and stamp is not None and stamp[0] == fingerprint:
+            return False
+        Base.metadata.create_all(bind=engine)
+        sync_schema()
+        shards.create_all()
+        if create_default_rows():
+            stamp_schema(fingerprint)
+    finally:
+        schema_lock.release()
+    return True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Bring the database up to date, restore in-memory state and start background work"""
+    startup = instrumentation.startup
+    startup.mark("imports")
+    if not prepare_database():
+        print("✅ Database schema is current")
+    startup.mark("schema")
+
+    # Restore token versions and the status page counters; the elected worker then restores
+    # incident cooldowns, samples on a fixed tick and arms the maintenance window timers
+    db = SessionLocal()
+    try:
+        load_token_versions(db)
+    finally:
+        db.close()
+    status_routes.load_timeline()
+    # Request handlers only read the cached maintenance state, so load it before serving
+    await asyncio.to_thread(maintenance_cache.refresh)
+    startup.mark("state")
+    await instrumentation.start()
+    await cluster.start()
+    await metrics_routes.ingest_buffer.start()
+    startup.mark("services")
+    print(f"✅ Ready {startup.ready * 1000:.0f} ms after process start ({startup.summary()})")
+    try:
+        yield
+    finally:
+        await instrumentation.stop()
+        await cluster.stop()
+        await maintenance_routes.maintenance_scheduler.stop()
+        await metrics_routes.sampler.stop()
+        await metrics_routes.ingest_buffer.stop()
+        # Also writes the buckets still filling; they are merged if they reopen after the restart
+        metrics_routes.store.flush(close_open=True)
+        metrics_routes.sla.flush()
+        await async_engine.dispose()
+        await shards.dispose()
+
+app = FastAPI(title="UptimeGuard AI API", version="1.0.0", lifespan=lifespan,
+              default_response_class=FastJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -51,7 +174,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(InstrumentationMiddleware, instrumentation=instrumentation)
 
 # Include routers
 app.include_router(auth_routes.router)
@@ -59,6 +184,9 @@ app.include_router(metrics_routes.router)
 app.include_router(incident_routes.router)
 app.include_router(maintenance_routes.router)
 app.include_router(predict_routes.router)
+app.include_router(internal_routes.router)
+app.include_router(status_routes.router)
+app.include_router(sla_routes.router)
 
 @app.get("/")
 async def root():
@@ -66,4 +194,10 @@ async def root():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if workers > 1:
+        # Workers import the app themselves, so it must be passed as an import string
+        os.environ["MULTI_WORKER"] = "1"
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
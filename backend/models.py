@@ -1,23 +1,60 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text
+from sqlalchemy import BigInteger, Column, Integer, String, Boolean, Date, DateTime, Float, Text, Index
 from sqlalchemy.sql import func
+from datetime import datetime
 from database import Base
 
+class SchemaVersion(Base):
+    """Fingerprint of the model schema the database was last created or migrated for"""
+    __tablename__ = "schema_version"
+    
+    id = Column(Integer, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    shards = Column(Integer, nullable=True)  # DB_SHARDS the rows were routed with
+    applied_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
 class User(Base):
     __tablename__ = "users"
     
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
     password_hash = Column(String, nullable=False)
+    token_version = Column(Integer, default=0, nullable=False)  # bump to revoke issued tokens
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class Incident(Base):
     __tablename__ = "incidents"
+    __table_args__ = (
+        # Keyset pagination walks (timestamp, id) newest first, optionally within one severity/status
+        Index("ix_incidents_timestamp_id", "timestamp", "id"),
+        Index("ix_incidents_severity_timestamp_id", "severity", "timestamp", "id"),
+        Index("ix_incidents_status_timestamp_id", "status", "timestamp", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    timestamp = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now(), nullable=False)
     severity = Column(String, nullable=False)  # low, medium, high, critical
     message = Column(Text, nullable=False)
     status = Column(String, default="active", nullable=False)  # active, resolved
+    dedupe_key = Column(String, nullable=True, index=True)  # set for auto-created incidents
+    occurrences = Column(Integer, default=1, nullable=False)  # firings of the same rule grouped into this row
+    last_seen = Column(DateTime(timezone=True), nullable=True)  # latest firing
+    resolved_at = Column(DateTime(timezone=True), nullable=True)
+
+class IncidentArchive(Base):
+    """Resolved incidents moved out of the hot incidents table"""
+    __tablename__ = "incident_archive"
+    __table_args__ = (Index("ix_incident_archive_timestamp_id", "timestamp", "id"),)
+    
+    id = Column(Integer, primary_key=True)  # same id as in incidents
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    severity = Column(String, nullable=False)
+    message = Column(Text, nullable=False)
+    status = Column(String, nullable=False)
+    dedupe_key = Column(String, nullable=True)
+    occurrences = Column(Integer, default=1, nullable=False)
+    last_seen = Column(DateTime(timezone=True), nullable=True)
+    resolved_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
 class MaintenanceState(Base):
     __tablename__ = "maintenance_state"
@@ -26,3 +63,132 @@ class MaintenanceState(Base):
     enabled = Column(Boolean, default=False, nullable=False)
     eta_minutes = Column(Integer, default=0, nullable=False)
     enabled_at = Column(DateTime(timezone=True), nullable=True)
+    window_id = Column(Integer, nullable=True)  # scheduled window that enabled it; None when toggled by hand
+
+class MaintenanceWindow(Base):
+    """Planned maintenance, optionally repeating every day or week"""
+    __tablename__ = "maintenance_windows"
+    # Ids are never reused, so (count, max id) changes whenever a window is added or removed
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    id = Column(Integer, primary_key=True)
+    title = Column(String, nullable=False)
+    starts_at = Column(DateTime(timezone=True), nullable=False)  # first occurrence
+    duration_minutes = Column(Integer, nullable=False)
+    recurrence = Column(String, default="none", nullable=False)  # none, daily, weekly
+    repeat_every = Column(Integer, default=1, nullable=False)  # every N days/weeks
+    ends_on = Column(DateTime(timezone=True), nullable=True)  # no occurrence starts after this
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+class MetricSample(Base):
+    __tablename__ = "metric_samples"
+    __table_args__ = (Index("ix_metric_samples_host_timestamp", "host", "timestamp"),)
+    
+    id = Column(Integer, primary_key=True)
+    host = Column(String, default="local", nullable=False)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    status = Column(String, nullable=False)
+    cpu = Column(Float, nullable=False)
+    ram = Column(Float, nullable=False)
+    response_time = Column(Float, nullable=False)
+    error_rate = Column(Float, nullable=False)
+    db_latency = Column(Float, nullable=False)
+
+class MetricRollup(Base):
+    __tablename__ = "metric_rollups"
+    __table_args__ = (
+        Index("ix_metric_rollups_host_resolution_bucket", "host", "resolution", "bucket_start", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    host = Column(String, default="local", nullable=False)
+    resolution = Column(Integer, nullable=False)  # bucket width in seconds: 60, 300, 3600
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    sample_count = Column(Integer, nullable=False)
+    down_samples = Column(Integer, default=0, nullable=False)  # samples with status "down"
+    maintenance_samples = Column(Integer, default=0, nullable=False)
+    cpu_min = Column(Float, nullable=False)
+    cpu_max = Column(Float, nullable=False)
+    cpu_avg = Column(Float, nullable=False)
+    cpu_p95 = Column(Float, nullable=False)
+    ram_min = Column(Float, nullable=False)
+    ram_max = Column(Float, nullable=False)
+    ram_avg = Column(Float, nullable=False)
+    ram_p95 = Column(Float, nullable=False)
+    response_time_min = Column(Float, nullable=False)
+    response_time_max = Column(Float, nullable=False)
+    response_time_avg = Column(Float, nullable=False)
+    response_time_p95 = Column(Float, nullable=False)
+    error_rate_min = Column(Float, nullable=False)
+    error_rate_max = Column(Float, nullable=False)
+    error_rate_avg = Column(Float, nullable=False)
+    error_rate_p95 = Column(Float, nullable=False)
+    db_latency_min = Column(Float, nullable=False)
+    db_latency_max = Column(Float, nullable=False)
+    db_latency_avg = Column(Float, nullable=False)
+    db_latency_p95 = Column(Float, nullable=False)
+
+class StatusInterval(Base):
+    """Run of consecutive samples with the same status on one host"""
+    __tablename__ = "status_intervals"
+    __table_args__ = (Index("ix_status_intervals_host_started_at", "host", "started_at"),)
+    
+    id = Column(Integer, primary_key=True)
+    host = Column(String, nullable=False)
+    status = Column(String, nullable=False)  # a sample status, or scheduled_maintenance
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    ended_at = Column(DateTime(timezone=True), nullable=False)  # last checkpoint while the run is open
+
+class SlaDay(Base):
+    """Seconds spent in each status per host and UTC day, with running totals since the first day.
+
+    The cum_* columns make the totals for any range of whole days the
+    difference of two rows.
+    """
+    __tablename__ = "sla_days"
+    __table_args__ = (Index("ix_sla_days_host_day", "host", "day", unique=True),)
+    
+    id = Column(Integer, primary_key=True)
+    host = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+    operational_seconds = Column(Float, default=0, nullable=False)
+    degraded_seconds = Column(Float, default=0, nullable=False)
+    down_seconds = Column(Float, default=0, nullable=False)
+    maintenance_seconds = Column(Float, default=0, nullable=False)  # switched on by hand
+    scheduled_maintenance_seconds = Column(Float, default=0, nullable=False)  # during a scheduled window
+    cum_operational_seconds = Column(Float, default=0, nullable=False)
+    cum_degraded_seconds = Column(Float, default=0, nullable=False)
+    cum_down_seconds = Column(Float, default=0, nullable=False)
+    cum_maintenance_seconds = Column(Float, default=0, nullable=False)
+    cum_scheduled_maintenance_seconds = Column(Float, default=0, nullable=False)
+
+class UpdateOutcome(Base):
+    """A deployment that actually happened, used as training data for the risk model"""
+    __tablename__ = "update_outcomes"
+    
+    id = Column(Integer, primary_key=True)
+    update_title = Column(String, nullable=False)
+    update_type = Column(String, nullable=False)
+    services_affected = Column(Text, nullable=False, default="")  # comma-separated
+    db_migration = Column(Boolean, nullable=False, default=False)
+    expected_minutes = Column(Integer, nullable=False)
+    description = Column(Text, nullable=False, default="")
+    deployed_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    actual_downtime_minutes = Column(Integer, nullable=True)
+    caused_incident = Column(Boolean, nullable=True)  # None: infer from incidents after deployed_at
+
+class SharedState(Base):
+    """Latest state published by the leader worker for the others to read"""
+    __tablename__ = "shared_state"
+    
+    key = Column(String, primary_key=True)  # e.g. "metrics:local", "fleet", "forecast:<host>"
+    version = Column(BigInteger, nullable=False, index=True)  # increases with every publish
+    payload = Column(Text, nullable=False)  # JSON
+
+class IngestQueueItem(Base):
+    """Ingest batch accepted by a follower worker, waiting for the leader to process it"""
+    __tablename__ = "ingest_queue"
+    
+    id = Column(Integer, primary_key=True)
+    payload = Column(Text, nullable=False)  # JSON list of samples
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
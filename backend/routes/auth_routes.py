@@ -1,24 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import math
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from database import get_db
-from models import User
 from schemas import LoginRequest, LoginResponse
-from auth import authenticate_user, create_access_token, get_password_hash
+from auth import authenticate_user, create_user_token, get_current_user, revoke_user_tokens
+from services.rate_limiter import LoginRateLimiter
 
 router = APIRouter(prefix="/auth", tags=["auth"])
+login_limiter = LoginRateLimiter(
+    identity_limit=int(os.getenv("LOGIN_FAILURES_PER_IDENTITY", "5")),
+    ip_limit=int(os.getenv("LOGIN_ATTEMPTS_PER_IP", "30")),
+    window_seconds=float(os.getenv("LOGIN_RATE_WINDOW_SECONDS", "60")),
+)
 
 @router.post("/login", response_model=LoginResponse)
-async def login(credentials: LoginRequest, db: Session = Depends(get_db)):
-    user = authenticate_user(db, credentials.email, credentials.password)
+async def login(credentials: LoginRequest, request: Request, db: AsyncSession = Depends(get_db)):
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = login_limiter.check(credentials.email, client_ip)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    user = await authenticate_user(db, credentials.email, credentials.password)
     if not user:
+        login_limiter.record_failure(credentials.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    login_limiter.record_success(credentials.email)
     access_token_expires = timedelta(minutes=30)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
+    access_token = create_user_token(user, expires_delta=access_token_expires)
     return {"access_token": access_token, "token_type": "bearer"}
+
+@router.post("/revoke")
+async def revoke_tokens(
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Sign out everywhere: every token issued so far stops validating"""
+    await revoke_user_tokens(db, current_user.id)
+    return {"message": "All tokens revoked"}
@@ -1,25 +1,124 @@
-from fastapi import APIRouter, Depends
+import base64
+from collections import namedtuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import func, select, tuple_
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
-from models import Incident
-from schemas import IncidentResponse, IncidentCreate
+from datetime import datetime
+from typing import List, Optional, Tuple
+from database import merge_newest_first, shards, to_utc_naive
+from models import Incident, IncidentArchive
+from schemas import IncidentResponse, IncidentCreate, IncidentCount
 from auth import get_current_user
+from services.event_broadcaster import broadcaster
+from services.cluster import cluster
+from services.response_cache import response_cache
 
 router = APIRouter(prefix="/incidents", tags=["incidents"])
+# The list is fetched as plain tuples in IncidentResponse's field order and encoded
+# without building ORM or Pydantic objects; the schema stays the response contract
+INCIDENT_FIELDS = tuple(IncidentResponse.model_fields)
+INCIDENT_COLUMNS = [getattr(Incident, field) for field in INCIDENT_FIELDS]
+ARCHIVE_COLUMNS = [getattr(IncidentArchive, field) for field in INCIDENT_FIELDS]
+IncidentRow = namedtuple("IncidentRow", INCIDENT_FIELDS)
+
+def encode_cursor(incident) -> str:
+    """Cursor for an Incident or a row with timestamp and id"""
+    raw = f"{incident.timestamp.replace(tzinfo=None).isoformat()}|{incident.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        timestamp, incident_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(incident_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def filter_incidents(
+    query,
+    severity: Optional[List[str]] = None,
+    status: Optional[List[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    if severity:
+        query = query.where(Incident.severity.in_(severity))
+    if status:
+        query = query.where(Incident.status.in_(status))
+    if since:
+        query = query.where(Incident.timestamp >= to_utc_naive(since))
+    if until:
+        query = query.where(Incident.timestamp < to_utc_naive(until))
+    return query
+
+def _page_shard(db: Session, shard: int, model, query, cursor: Optional[Tuple[datetime, int]],
+                limit: int) -> List[IncidentRow]:
+    """One shard's share of a page, newest first and with global ids"""
+    if cursor:
+        timestamp, incident_id = cursor
+        query = query.where(tuple_(model.timestamp, model.id) < (timestamp, shards.local_bound(shard, incident_id)))
+    rows = db.execute(query.order_by(model.timestamp.desc(), model.id.desc()).limit(limit)).all()
+    return [IncidentRow(*row)._replace(id=shards.global_id(shard, row.id)) for row in rows]
+
+async def _fetch_page(model, query, cursor: Optional[str], limit: int) -> List[IncidentRow]:
+    """Up to limit rows across all shards: each shard returns its newest limit rows after
+    the cursor and a k-way heap merge keeps the newest of them"""
+    pages = await shards.gather(_page_shard, model, query, decode_cursor(cursor) if cursor else None, limit)
+    return merge_newest_first(pages, key=lambda row: (row.timestamp, row.id), limit=limit)
+
+def _count_shard(db: Session, shard: int, query) -> int:
+    return db.scalar(query)
 
 @router.get("", response_model=List[IncidentResponse])
 async def get_incidents(
-    limit: int = 50,
-    db: Session = Depends(get_db)
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    severity: Optional[List[str]] = Query(None),
+    status: Optional[List[str]] = Query(None),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    # Dashboards poll this; unchanged polls are answered from the cache (or with a 304)
+    key = (limit, cursor, tuple(severity or ()), tuple(status or ()), since, until)
+    version = response_cache.version("incidents")
+    cached = response_cache.get("incidents", key, version)
+    if cached is None:
+        query = filter_incidents(select(*INCIDENT_COLUMNS), severity, status, since, until)
+        rows = await _fetch_page(Incident, query, cursor, limit + 1)
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(rows[-1])
+        data = [dict(zip(INCIDENT_FIELDS, row)) for row in rows]
+        cached = response_cache.put("incidents", key, version, data, headers)
+    return response_cache.respond(request, cached)
+
+@router.get("/archive", response_model=List[IncidentResponse])
+async def get_archived_incidents(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page")
+):
+    """Resolved incidents moved out of the main list, newest first"""
+    rows = await _fetch_page(IncidentArchive, select(*ARCHIVE_COLUMNS), cursor, limit + 1)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1])
+    return [dict(zip(INCIDENT_FIELDS, row)) for row in rows]
+
+@router.get("/count", response_model=IncidentCount)
+async def count_incidents(
+    severity: Optional[List[str]] = Query(None),
+    status: Optional[List[str]] = Query(None),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
 ):
-    incidents = db.query(Incident).order_by(Incident.timestamp.desc()).limit(limit).all()
-    return incidents
+    query = filter_incidents(select(func.count(Incident.id)), severity, status, since, until)
+    return {"count": sum(await shards.gather(_count_shard, query))}
 
 @router.post("/create")
 async def create_incident(
     incident: IncidentCreate,
-    db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     db_incident = Incident(
@@ -27,7 +126,17 @@ async def create_incident(
         message=incident.message,
         status="active"
     )
-    db.add(db_incident)
-    db.commit()
-    db.refresh(db_incident)
-    return {"id": db_incident.id, "message": "Incident created"}
+    # Incidents raised by hand belong to the local host
+    shard = shards.shard_for("local")
+    async with shards.async_session(shard) as db:
+        db.add(db_incident)
+        await db.commit()
+        await db.refresh(db_incident)
+    incident_id = shards.global_id(shard, db_incident.id)
+    response_cache.bump("incidents")
+    # In multi-worker mode every worker streams it from the cluster poll instead
+    if not cluster.enabled:
+        broadcaster.publish(
+            "incident", IncidentResponse.model_validate(db_incident).model_copy(update={"id": incident_id})
+        )
+    return {"id": incident_id, "message": "Incident created"}
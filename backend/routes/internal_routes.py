@@ -0,0 +1,17 @@
+import os
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from services.instrumentation import instrumentation
+
+# When set, scrapers must send "Authorization: Bearer <token>"
+INTERNAL_METRICS_TOKEN = os.getenv("INTERNAL_METRICS_TOKEN")
+
+router = APIRouter(prefix="/internal", tags=["internal"], include_in_schema=False)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_internal_metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus scrape endpoint for request, database, event loop and worker pool stats"""
+    if INTERNAL_METRICS_TOKEN and authorization != f"Bearer {INTERNAL_METRICS_TOKEN}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(instrumentation.render(), media_type="text/plain; version=0.0.4")
@@ -1,31 +1,57 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from datetime import datetime
-from database import get_db
-from models import MaintenanceState
-from schemas import MaintenanceResponse, MaintenanceEnable
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import List
+from database import SessionLocal, get_db, to_utc_naive
+from models import MaintenanceState, MaintenanceWindow
+from schemas import MaintenanceResponse, MaintenanceEnable, MaintenanceWindowCreate, MaintenanceWindowResponse
 from auth import get_current_user
+from services.cluster import cluster
+from services.event_broadcaster import broadcaster
+from services.maintenance_cache import maintenance_cache
+from services.maintenance_scheduler import MaintenanceScheduler, occurrence_at, recurrence_period
+from services.response_cache import response_cache
 
 router = APIRouter(prefix="/maintenance", tags=["maintenance"])
 
+def announce_maintenance():
+    """Reload the cached state after a write and push it to stream subscribers once"""
+    snapshot = maintenance_cache.invalidate()
+    if maintenance_cache.announce(snapshot):
+        broadcaster.publish("maintenance", MaintenanceResponse(**snapshot._asdict()))
+    return snapshot
+
+# Every worker tracks the windows; the leader also switches maintenance on and off for them
+maintenance_scheduler = MaintenanceScheduler(SessionLocal, on_change=announce_maintenance)
+
+def refresh_windows():
+    if maintenance_scheduler.refresh():
+        response_cache.bump("status")
+
+cluster.on_promote(maintenance_scheduler.start)
+# Windows added or removed through another worker show up within a poll
+cluster.on_poll(lambda is_leader: refresh_windows())
+
 @router.get("", response_model=MaintenanceResponse)
-async def get_maintenance_status(db: Session = Depends(get_db)):
-    maintenance = db.query(MaintenanceState).first()
-    if not maintenance:
-        # Create default if doesn't exist
-        maintenance = MaintenanceState(enabled=False, eta_minutes=0)
-        db.add(maintenance)
-        db.commit()
-        db.refresh(maintenance)
-    return maintenance
+async def get_maintenance_status(request: Request):
+    # Served from the in-process cache; the row is created at startup. The snapshot
+    # version changes on every toggle, so the body is only serialized once per toggle
+    snapshot = maintenance_cache.get()
+    cached = response_cache.get("maintenance", None, snapshot.version)
+    if cached is None:
+        data = MaintenanceResponse(**snapshot._asdict()).model_dump()
+        cached = response_cache.put("maintenance", None, snapshot.version, data)
+    return response_cache.respond(request, cached)
 
 @router.post("/enable")
 async def enable_maintenance(
     data: MaintenanceEnable,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    maintenance = db.query(MaintenanceState).first()
+    maintenance = (await db.execute(select(MaintenanceState).limit(1))).scalars().first()
     if not maintenance:
         maintenance = MaintenanceState(enabled=True, eta_minutes=data.eta_minutes, enabled_at=datetime.utcnow())
         db.add(maintenance)
@@ -33,16 +59,17 @@ async def enable_maintenance(
         maintenance.enabled = True
         maintenance.eta_minutes = data.eta_minutes
         maintenance.enabled_at = datetime.utcnow()
-    db.commit()
-    db.refresh(maintenance)
-    return {"message": "Maintenance mode enabled", "eta_minutes": maintenance.eta_minutes}
+        maintenance.window_id = None  # a scheduled window no longer owns it
+    await db.commit()
+    snapshot = await asyncio.to_thread(announce_maintenance)
+    return {"message": "Maintenance mode enabled", "eta_minutes": snapshot.eta_minutes}
 
 @router.post("/disable")
 async def disable_maintenance(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    maintenance = db.query(MaintenanceState).first()
+    maintenance = (await db.execute(select(MaintenanceState).limit(1))).scalars().first()
     if not maintenance:
         maintenance = MaintenanceState(enabled=False, eta_minutes=0)
         db.add(maintenance)
@@ -50,5 +77,58 @@ async def disable_maintenance(
         maintenance.enabled = False
         maintenance.eta_minutes = 0
         maintenance.enabled_at = None
-    db.commit()
+        maintenance.window_id = None
+    await db.commit()
+    await asyncio.to_thread(announce_maintenance)
     return {"message": "Maintenance mode disabled"}
+
+def window_response(window: MaintenanceWindow) -> MaintenanceWindowResponse:
+    occurrence = occurrence_at(window, datetime.utcnow())
+    return MaintenanceWindowResponse.model_validate(window).model_copy(
+        update={"next_start": occurrence[0] if occurrence else None}
+    )
+
+@router.get("/windows", response_model=List[MaintenanceWindowResponse])
+async def list_maintenance_windows(db: AsyncSession = Depends(get_db)):
+    """Scheduled windows ordered by first start"""
+    windows = (await db.execute(select(MaintenanceWindow).order_by(MaintenanceWindow.starts_at))).scalars().all()
+    return [window_response(window) for window in windows]
+
+@router.post("/windows", response_model=MaintenanceWindowResponse, status_code=201)
+async def create_maintenance_window(
+    data: MaintenanceWindowCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    window = MaintenanceWindow(
+        title=data.title,
+        starts_at=to_utc_naive(data.starts_at),
+        duration_minutes=data.duration_minutes,
+        recurrence=data.recurrence,
+        repeat_every=data.repeat_every,
+        ends_on=to_utc_naive(data.ends_on) if data.ends_on else None,
+    )
+    period = recurrence_period(window)
+    if period is not None and timedelta(minutes=window.duration_minutes) >= period:
+        raise HTTPException(status_code=400, detail="A repeating window must end before its next occurrence")
+    if window.ends_on is not None and window.ends_on < window.starts_at:
+        raise HTTPException(status_code=400, detail="'ends_on' must not be before 'starts_at'")
+    db.add(window)
+    await db.commit()
+    await asyncio.to_thread(refresh_windows)
+    return window_response(window)
+
+@router.delete("/windows/{window_id}")
+async def delete_maintenance_window(
+    window_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    window = await db.get(MaintenanceWindow, window_id)
+    if window is None:
+        raise HTTPException(status_code=404, detail="Maintenance window not found")
+    await db.delete(window)
+    await db.commit()
+    # Ends maintenance if this window switched it on
+    await asyncio.to_thread(refresh_windows)
+    return {"message": "Maintenance window deleted"}
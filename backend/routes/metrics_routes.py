@@ -1,70 +1,332 @@
-from fastapi import APIRouter, Depends
+import asyncio
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from database import get_db
-from models import MaintenanceState, Incident
-from schemas import MetricsResponse
-from services.metrics_simulator import MetricsSimulator
+from datetime import datetime
+from database import shards, to_utc_naive
+from typing import List, Literal, Optional
+from models import Incident
+from schemas import (
+    MetricsResponse, MetricsRangeResponse, IncidentResponse, MaintenanceResponse,
+    FleetSummaryResponse, FleetHostMetrics, FleetServiceSummary, IngestSample, IngestResponse,
+)
+from auth import apply_token_version, get_current_user
+from services.metrics_simulator import MetricsSimulator, classify_status
+from services.fleet_simulator import FleetSimulator
+from services.metrics_sampler import MetricsSampler
+from services.metrics_store import MetricsStore
+from services.metrics_ingest import IngestBuffer
+from services.sla_engine import SlaEngine
+from services.event_broadcaster import broadcaster, format_event
+from services.incident_engine import IncidentEngine, evaluate_samples, fetch_incidents, load_rules
+from services.downtime_forecaster import downtime_forecaster
+from services.maintenance_cache import maintenance_cache
+from services.cluster import cluster
+from services.response_cache import response_cache
+
+SAMPLE_INTERVAL_SECONDS = float(os.getenv("METRICS_SAMPLE_INTERVAL", "3"))
+SAMPLE_HISTORY_SIZE = int(os.getenv("METRICS_HISTORY_SIZE", "1200"))
+STREAM_HEARTBEAT_SECONDS = 15
+FLEET_SIZE = int(os.getenv("FLEET_SIZE", "200"))
+INGEST_MAX_SAMPLES = int(os.getenv("INGEST_MAX_SAMPLES", "50000"))  # per request
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
-simulator = MetricsSimulator()
-
-def check_and_create_incidents(db: Session, metrics: dict):
-    """Automatically create incidents when thresholds are exceeded"""
-    # Check for error rate spike
-    if metrics["error_rate"] > 15:
-        # Check if we already created a critical incident recently (within last 5 minutes)
-        recent = db.query(Incident).filter(
-            Incident.message.like("%Error rate spike%"),
-            Incident.timestamp > datetime.utcnow() - timedelta(minutes=5)
-        ).first()
-        if not recent:
-            incident = Incident(
-                severity="critical",
-                message=f"Error rate spike detected: {metrics['error_rate']:.2f}%",
-                status="active"
-            )
-            db.add(incident)
-    
-    # Check for high latency
-    elif metrics["response_time"] > 2000:
-        recent = db.query(Incident).filter(
-            Incident.message.like("%High latency detected%"),
-            Incident.timestamp > datetime.utcnow() - timedelta(minutes=5)
-        ).first()
-        if not recent:
-            incident = Incident(
-                severity="high",
-                message=f"High latency detected: {metrics['response_time']:.0f}ms",
-                status="active"
-            )
-            db.add(incident)
-    
-    # Check for degraded performance
-    elif metrics["error_rate"] > 5 or metrics["response_time"] > 1200:
-        recent = db.query(Incident).filter(
-            Incident.message.like("%Degraded performance%"),
-            Incident.timestamp > datetime.utcnow() - timedelta(minutes=10)
-        ).first()
-        if not recent:
-            incident = Incident(
-                severity="medium",
-                message=f"Degraded performance: Error rate {metrics['error_rate']:.2f}%, Response time {metrics['response_time']:.0f}ms",
-                status="active"
-            )
-            db.add(incident)
-    
-    db.commit()
+# Set METRICS_SEED for a reproducible series (e.g. for load tests)
+METRICS_SEED = int(os.environ["METRICS_SEED"]) if os.getenv("METRICS_SEED") else None
+simulator = MetricsSimulator(seed=METRICS_SEED)
+fleet = FleetSimulator(FLEET_SIZE, seed=METRICS_SEED)
+incident_engine = IncidentEngine(
+    rules=load_rules(os.environ["INCIDENT_RULES_FILE"]) if os.getenv("INCIDENT_RULES_FILE") else None,
+    archive_after_hours=float(os.getenv("INCIDENT_ARCHIVE_AFTER_HOURS", "24")),
+)
+store = MetricsStore(
+    shards,
+    batch_size=int(os.getenv("METRICS_FLUSH_BATCH", "100")),
+    flush_interval=float(os.getenv("METRICS_FLUSH_INTERVAL", "30")),
+    max_points=int(os.getenv("METRICS_RANGE_MAX_POINTS", "10000")),
+)
+sla = SlaEngine(
+    shards,
+    # Longer silences between two samples of a host count as unobserved, not as up or down
+    max_gap=float(os.getenv("SLA_MAX_GAP_SECONDS", str(max(60.0, 3 * SAMPLE_INTERVAL_SECONDS)))),
+    flush_interval=float(os.getenv("SLA_FLUSH_INTERVAL", "10")),
+)
+
+def check_and_create_incidents(samples: List[dict], host: str = "local") -> Optional[list]:
+    """Automatically create, update and resolve incidents for a batch.
+
+    Returns the incidents that were updated or resolved, or None when no
+    existing incident changed (or got archived).
+    """
+    rows = evaluate_samples(incident_engine, downtime_forecaster, samples, host=host)
+    created = incident_engine.record(shards, rows)
+    changed_ids = incident_engine.apply_updates(shards)
+    updated = [IncidentResponse(**incident) for incident in fetch_incidents(shards, changed_ids)]
+    archived = incident_engine.maybe_archive(shards)
+    if created or changed_ids or archived:
+        response_cache.bump("incidents")
+    # In multi-worker mode every worker streams new incidents from sync_cluster() instead
+    if not cluster.enabled:
+        for incident in created:
+            broadcaster.publish("incident", IncidentResponse(**incident))
+    for incident in updated:
+        broadcaster.publish("incident", incident)
+    return updated if changed_ids or archived else None
+
+def take_sample() -> dict:
+    """Generate one metrics sample and record any incidents it triggers"""
+    maintenance = maintenance_cache.get()
+    metrics = simulator.generate_metrics(maintenance_enabled=maintenance.enabled)
+    fleet.step(maintenance_enabled=maintenance.enabled)
 
-@router.get("/live", response_model=MetricsResponse)
-async def get_live_metrics(db: Session = Depends(get_db)):
-    # Check maintenance state
-    maintenance = db.query(MaintenanceState).first()
-    maintenance_enabled = maintenance.enabled if maintenance else False
-    
-    metrics = simulator.generate_metrics(maintenance_enabled=maintenance_enabled)
-    
     # Auto-create incidents for anomalies
-    check_and_create_incidents(db, metrics)
-    
-    return MetricsResponse(**metrics)
+    updated = check_and_create_incidents([metrics])
+    store.add(metrics)
+    sla.add_many([metrics], scheduled_maintenance=maintenance.window_id is not None)
+    publish_state(metrics, updated)
+    return metrics
+
+def write_ingested(samples: List[dict]):
+    """Persist one buffered ingest batch and run the incident rules over it"""
+    store.add_many(samples)
+    store.flush()
+    # Maintenance windows are scheduled for this server only; other hosts' maintenance stays manual
+    local = [sample for sample in samples if sample.get("host", "local") == "local"]
+    if local:
+        sla.add_many(local, scheduled_maintenance=maintenance_cache.get().window_id is not None)
+    if len(local) < len(samples):
+        sla.add_many([sample for sample in samples if sample.get("host", "local") != "local"])
+    updated = check_and_create_incidents(samples)
+    publish_state(updated_incidents=updated)
+
+def route_ingested(samples: List[dict]):
+    """Write ingested samples on the leader; followers queue them for the leader"""
+    if cluster.is_leader or not cluster.enabled:
+        write_ingested(samples)
+    else:
+        cluster.state.enqueue(samples)
+
+def publish_state(metrics: Optional[dict] = None, updated_incidents: Optional[list] = None):
+    """Share the leader's latest sample, fleet snapshot, changed forecasts and incident
+    updates with the other workers"""
+    if not cluster.enabled:
+        return
+    documents = {f"forecast:{forecast.host}": forecast._asdict() for forecast in downtime_forecaster.drain_updated()}
+    if metrics is not None:
+        documents["metrics:local"] = metrics
+        documents["fleet"] = fleet.export_snapshot()
+    if updated_incidents is not None:
+        # New incidents reach followers through sync_incidents(); updates and archiving only through this
+        documents["incident_updates"] = updated_incidents
+    cluster.state.publish(documents)
+
+ingest_buffer = IngestBuffer(
+    route_ingested,
+    capacity=int(os.getenv("INGEST_BUFFER_CAPACITY", "200000")),
+    flush_size=int(os.getenv("INGEST_FLUSH_SIZE", "20000")),
+    flush_interval=float(os.getenv("INGEST_FLUSH_INTERVAL", "1")),
+)
+_ingest_batch = TypeAdapter(List[IngestSample])
+
+sampler = MetricsSampler(take_sample, interval=SAMPLE_INTERVAL_SECONDS, capacity=SAMPLE_HISTORY_SIZE)
+sampler.add_listener(lambda metrics: broadcaster.publish("metrics", MetricsResponse(**metrics)))
+sampler.add_listener(lambda metrics: response_cache.bump("metrics"))
+
+# How far this worker has caught up with the shared state; incident ids are local, one per shard
+_mirror = {"version": 0, "incident_ids": None}
+
+def sync_cluster(is_leader: bool):
+    """Runs every cluster poll in a worker thread: every worker picks up maintenance changes,
+    streams new incidents and applies token revocations, the leader processes ingest queued by followers, followers
+    adopt the leader's published state"""
+    snapshot = maintenance_cache.refresh()
+    if maintenance_cache.announce(snapshot):
+        broadcaster.publish("maintenance", MaintenanceResponse(**snapshot._asdict()))
+    sync_incidents()
+    if is_leader:
+        drain_ingest_queue()
+
+    for key, version, payload in cluster.state.changes_since(_mirror["version"]):
+        _mirror["version"] = version
+        if payload is None:
+            continue
+        if key.startswith("token_version:"):
+            apply_token_version(int(key.split(":", 1)[1]), payload)
+        elif is_leader:
+            continue  # everything else is the leader's own state
+        elif key == "metrics:local":
+            metrics = dict(payload, timestamp=datetime.fromisoformat(payload["timestamp"]))
+            cluster.loop.call_soon_threadsafe(sampler.record, metrics)
+        elif key == "fleet":
+            fleet.load_snapshot(payload)
+        elif key.startswith("forecast:"):
+            downtime_forecaster.restore(payload)
+        elif key == "incident_updates":
+            response_cache.bump("incidents")
+            for incident in payload:
+                broadcaster.publish("incident", incident)
+
+def drain_ingest_queue():
+    """Write batches followers queued, oldest first. A batch is removed only after it is
+    written, so delivery is at least once: a leader that dies in between leaves it for the next"""
+    for item_id, batch in cluster.state.queued():
+        try:
+            write_ingested([dict(sample, timestamp=datetime.fromisoformat(sample["timestamp"])) for sample in batch])
+        except Exception as e:
+            # Keep it and everything after it queued, in order, for the next poll
+            print(f"❌ Writing queued ingest batch {item_id} failed: {e}")
+            return
+        cluster.state.acknowledge(item_id)
+
+def _incidents_after(db: Session, shard: int, after: Optional[int]):
+    """(newest local id, incidents newer than after) in one shard; only the id when after is None"""
+    if after is None:
+        return db.execute(select(func.max(Incident.id))).scalar() or 0, []
+    rows = db.execute(
+        select(Incident.__table__).where(Incident.id > after).order_by(Incident.id)
+    ).mappings().all()
+    newest = rows[-1]["id"] if rows else after
+    return newest, [dict(row, id=shards.global_id(shard, row["id"])) for row in rows]
+
+def sync_incidents():
+    """Stream incidents any worker has written to the shared database since the last poll"""
+    watermarks = _mirror["incident_ids"]
+    results = shards.for_each(
+        {shard: watermarks[shard] if watermarks else None for shard in range(shards.count)}, _incidents_after
+    )
+    _mirror["incident_ids"] = {shard: newest for shard, (newest, _) in results.items()}
+    incidents = sorted((row for _, rows in results.values() for row in rows),
+                       key=lambda row: (row["timestamp"], row["id"]))
+    if incidents:
+        response_cache.bump("incidents")
+    for incident in incidents:
+        broadcaster.publish("incident", IncidentResponse(**incident))
+
+async def start_leader():
+    """Take over sampling; incident cooldowns and open status intervals are reloaded
+    since a previous leader may have fired rules and recorded samples"""
+    await asyncio.to_thread(_load_leader_state)
+    # Startup does not wait for the first sample; /metrics/live takes one itself if asked first
+    await sampler.start(wait=False)
+
+def _load_leader_state():
+    incident_engine.load_state(shards)
+    sla.load_state(shards)
+
+cluster.on_promote(start_leader)
+cluster.on_poll(sync_cluster)
+
+@router.get("/live", response_model=MetricsResponse)
+async def get_live_metrics(request: Request):
+    # Serialized once per sample; polls between ticks get the cached bytes (or a 304)
+    version = response_cache.version("metrics")
+    cached = response_cache.get("metrics", None, version)
+    if cached is None:
+        metrics = sampler.latest()
+        if metrics is None:
+            if cluster.enabled and not cluster.is_leader:
+                # Followers never sample on their own, or the series would diverge
+                raise HTTPException(status_code=503, detail="Waiting for the first sample from the leader worker")
+            # Sampler hasn't produced anything yet (e.g. lifespan not run)
+            metrics = await sampler.tick()
+            version = response_cache.version("metrics")
+        cached = response_cache.put("metrics", None, version, MetricsResponse(**metrics).model_dump())
+    return response_cache.respond(request, cached)
+
+@router.get("/range", response_model=MetricsRangeResponse)
+async def get_metrics_range(
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    step: int = Query(60, ge=1, description="Desired seconds between points"),
+    host: str = "local"
+):
+    start, end = to_utc_naive(start), to_utc_naive(end)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    try:
+        resolution, points = await shards.run(host, store.query_range, start, end, step, host=host)
+    except ValueError as e:
+        # Every resolution that still covers 'from' would return too many points
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"host": host, "resolution": resolution, "points": points}
+
+@router.post("/ingest", response_model=IngestResponse, status_code=202)
+async def ingest_metrics(request: Request, current_user = Depends(get_current_user)):
+    """Accept samples from host agents as a JSON array or as NDJSON (one sample per line)"""
+    body = await request.body()
+    if "ndjson" in request.headers.get("content-type", ""):
+        body = b"[" + b",".join(line for line in body.splitlines() if line.strip()) + b"]"
+    try:
+        parsed = _ingest_batch.validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    if len(parsed) > INGEST_MAX_SAMPLES:
+        raise HTTPException(status_code=413, detail=f"At most {INGEST_MAX_SAMPLES} samples per request")
+
+    received_at = datetime.utcnow()
+    samples = [
+        {
+            "host": s.host,
+            "timestamp": to_utc_naive(s.timestamp) if s.timestamp else received_at,
+            "status": s.status or classify_status(s.error_rate, s.response_time),
+            "cpu": s.cpu,
+            "ram": s.ram,
+            "response_time": s.response_time,
+            "error_rate": s.error_rate,
+            "db_latency": s.db_latency,
+        }
+        for s in parsed
+    ]
+    if not ingest_buffer.offer(samples):
+        raise HTTPException(
+            status_code=429,
+            detail="Ingest buffer is full, retry later",
+            headers={"Retry-After": str(max(1, round(ingest_buffer.flush_interval)))},
+        )
+    return {"accepted": len(samples), "buffered": ingest_buffer.buffered}
+
+@router.get("/fleet/summary", response_model=FleetSummaryResponse)
+async def get_fleet_summary():
+    return fleet.summary()
+
+@router.get("/fleet/top", response_model=List[FleetHostMetrics])
+async def get_fleet_top_hosts(
+    by: Literal["error_rate", "response_time", "cpu", "ram", "db_latency"] = "error_rate",
+    k: int = Query(10, ge=1, le=1000)
+):
+    return fleet.top(by, k)
+
+@router.get("/fleet/services", response_model=List[FleetServiceSummary])
+async def get_fleet_services():
+    return fleet.by_service()
+
+@router.get("/stream")
+async def stream_events():
+    """Server-Sent Events feed of metrics samples, new incidents and maintenance changes"""
+    snapshot = [format_event("maintenance", MaintenanceResponse(**maintenance_cache.get()._asdict()))]
+    latest = sampler.latest()
+    if latest:
+        snapshot.append(format_event("metrics", MetricsResponse(**latest)))
+
+    async def event_source():
+        queue = broadcaster.subscribe()
+        try:
+            for message in snapshot:
+                yield message
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,18 +1,52 @@
-from fastapi import APIRouter, Depends
-from database import get_db
-from schemas import UpdateRiskRequest, UpdateRiskResponse
-from services.risk_predictor import RiskPredictor
+import asyncio
+import os
+import threading
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from database import SessionLocal, get_db, to_utc_naive
+from models import UpdateOutcome
+from schemas import (
+    UpdateRiskRequest, UpdateRiskResponse, UpdateOutcomeCreate, RiskModelInfo, DowntimeForecastResponse,
+)
+from services.downtime_forecaster import downtime_forecaster
 from auth import get_current_user
 
+MAX_BATCH_SIZE = 1000
+
 router = APIRouter(prefix="/predict", tags=["predict"])
+# The predictor and model registry are built on first use, keeping their imports off startup
+_risk = {"registry": None, "predictor": None}
+_risk_lock = threading.Lock()
+
+def get_predictor():
+    """The shared RiskPredictor, backed by the model registry in RISK_MODEL_DIR; blocking on first use"""
+    if _risk["predictor"] is None:
+        # Concurrent first requests must not build (and load the model) twice
+        with _risk_lock:
+            if _risk["predictor"] is None:
+                from services.risk_model import RiskModelRegistry
+                from services.risk_predictor import RiskPredictor
+                registry = RiskModelRegistry(os.getenv("RISK_MODEL_DIR", "./risk_models"))
+                _risk["registry"], _risk["predictor"] = registry, RiskPredictor(registry)
+    return _risk["predictor"]
+
+def get_model_registry():
+    get_predictor()
+    return _risk["registry"]
+
+async def load_predictor():
+    """get_predictor for request handlers: the first call builds it in a thread, off the event loop"""
+    if _risk["predictor"] is None:
+        await asyncio.to_thread(get_predictor)
+    return _risk["predictor"]
 
 @router.post("/update-risk", response_model=UpdateRiskResponse)
 async def predict_update_risk(
     request: UpdateRiskRequest,
-    db = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    predictor = RiskPredictor()
+    predictor = await load_predictor()
     result = predictor.predict_risk(
         update_title=request.update_title,
         update_type=request.update_type,
@@ -22,3 +56,67 @@ async def predict_update_risk(
         description=request.description
     )
     return UpdateRiskResponse(**result)
+
+@router.post("/update-risk/batch", response_model=List[UpdateRiskResponse])
+async def predict_update_risk_batch(
+    requests: List[UpdateRiskRequest],
+    current_user = Depends(get_current_user)
+):
+    """Score a whole release train in one call; results follow the input order"""
+    if len(requests) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BATCH_SIZE} updates per batch",
+        )
+    predictor = await load_predictor()
+    return predictor.predict_batch([request.model_dump() for request in requests])
+
+@router.post("/outcomes")
+async def record_update_outcome(
+    outcome: UpdateOutcomeCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Record how a deployment actually went so the risk model can learn from it"""
+    data = outcome.model_dump()
+    data["services_affected"] = ",".join(data["services_affected"])
+    data["deployed_at"] = to_utc_naive(data["deployed_at"])
+    db_outcome = UpdateOutcome(**data)
+    db.add(db_outcome)
+    await db.commit()
+    return {"id": db_outcome.id, "message": "Outcome recorded"}
+
+@router.get("/model", response_model=RiskModelInfo)
+async def get_risk_model():
+    await load_predictor()
+    model = _risk["registry"].current()
+    return model.meta if model else {}
+
+def _train() -> dict:
+    db = SessionLocal()
+    try:
+        from services.risk_model import train_and_publish
+        return train_and_publish(db, get_predictor(), get_model_registry())
+    finally:
+        db.close()
+
+@router.post("/model/train", response_model=RiskModelInfo)
+async def train_risk_model(current_user = Depends(get_current_user)):
+    """Retrain on recorded outcomes and hot-swap the new model in"""
+    try:
+        return await asyncio.to_thread(_train)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/downtime", response_model=DowntimeForecastResponse)
+async def predict_downtime(host: str = "local"):
+    """Probability that a host goes down within the forecast horizon, from its live metrics"""
+    forecast = downtime_forecaster.latest(host)
+    if forecast is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No metrics seen for host {host}")
+    return forecast._asdict()
+
+@router.get("/downtime/at-risk", response_model=List[DowntimeForecastResponse])
+async def predict_downtime_at_risk(limit: int = Query(10, ge=1, le=100)):
+    """Hosts most likely to go down soon, highest probability first"""
+    return [forecast._asdict() for forecast in downtime_forecaster.at_risk(limit)]
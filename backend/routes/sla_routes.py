@@ -0,0 +1,63 @@
+import os
+from fastapi import APIRouter, HTTPException, Query
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional
+from database import shards, to_utc_naive
+from schemas import SlaReport, SlaSummary, SlaDayReport, SlaInterval
+from routes.metrics_routes import sla
+
+# Default for the policy query parameter: which maintenance does not count against availability
+SLA_MAINTENANCE_POLICY = os.getenv("SLA_MAINTENANCE_POLICY", "scheduled")
+SUMMARY_WINDOWS = {"24h": timedelta(hours=24), "7d": timedelta(days=7), "30d": timedelta(days=30),
+                   "90d": timedelta(days=90)}
+
+router = APIRouter(prefix="/sla", tags=["sla"])
+Policy = Optional[Literal["scheduled", "all", "none"]]
+
+def _summary(db, host: str, policy: str, now: datetime) -> dict:
+    return {
+        "host": host,
+        "policy": policy,
+        "windows": {label: sla.report(db, host, now - span, now, policy) for label, span in SUMMARY_WINDOWS.items()},
+    }
+
+@router.get("", response_model=SlaSummary)
+async def get_sla_summary(host: str = "local", policy: Policy = None):
+    """Availability over the last 24 hours, 7, 30 and 90 days"""
+    return await shards.run(host, _summary, host, policy or SLA_MAINTENANCE_POLICY, datetime.utcnow())
+
+@router.get("/report", response_model=SlaReport)
+async def get_sla_report(
+    start: datetime = Query(..., alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    host: str = "local",
+    policy: Policy = None
+):
+    start, end = to_utc_naive(start), to_utc_naive(end) if end else datetime.utcnow()
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    return await shards.run(host, sla.report, host, start, end, policy or SLA_MAINTENANCE_POLICY)
+
+@router.get("/daily", response_model=List[SlaDayReport])
+async def get_sla_daily(
+    days: int = Query(30, ge=1, le=3660),
+    host: str = "local",
+    policy: Policy = None
+):
+    """Availability per UTC day with data, oldest first"""
+    today = datetime.utcnow().date()
+    return await shards.run(host, sla.daily, host, today - timedelta(days=days - 1), today,
+                            policy or SLA_MAINTENANCE_POLICY)
+
+@router.get("/intervals", response_model=List[SlaInterval])
+async def get_sla_intervals(
+    start: datetime = Query(..., alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    host: str = "local",
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """Status intervals overlapping the window, oldest first"""
+    start, end = to_utc_naive(start), to_utc_naive(end) if end else datetime.utcnow()
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    return await shards.run(host, sla.intervals, host, start, end, limit)
@@ -0,0 +1,58 @@
+import os
+from fastapi import APIRouter, Request
+from datetime import datetime, timedelta
+from database import shards
+from schemas import IncidentResponse, MaintenanceResponse, StatusPageResponse
+from services.event_broadcaster import broadcaster
+from services.maintenance_cache import maintenance_cache
+from services.response_cache import response_cache
+from services.status_timeline import StatusTimeline
+from routes.metrics_routes import SAMPLE_INTERVAL_SECONDS, sampler
+from routes.maintenance_routes import maintenance_scheduler
+
+STATUS_DAYS = int(os.getenv("STATUS_PAGE_DAYS", "30"))
+
+router = APIRouter(prefix="/status", tags=["status"])
+status_timeline = StatusTimeline(shards, days=STATUS_DAYS, sample_interval=SAMPLE_INTERVAL_SECONDS)
+_page = {"expires": None}  # next window start or end shown on the cached page
+
+def load_timeline():
+    """Rebuild the day counters from the database; run once at startup before sampling"""
+    status_timeline.load()
+
+def on_sample(metrics: dict):
+    if status_timeline.record_sample(metrics):
+        response_cache.bump("status")
+
+def on_incident(incident):
+    status_timeline.record_incident(IncidentResponse.model_validate(incident))
+    response_cache.bump("status")
+
+# Every worker sees every sample, incident and maintenance change, so each keeps its own copy current
+sampler.add_listener(on_sample)
+broadcaster.add_listener("incident", on_incident)
+broadcaster.add_listener("maintenance", lambda maintenance: response_cache.bump("status"))
+
+@router.get("", response_model=StatusPageResponse)
+async def get_status_page(request: Request):
+    """Everything the public status page shows, as one document rebuilt only when something changed"""
+    snapshot = maintenance_cache.get()
+    if _page["expires"] is not None and datetime.utcnow() >= _page["expires"]:
+        # A listed window started or ended since the page was built
+        response_cache.bump("status")
+    version = response_cache.version("status")
+    # Keyed by the maintenance version too, so a toggle seen through another worker's signal is never stale
+    cached = response_cache.get("status", snapshot.version, version)
+    if cached is None:
+        now = datetime.utcnow()
+        windows = maintenance_scheduler.timeline(now, timedelta(days=STATUS_DAYS))
+        boundaries = [w["ends_at"] for w in windows["active"]] + [w["starts_at"] for w in windows["upcoming"]]
+        _page["expires"] = min(boundaries, default=None)
+        data = StatusPageResponse(
+            generated_at=now,
+            maintenance=MaintenanceResponse(**snapshot._asdict()),
+            windows=windows,
+            **status_timeline.snapshot(now),
+        ).model_dump()
+        cached = response_cache.put("status", snapshot.version, version, data)
+    return response_cache.respond(request, cached)
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field
+from typing import Dict, List, Literal, Optional
+from datetime import date, datetime
 
 # Auth schemas
 class LoginRequest(BaseModel):
@@ -21,6 +21,74 @@ class MetricsResponse(BaseModel):
     db_latency: float
     timestamp: datetime
 
+# Metrics history schemas
+class MetricStats(BaseModel):
+    min: float
+    max: float
+    avg: float
+    p95: float
+
+class MetricsRangePoint(BaseModel):
+    timestamp: datetime
+    samples: int
+    cpu: MetricStats
+    ram: MetricStats
+    response_time: MetricStats
+    error_rate: MetricStats
+    db_latency: MetricStats
+
+class MetricsRangeResponse(BaseModel):
+    host: str
+    resolution: int  # seconds per point, 0 for raw samples
+    points: List[MetricsRangePoint]
+
+# Ingest schemas
+class IngestSample(BaseModel):
+    host: str = Field(..., min_length=1, max_length=255)
+    timestamp: Optional[datetime] = None  # ISO 8601 or epoch seconds; defaults to receive time
+    status: Optional[Literal["operational", "degraded", "down", "maintenance"]] = None  # derived if omitted
+    cpu: float
+    ram: float
+    response_time: float
+    error_rate: float
+    db_latency: float
+
+class IngestResponse(BaseModel):
+    accepted: int
+    buffered: int
+
+# Fleet schemas
+class FleetSummaryResponse(BaseModel):
+    timestamp: datetime
+    hosts: int
+    status_counts: Dict[str, int]
+    percentiles: Dict[str, Dict[str, float]]  # metric -> {"p50": ..., "p95": ...}
+
+class FleetHostMetrics(BaseModel):
+    host: str
+    service: str
+    status: str
+    cpu: float
+    ram: float
+    response_time: float
+    error_rate: float
+    db_latency: float
+
+class FleetGroupStats(BaseModel):
+    avg: float
+    p95: float
+    max: float
+
+class FleetServiceSummary(BaseModel):
+    service: str
+    hosts: int
+    status_counts: Dict[str, int]
+    cpu: FleetGroupStats
+    ram: FleetGroupStats
+    response_time: FleetGroupStats
+    error_rate: FleetGroupStats
+    db_latency: FleetGroupStats
+
 # Incident schemas
 class IncidentCreate(BaseModel):
     severity: str
@@ -32,19 +100,103 @@ class IncidentResponse(BaseModel):
     severity: str
     message: str
     status: str
+    occurrences: int = 1
+    last_seen: Optional[datetime] = None
+    resolved_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
 
+class IncidentCount(BaseModel):
+    count: int
+
 # Maintenance schemas
 class MaintenanceResponse(BaseModel):
     enabled: bool
     eta_minutes: Optional[int] = None
     enabled_at: Optional[datetime] = None
+    window_id: Optional[int] = None  # scheduled window that switched it on
 
 class MaintenanceEnable(BaseModel):
     eta_minutes: int
 
+class MaintenanceWindowCreate(BaseModel):
+    title: str = Field(..., min_length=1, max_length=200)
+    starts_at: datetime
+    duration_minutes: int = Field(..., ge=1)
+    recurrence: Literal["none", "daily", "weekly"] = "none"
+    repeat_every: int = Field(1, ge=1)  # every N days/weeks
+    ends_on: Optional[datetime] = None
+
+class MaintenanceWindowResponse(BaseModel):
+    id: int
+    title: str
+    starts_at: datetime
+    duration_minutes: int
+    recurrence: str
+    repeat_every: int
+    ends_on: Optional[datetime] = None
+    next_start: Optional[datetime] = None  # occurrence in progress or next to start
+    
+    class Config:
+        from_attributes = True
+
+class MaintenanceOccurrence(BaseModel):
+    window_id: int
+    title: str
+    starts_at: datetime
+    ends_at: datetime
+
+# SLA schemas
+class SlaTotals(BaseModel):
+    availability: Optional[float] = None  # percent of counted time that was up; None without data
+    uptime_seconds: float  # operational or degraded
+    downtime_seconds: float  # down, plus maintenance the policy does not exclude
+    excluded_seconds: float  # maintenance excluded by the policy
+    seconds: Dict[str, float]  # per status; maintenance split into manual and scheduled_maintenance
+
+class SlaReport(SlaTotals):
+    host: str
+    start: datetime
+    end: datetime
+    policy: str
+    unobserved_seconds: float  # no samples, e.g. while the service was not running
+
+class SlaSummary(BaseModel):
+    host: str
+    policy: str
+    windows: Dict[str, SlaReport]  # "24h", "7d", "30d", "90d"
+
+class SlaDayReport(SlaTotals):
+    date: date
+
+class SlaInterval(BaseModel):
+    status: str
+    started_at: datetime
+    ended_at: datetime
+
+# Status page schemas
+class StatusDay(BaseModel):
+    date: str  # UTC day, YYYY-MM-DD
+    uptime: Optional[float] = None  # percent of sampled time not down, maintenance excluded
+    down_minutes: float
+    maintenance_minutes: float
+    incidents: int
+
+class StatusMaintenanceWindows(BaseModel):
+    active: List[MaintenanceOccurrence]
+    upcoming: List[MaintenanceOccurrence]
+    past: List[MaintenanceOccurrence]
+
+class StatusPageResponse(BaseModel):
+    generated_at: datetime
+    status: Optional[str] = None  # latest sample's status
+    maintenance: MaintenanceResponse
+    uptime: Dict[str, Optional[float]]  # "today", "7d", "30d"
+    days: List[StatusDay]  # oldest first
+    windows: StatusMaintenanceWindows
+    incidents: List[IncidentResponse]  # most recent first
+
 # Update prediction schemas
 class UpdateRiskRequest(BaseModel):
     update_title: str
@@ -61,3 +213,31 @@ class UpdateRiskResponse(BaseModel):
     predicted_downtime_max: int
     reasons: List[str]
     recommendations: List[str]
+
+
+class UpdateOutcomeCreate(UpdateRiskRequest):
+    deployed_at: datetime
+    actual_downtime_minutes: Optional[int] = None
+    caused_incident: Optional[bool] = None
+
+class RiskModelInfo(BaseModel):
+    version: Optional[int] = None
+    trained_at: Optional[str] = None
+    samples: Optional[int] = None
+    positive_rate: Optional[float] = None
+    training_accuracy: Optional[float] = None
+
+class MetricForecast(BaseModel):
+    level: float
+    trend_per_minute: float
+    forecast: float  # expected value at the end of the horizon
+    zscore: float
+
+class DowntimeForecastResponse(BaseModel):
+    host: str
+    timestamp: datetime
+    samples: int
+    horizon_minutes: float
+    probability: float  # chance of going down within horizon_minutes
+    metrics: Dict[str, MetricForecast]
+    anomalies: List[str]  # metrics whose latest sample is a statistical outlier
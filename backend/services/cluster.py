@@ -0,0 +1,239 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import IngestQueueItem, SharedState
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Exclusive lock on a file, held until release() or process exit.
+
+    The operating system drops the lock when the holder dies, so a crashed
+    leader never leaves a stale lock behind.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def acquire(self, blocking: bool = False) -> bool:
+        if self._file is not None:
+            return True
+        f = open(self.path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class SharedStateStore:
+    """Key/value JSON documents in SQLite with a monotonically increasing version.
+
+    The leader upserts most documents, and any worker may publish a token
+    revocation; readers ask for everything newer than the highest version they
+    have seen, which is a single indexed range scan that returns nothing when
+    nobody has published.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+
+    def publish(self, documents: Dict[str, object]):
+        if not documents:
+            return
+        with self._lock:
+            self._write(documents)
+
+    def _write(self, documents: Dict[str, object]):
+        payloads = {key: json.dumps(jsonable_encoder(value), separators=(",", ":")) for key, value in documents.items()}
+        statement = sqlite_insert(SharedState)
+        statement = statement.on_conflict_do_update(
+            index_elements=[SharedState.key],
+            set_={"version": statement.excluded.version, "payload": statement.excluded.payload},
+        )
+        db = self.session_factory()
+        try:
+            # Versions must become visible in order, or a reader could skip past an
+            # earlier version still being committed; taking the write lock before
+            # choosing the version orders publishes from every worker process
+            db.execute(text("BEGIN IMMEDIATE"))
+            latest = db.scalar(select(func.max(SharedState.version))) or 0
+            # Wall-clock based so versions keep growing even if the table is cleared
+            version = max(latest + 1, time.time_ns())
+            db.execute(statement, [{"key": key, "version": version, "payload": payload}
+                                   for key, payload in payloads.items()])
+            db.commit()
+        finally:
+            db.close()
+
+    def changes_since(self, version: int) -> List[tuple]:
+        """(key, version, decoded payload) for documents newer than version, oldest first"""
+        db = self.session_factory()
+        try:
+            rows = db.execute(
+                select(SharedState.key, SharedState.version, SharedState.payload)
+                .where(SharedState.version > version)
+                .order_by(SharedState.version)
+            ).all()
+        finally:
+            db.close()
+        return [(key, row_version, json.loads(payload)) for key, row_version, payload in rows]
+
+    def enqueue(self, items: List[dict]):
+        db = self.session_factory()
+        try:
+            db.add(IngestQueueItem(payload=json.dumps(jsonable_encoder(items), separators=(",", ":"))))
+            db.commit()
+        finally:
+            db.close()
+
+    def queued(self, limit: int = 100) -> List[tuple]:
+        """(id, batch) for up to limit queued batches, oldest first. They stay queued
+        until acknowledge(), so a batch the leader fails to write is not lost"""
+        db = self.session_factory()
+        try:
+            rows = db.execute(
+                select(IngestQueueItem.id, IngestQueueItem.payload).order_by(IngestQueueItem.id).limit(limit)
+            ).all()
+        finally:
+            db.close()
+        return [(item_id, json.loads(payload)) for item_id, payload in rows]
+
+    def acknowledge(self, item_id: int):
+        """Remove a queued batch once it has been written"""
+        db = self.session_factory()
+        try:
+            db.execute(delete(IngestQueueItem).where(IngestQueueItem.id == item_id))
+            db.commit()
+        finally:
+            db.close()
+
+
+class ClusterCoordinator:
+    """Elects one worker to own sampling and incident detection.
+
+    With a single worker the process is simply the leader. In multi-worker
+    mode every worker races for a file lock: the winner runs the promote
+    callbacks (start sampling) and publishes its state, while the others
+    mirror that state from the poll callbacks. Followers
+    keep retrying the lock, so one takes over within a poll interval when
+    the leader exits.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], lock_path: str, enabled: bool,
+                 poll_interval: float = 0.5):
+        self.enabled = enabled
+        self.poll_interval = poll_interval
+        self.lock = FileLock(lock_path)
+        self.state = SharedStateStore(session_factory)
+        self.is_leader = False
+        self.loop: Optional[asyncio.AbstractEventLoop] = None  # for poll callbacks to hand results back
+        self._on_promote: List[Callable[[], Awaitable[None]]] = []
+        self._on_poll: List[Callable[[bool], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def on_promote(self, callback: Callable[[], Awaitable[None]]):
+        """Register a coroutine function run once when this worker becomes leader"""
+        self._on_promote.append(callback)
+
+    def on_poll(self, callback: Callable[[bool], None]):
+        """Register a blocking function run in a thread every poll with is_leader"""
+        self._on_poll.append(callback)
+
+    async def _promote(self):
+        self.is_leader = True
+        if self.enabled:
+            print(f"✅ Worker {os.getpid()} elected leader")
+        for callback in self._on_promote:
+            await callback()
+
+    def _poll_once(self):
+        for callback in self._on_poll:
+            try:
+                callback(self.is_leader)
+            except Exception as e:
+                print(f"❌ Cluster poll failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self.is_leader and await asyncio.to_thread(self.lock.acquire):
+                await self._promote()
+            await asyncio.to_thread(self._poll_once)
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        if not self.enabled:
+            await self._promote()
+            return
+        if await asyncio.to_thread(self.lock.acquire):
+            await self._promote()
+        else:
+            print(f"✅ Worker {os.getpid()} following the leader")
+            # Mirror the leader's state before serving requests
+            await asyncio.to_thread(self._poll_once)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.lock.release()
+        self.is_leader = False
+
+
+# main.py sets MULTI_WORKER when it starts several workers; also honour uvicorn/gunicorn's WEB_CONCURRENCY
+MULTI_WORKER = os.getenv("MULTI_WORKER") == "1" or int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+
+cluster = ClusterCoordinator(
+    SessionLocal,
+    lock_path=os.getenv("CLUSTER_LOCK_FILE", "./uptimeguard.leader"),
+    enabled=MULTI_WORKER,
+    poll_interval=float(os.getenv("CLUSTER_POLL_INTERVAL", "0.5")),
+)
@@ -0,0 +1,185 @@
+import heapq
+import math
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from services.metrics_sampler import METRIC_FIELDS
+from services.metrics_simulator import DOWN_THRESHOLDS
+
+DowntimeForecast = namedtuple("DowntimeForecast", ["host", "timestamp", "samples", "horizon_minutes",
+                                                   "probability", "metrics", "anomalies"])
+# Forecasts stay at zero until a host has this many samples
+MIN_SAMPLES = 10
+ANOMALY_ZSCORE = 3.0
+# One-step errors beyond this many mean absolute errors are clipped when updating level and trend
+OUTLIER_LIMIT = 4.0
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _exceed_probability(mean: float, sigma: float, threshold: float) -> float:
+    """P(X > threshold) for X ~ Normal(mean, sigma)"""
+    if sigma <= 0:
+        return 1.0 if mean > threshold else 0.0
+    return 0.5 * math.erfc((threshold - mean) / (sigma * math.sqrt(2)))
+
+
+class MetricState:
+    """O(1) streaming statistics for one metric of one host.
+
+    Holt's linear method on irregular time gives a level and a per-second
+    trend; exponentially weighted mean/variance give a z-score for each new
+    sample, and the weighted mean absolute one-step forecast error sizes the
+    uncertainty of longer forecasts. The trend is damped per sample step so
+    a short burst cannot be extrapolated across the whole horizon.
+    """
+
+    __slots__ = ("level", "trend", "mean", "var", "error", "step", "last_time", "zscore")
+
+    def __init__(self, value: float, now: float):
+        self.level = value
+        self.trend = 0.0
+        self.mean = value
+        self.var = 0.0
+        self.error = 0.0
+        self.step = 0.0  # weighted seconds between samples
+        self.last_time = now
+        self.zscore = 0.0
+
+    def update(self, value: float, now: float, alpha: float, beta: float, gamma: float):
+        dt = max(now - self.last_time, 1e-3)
+        predicted = self.level + self.trend * dt
+        error = value - predicted
+        limit = OUTLIER_LIMIT * self.error
+        # Huber-style clipping: a brief spike nudges the level instead of
+        # dragging level and trend with it, while a lasting shift is still
+        # absorbed because the error scale keeps growing until it fits
+        clipped = max(-limit, min(limit, error)) if limit > 0 else error
+        self.error += gamma * (abs(error) - self.error)
+        self.step = dt if self.step == 0 else self.step + gamma * (dt - self.step)
+
+        self.zscore = (value - self.mean) / math.sqrt(self.var) if self.var > 0 else 0.0
+        diff = value - self.mean
+        increment = gamma * diff
+        self.mean += increment
+        self.var = (1 - gamma) * (self.var + diff * increment)
+
+        level = predicted + alpha * clipped
+        self.trend = beta * (level - self.level) / dt + (1 - beta) * self.trend
+        self.level = level
+        self.last_time = now
+
+    def _steps(self, seconds: float) -> float:
+        return seconds / self.step if self.step > 0 else 1.0
+
+    def forecast(self, seconds: float, damping: float = 1.0) -> float:
+        if damping >= 1.0:
+            return self.level + self.trend * seconds
+        steps = self._steps(seconds)
+        # Sum of damping**k for k = 1..steps: the trend's total contribution, in steps
+        damped_steps = damping * (1 - damping ** steps) / (1 - damping)
+        return self.level + self.trend * self.step * damped_steps
+
+    def spread(self, seconds: float, damping: float) -> float:
+        """Forecast standard deviation, saturating like a mean-reverting process"""
+        steps = self._steps(seconds)
+        sigma = 1.25 * self.error  # mean absolute error to standard deviation under normality
+        return sigma * math.sqrt((1 - damping ** (2 * steps + 2)) / (1 - damping ** 2))
+
+
+class DowntimeForecaster:
+    """Estimates per host the probability of going down within a horizon.
+
+    Each observed sample updates every metric's MetricState in constant time.
+    For the metrics that define "down" (DOWN_THRESHOLDS) the forecast peak
+    over the horizon is compared to the threshold under a normal error
+    model, and the per-metric probabilities are combined as independent.
+    """
+
+    def __init__(self, horizon_minutes: float = 10, alpha: float = 0.3, beta: float = 0.03,
+                 gamma: float = 0.05, damping: float = 0.99, thresholds: Optional[Dict[str, float]] = None):
+        self.horizon_minutes = horizon_minutes
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.damping = damping
+        self.thresholds = thresholds or DOWN_THRESHOLDS
+        self._states: Dict[str, Dict[str, MetricState]] = {}
+        self._counts: Dict[str, int] = {}
+        self._latest: Dict[str, DowntimeForecast] = {}
+        self._updated: Set[str] = set()  # hosts with forecasts not yet handed out by drain_updated()
+        self._lock = threading.Lock()
+
+    def observe(self, host: str, metrics: dict) -> DowntimeForecast:
+        """Fold one sample into the host's statistics and return its new forecast"""
+        timestamp = metrics["timestamp"]
+        now = (timestamp - _EPOCH).total_seconds()
+        with self._lock:
+            if metrics.get("status") == "maintenance":
+                # Maintenance readings say nothing about the service's health
+                forecast = self._latest.get(host)
+                if forecast is not None:
+                    return forecast._replace(probability=0.0)
+                return DowntimeForecast(host, timestamp, 0, self.horizon_minutes, 0.0, {}, [])
+            states = self._states.get(host)
+            if states is None:
+                states = {field: MetricState(metrics[field], now) for field in METRIC_FIELDS}
+                self._states[host] = states
+            else:
+                for field in METRIC_FIELDS:
+                    states[field].update(metrics[field], now, self.alpha, self.beta, self.gamma)
+            count = self._counts.get(host, 0) + 1
+            self._counts[host] = count
+            forecast = self._forecast(host, timestamp, count, states)
+            self._latest[host] = forecast
+            self._updated.add(host)
+            return forecast
+
+    def _forecast(self, host: str, timestamp: datetime, count: int,
+                  states: Dict[str, MetricState]) -> DowntimeForecast:
+        horizon = self.horizon_minutes * 60
+        metrics = {}
+        for field, state in states.items():
+            metrics[field] = {
+                "level": round(state.level, 4),
+                "trend_per_minute": round(state.trend * 60, 4),
+                "forecast": round(state.forecast(horizon, self.damping), 4),
+                "zscore": round(state.zscore, 3),
+            }
+        anomalies = [field for field, state in states.items() if abs(state.zscore) >= ANOMALY_ZSCORE]
+
+        probability = 0.0
+        if count >= MIN_SAMPLES:
+            stay_up = 1.0
+            for field, threshold in self.thresholds.items():
+                state = states[field]
+                # The damped trend is monotonic, so the peak over the horizon is at one of its ends
+                peak = max(state.level, state.forecast(horizon, self.damping))
+                stay_up *= 1.0 - _exceed_probability(peak, state.spread(horizon, self.damping), threshold)
+            probability = round(1.0 - stay_up, 4)
+        return DowntimeForecast(host, timestamp, count, self.horizon_minutes, probability, metrics, anomalies)
+
+    def latest(self, host: str = "local") -> Optional[DowntimeForecast]:
+        return self._latest.get(host)
+
+    def drain_updated(self) -> List[DowntimeForecast]:
+        """Forecasts that changed since the last call"""
+        with self._lock:
+            hosts, self._updated = self._updated, set()
+            return [self._latest[host] for host in hosts]
+
+    def restore(self, data: dict):
+        """Adopt a forecast computed by another worker"""
+        forecast = DowntimeForecast(**dict(data, timestamp=datetime.fromisoformat(data["timestamp"])))
+        with self._lock:
+            self._latest[forecast.host] = forecast
+
+    def at_risk(self, limit: int = 10) -> List[DowntimeForecast]:
+        """Hosts with the highest current probability of going down"""
+        return heapq.nlargest(limit, list(self._latest.values()), key=lambda f: f.probability)
+
+
+downtime_forecaster = DowntimeForecaster(
+    horizon_minutes=float(os.getenv("FORECAST_HORIZON_MINUTES", "10")),
+)
@@ -0,0 +1,73 @@
+import asyncio
+import json
+from typing import Callable, Dict, List, Optional, Set
+from fastapi.encoders import jsonable_encoder
+
+
+def format_event(event: str, data) -> bytes:
+    """Encode a payload as a Server-Sent Events message"""
+    payload = json.dumps(jsonable_encoder(data), separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n".encode()
+
+
+class EventBroadcaster:
+    """Fans out events from a single producer to every stream subscriber.
+
+    Each subscriber gets its own bounded queue. When a slow client's queue is
+    full the oldest message is dropped, so one stalled connection never holds
+    up the others or grows memory without bound.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._listeners: Dict[str, List[Callable]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def add_listener(self, event: str, callback: Callable):
+        """Register a callback run in the publishing thread with the data of every such event"""
+        self._listeners.setdefault(event, []).append(callback)
+
+    def publish(self, event: str, data):
+        """Broadcast an event; safe to call from worker threads"""
+        for callback in self._listeners.get(event, ()):
+            try:
+                callback(data)
+            except Exception as e:
+                print(f"❌ Event listener failed: {e}")
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+        message = format_event(event, data)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(message)
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(self._deliver, message)
+
+    def _deliver(self, message: bytes):
+        for queue in list(self._subscribers):
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(message)
+
+
+broadcaster = EventBroadcaster()
@@ -0,0 +1,88 @@
+import json
+import math
+import os
+from datetime import date, datetime
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is used instead
+    orjson = None
+
+# Opt-in: set FAST_JSON=1 (with orjson installed) to encode responses with orjson
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1" and orjson is not None
+
+_INT64 = 2 ** 63
+_SIMPLE = (str, bool, type(None))
+_PLAIN = {str, int, float, bool, type(None)}
+# Pydantic writes a zero UTC offset as "Z" where isoformat() gives "+00:00"
+_DATETIME = TypeAdapter(datetime)
+
+
+def _format_datetime(value: datetime) -> str:
+    return value.isoformat() if value.tzinfo is None else _DATETIME.dump_python(value, mode="json")
+
+
+def _encodable(value):
+    """What jsonable_encoder(Model.model_validate(...)) yields for plain rows, without its per-value overhead"""
+    if type(value) in _PLAIN:
+        return value
+    if isinstance(value, datetime):
+        return _format_datetime(value)
+    if type(value) is dict and all(type(key) is str for key in value):
+        return {key: _encodable(item) for key, item in value.items()}
+    if type(value) in (list, tuple):
+        return [_encodable(item) for item in value]
+    return jsonable_encoder(value, custom_encoder={datetime: _format_datetime})
+
+
+def render_json(data) -> bytes:
+    """Encode data exactly like FastAPI's JSONResponse for a response_model"""
+    return json.dumps(
+        _encodable(data), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _orjson_compatible(value) -> bool:
+    """True if orjson writes this value byte-for-byte like json.dumps.
+
+    The two differ only for floats Python prints in exponent form ("1e-05"
+    vs "1e-5"), NaN/infinity (rejected vs null), integers beyond 64 bits, UTC
+    offsets with seconds and types only jsonable_encoder knows.
+    """
+    if isinstance(value, _SIMPLE):
+        return True
+    if isinstance(value, int):
+        return -_INT64 <= value < _INT64
+    if isinstance(value, float):
+        return value == 0 or (math.isfinite(value) and 1e-4 <= abs(value) < 1e16)
+    if isinstance(value, datetime):
+        # orjson rounds offsets that are not whole minutes
+        offset = value.utcoffset()
+        return offset is None or not (offset.seconds % 60 or offset.microseconds)
+    if isinstance(value, date):
+        return True
+    if isinstance(value, dict):
+        return all(type(key) is str and _orjson_compatible(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return all(_orjson_compatible(item) for item in value)
+    return False
+
+
+def dumps(data) -> bytes:
+    """JSON bytes identical to render_json(data), using orjson when enabled and safe"""
+    if FAST_JSON and _orjson_compatible(data):
+        return orjson.dumps(data, option=orjson.OPT_UTC_Z)
+    return render_json(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that renders with orjson when FAST_JSON=1; the bytes are unchanged"""
+
+    def render(self, content) -> bytes:
+        # FastAPI has already run jsonable_encoder over content
+        if FAST_JSON and _orjson_compatible(content):
+            return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+        return super().render(content)
@@ -0,0 +1,199 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from services.metrics_sampler import METRIC_FIELDS, STATUSES
+from services.metrics_simulator import DEGRADED_THRESHOLDS, DOWN_THRESHOLDS, SystemClock
+
+DEFAULT_SERVICES = ("api", "web", "auth", "payments", "database", "worker")
+
+# (initial base, min, max, smoothing variation) for each metric, matching MetricsSimulator
+BASELINES = {
+    "cpu": (30.0, 10, 90, 0.15),
+    "ram": (45.0, 20, 85, 0.12),
+    "response_time": (150.0, 50, 2000, 0.2),
+    "error_rate": (0.5, 0, 20, 0.25),
+    "db_latency": (25.0, 10, 200, 0.15),
+}
+# (low, high) multiplier and cap applied while a host is spiking
+SPIKES = {
+    "cpu": (1.5, 2.5, 95),
+    "ram": (1.3, 1.8, 90),
+    "response_time": (2, 4, 2000),
+    "error_rate": (3, 6, 20),
+    "db_latency": (2, 3, 200),
+}
+# Uniform ranges reported while the fleet is in maintenance
+MAINTENANCE_RANGES = {
+    "cpu": (10, 30),
+    "ram": (20, 40),
+    "response_time": (200, 500),
+    "error_rate": (0, 2),
+    "db_latency": (30, 60),
+}
+_OPERATIONAL = STATUSES.index("operational")
+_DEGRADED = STATUSES.index("degraded")
+_DOWN = STATUSES.index("down")
+_IN_MAINTENANCE = STATUSES.index("maintenance")
+
+
+class FleetSnapshot:
+    """Immutable view of every host's metrics at one tick"""
+
+    def __init__(self, timestamp: datetime, values: Dict[str, np.ndarray], status: np.ndarray):
+        self.timestamp = timestamp
+        self.values = values
+        self.status = status
+
+
+class FleetSimulator:
+    """Simulates many hosts at once, holding per-host state in NumPy arrays.
+
+    step() advances the whole fleet with vectorized operations, drawing spikes
+    independently per host, and publishes a new FleetSnapshot. Readers only
+    ever see complete snapshots, so aggregation is safe while stepping.
+    """
+
+    def __init__(self, n_hosts: int, services: Sequence[str] = DEFAULT_SERVICES, seed: Optional[int] = None,
+                 clock=None):
+        self.rng = np.random.default_rng(seed)
+        self.clock = clock or SystemClock()
+        self.hosts = np.array([f"host-{i:05d}" for i in range(n_hosts)])
+        self.services = list(services)
+        self.host_service = np.arange(n_hosts) % len(self.services)
+        # Hosts sorted by service once, so each service is a contiguous slice of _service_order
+        self._service_order = np.argsort(self.host_service, kind="stable")
+        self._service_bounds = np.searchsorted(
+            self.host_service[self._service_order], np.arange(len(self.services) + 1)
+        )
+        self.base = {field: np.full(n_hosts, BASELINES[field][0]) for field in METRIC_FIELDS}
+        self.spike_until = np.zeros(n_hosts)
+        self.snapshot: Optional[FleetSnapshot] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.hosts)
+
+    def step(self, maintenance_enabled: bool = False, now: Optional[float] = None) -> FleetSnapshot:
+        n = self.size
+        rng = self.rng
+        if maintenance_enabled:
+            values = {field: np.round(rng.uniform(lo, hi, n), 2) for field, (lo, hi) in MAINTENANCE_RANGES.items()}
+            status = np.full(n, _IN_MAINTENANCE, dtype=np.int8)
+        else:
+            now = self.clock.time() if now is None else now
+            # Each idle host has a 5% chance of starting a 10-30 s spike
+            starting = (self.spike_until <= now) & (rng.random(n) < 0.05)
+            self.spike_until[starting] = now + rng.uniform(10, 30, starting.sum())
+            spiking = self.spike_until > now
+
+            values = {}
+            for field in METRIC_FIELDS:
+                _, lo, hi, variation = BASELINES[field]
+                base = self.base[field]
+                base = np.round(np.clip(base + rng.uniform(-variation, variation, n) * base, lo, hi), 2)
+                self.base[field] = base
+                low, high, cap = SPIKES[field]
+                spiked = np.minimum(cap, base * rng.uniform(low, high, n))
+                values[field] = np.round(np.where(spiking, spiked, base), 2)
+
+            error_rate, response_time = values["error_rate"], values["response_time"]
+            status = np.select(
+                [
+                    (error_rate > DOWN_THRESHOLDS["error_rate"]) | (response_time > DOWN_THRESHOLDS["response_time"]),
+                    (error_rate > DEGRADED_THRESHOLDS["error_rate"])
+                    | (response_time > DEGRADED_THRESHOLDS["response_time"]),
+                ],
+                [_DOWN, _DEGRADED],
+                _OPERATIONAL,
+            ).astype(np.int8)
+
+        self.snapshot = FleetSnapshot(self.clock.now(), values, status)
+        return self.snapshot
+
+    def export_snapshot(self) -> Optional[dict]:
+        """JSON-friendly copy of the current snapshot, for sharing with other workers"""
+        snap = self.snapshot
+        if snap is None:
+            return None
+        return {
+            "timestamp": snap.timestamp.isoformat(),
+            "status": snap.status.tolist(),
+            "values": {field: values.tolist() for field, values in snap.values.items()},
+        }
+
+    def load_snapshot(self, data: dict):
+        """Adopt a snapshot exported by another worker's simulator of the same size"""
+        if len(data["status"]) != self.size:
+            raise ValueError(f"fleet snapshot has {len(data['status'])} hosts, expected {self.size}")
+        self.snapshot = FleetSnapshot(
+            datetime.fromisoformat(data["timestamp"]),
+            {field: np.asarray(values, dtype=np.float64) for field, values in data["values"].items()},
+            np.asarray(data["status"], dtype=np.int8),
+        )
+
+    def _current(self) -> FleetSnapshot:
+        return self.snapshot if self.snapshot is not None else self.step()
+
+    @staticmethod
+    def _status_counts(status: np.ndarray) -> Dict[str, int]:
+        counts = np.bincount(status, minlength=len(STATUSES))
+        return {name: int(counts[code]) for code, name in enumerate(STATUSES)}
+
+    def summary(self, percentiles: Sequence[float] = (50, 90, 95, 99)) -> dict:
+        snap = self._current()
+        stats = {}
+        for field in METRIC_FIELDS:
+            values = np.percentile(snap.values[field], percentiles)
+            stats[field] = {f"p{p:g}": round(float(v), 2) for p, v in zip(percentiles, values)}
+        return {
+            "timestamp": snap.timestamp,
+            "hosts": self.size,
+            "status_counts": self._status_counts(snap.status),
+            "percentiles": stats,
+        }
+
+    def _host_rows(self, snap: FleetSnapshot, indices: np.ndarray) -> List[dict]:
+        rows = []
+        for i in indices:
+            row = {
+                "host": str(self.hosts[i]),
+                "service": self.services[self.host_service[i]],
+                "status": STATUSES[snap.status[i]],
+            }
+            for field in METRIC_FIELDS:
+                row[field] = float(snap.values[field][i])
+            rows.append(row)
+        return rows
+
+    def top(self, metric: str, k: int = 10) -> List[dict]:
+        """The k worst hosts by a metric, worst first"""
+        snap = self._current()
+        values = snap.values[metric]
+        k = min(k, self.size)
+        if k <= 0:
+            return []
+        candidates = np.argpartition(values, -k)[-k:]
+        ordered = candidates[np.argsort(values[candidates])[::-1]]
+        return self._host_rows(snap, ordered)
+
+    def by_service(self) -> List[dict]:
+        snap = self._current()
+        groups = []
+        for index, service in enumerate(self.services):
+            members = self._service_order[self._service_bounds[index]:self._service_bounds[index + 1]]
+            if not len(members):
+                continue
+            group = {
+                "service": service,
+                "hosts": int(len(members)),
+                "status_counts": self._status_counts(snap.status[members]),
+            }
+            for field in METRIC_FIELDS:
+                values = snap.values[field][members]
+                group[field] = {
+                    "avg": round(float(values.mean()), 2),
+                    "p95": round(float(np.percentile(values, 95)), 2),
+                    "max": float(values.max()),
+                }
+            groups.append(group)
+        return groups
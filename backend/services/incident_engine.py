@@ -0,0 +1,377 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, delete, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+from database import ShardRouter
+from models import Incident, IncidentArchive
+from services.metrics_sampler import METRIC_FIELDS
+
+
+class IncidentRule:
+    """Threshold rule that opens an incident when any trigger metric is exceeded.
+
+    Once triggered the rule stays active until every metric drops back below
+    its clear level (hysteresis), and it fires at most once per cooldown. Its
+    incident resolves after the rule has stayed clear for resolve_after_minutes.
+    """
+
+    def __init__(self, name: str, severity: str, message: str, triggers: Dict[str, float],
+                 clear: Optional[Dict[str, float]] = None, cooldown_minutes: float = 5,
+                 resolve_after_minutes: float = 10):
+        self.name = name
+        self.severity = severity
+        self.message = message
+        self.triggers = triggers
+        self.clear = clear or triggers
+        self.cooldown = timedelta(minutes=cooldown_minutes)
+        self.resolve_after = timedelta(minutes=resolve_after_minutes)
+
+    @property
+    def message_prefix(self) -> str:
+        return self.message.split("{", 1)[0]
+
+    def is_active(self, metrics: dict, was_active: bool) -> bool:
+        if any(metrics[metric] > limit for metric, limit in self.triggers.items()):
+            return True
+        if was_active:
+            return any(metrics[metric] > limit for metric, limit in self.clear.items())
+        return False
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IncidentRule":
+        return cls(**data)
+
+
+# Ordered by priority: only the first active rule may fire for a given sample
+DEFAULT_RULES = [
+    IncidentRule(
+        "error_rate_spike", "critical", "Error rate spike detected: {error_rate:.2f}%",
+        triggers={"error_rate": 15}, clear={"error_rate": 12}, cooldown_minutes=5,
+    ),
+    IncidentRule(
+        "high_latency", "high", "High latency detected: {response_time:.0f}ms",
+        triggers={"response_time": 2000}, clear={"response_time": 1800}, cooldown_minutes=5,
+    ),
+    IncidentRule(
+        "downtime_forecast", "high",
+        "Early warning: {downtime_probability:.0%} chance of downtime within {forecast_minutes:.0f} minutes",
+        triggers={"downtime_probability": 0.7}, clear={"downtime_probability": 0.4}, cooldown_minutes=15,
+    ),
+    IncidentRule(
+        "degraded_performance", "medium",
+        "Degraded performance: Error rate {error_rate:.2f}%, Response time {response_time:.0f}ms",
+        triggers={"error_rate": 5, "response_time": 1200},
+        clear={"error_rate": 4, "response_time": 1000}, cooldown_minutes=10,
+    ),
+]
+
+
+def load_rules(path: str) -> List[IncidentRule]:
+    """Load an ordered rule list from a JSON file of IncidentRule keyword arguments"""
+    with open(path) as f:
+        return [IncidentRule.from_dict(item) for item in json.load(f)]
+
+
+class IncidentEngine:
+    """Evaluates metric samples against incident rules using in-memory state only.
+
+    The last time each dedupe key fired and its open incident are kept in
+    memory, so the hot path never queries the incidents table. State is
+    rebuilt from the table once at startup with load_state().
+
+    A rule firing again while its incident is open bumps that incident's
+    occurrences instead of inserting a new row, and the incident resolves once
+    the rule has been clear for its hold period. Both are queued by evaluate()
+    and written by apply_updates() as one executemany UPDATE each.
+    """
+
+    def __init__(self, rules: Optional[List[IncidentRule]] = None,
+                 clock: Callable[[], datetime] = datetime.utcnow,
+                 archive_after_hours: float = 24, archive_interval_minutes: float = 5):
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        self.clock = clock
+        self.archive_after = timedelta(hours=archive_after_hours)
+        self.archive_interval = timedelta(minutes=archive_interval_minutes)
+        self._next_archive = datetime.min
+        self._last_fired: Dict[str, datetime] = {}
+        self._active: Dict[str, bool] = {}
+        self._open: Dict[str, Optional[int]] = {}  # dedupe key -> open incident id (None until inserted)
+        self._clear_since: Dict[str, datetime] = {}
+        self._last_active: Dict[str, datetime] = {}
+        self._repeats: Dict[int, Tuple[int, datetime]] = {}  # incident id -> (new firings, last seen)
+        self._resolves: Dict[int, Tuple[datetime, Optional[datetime]]] = {}  # id -> (resolved at, last seen)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def dedupe_key(rule: IncidentRule, host: str = "local") -> str:
+        return rule.name if host == "local" else f"{rule.name}@{host}"
+
+    @staticmethod
+    def host_of(dedupe_key: Optional[str]) -> str:
+        """Host an incident belongs to, and so its shard; incidents without a key are local"""
+        return dedupe_key.split("@", 1)[1] if dedupe_key and "@" in dedupe_key else "local"
+
+    def _load_shard(self, db: Session, shard: int, shards: ShardRouter):
+        rows = db.execute(
+            select(Incident.dedupe_key, func.max(func.coalesce(Incident.last_seen, Incident.timestamp)))
+            .where(Incident.dedupe_key.isnot(None))
+            .group_by(Incident.dedupe_key)
+        ).all()
+        open_incidents = {
+            key: shards.global_id(shard, incident_id)
+            for key, incident_id in db.execute(
+                select(Incident.dedupe_key, func.max(Incident.id))
+                .where(Incident.dedupe_key.isnot(None), Incident.status == "active")
+                .group_by(Incident.dedupe_key)
+            ).all()
+        }
+        # Incidents created before dedupe keys existed are matched by message prefix
+        legacy = {}
+        for rule in self.rules:
+            fired = db.execute(
+                select(func.max(Incident.timestamp)).where(
+                    Incident.dedupe_key.is_(None),
+                    Incident.message.like(f"{rule.message_prefix}%"),
+                )
+            ).scalar()
+            if fired is not None:
+                legacy[rule.name] = fired
+        return rows, open_incidents, legacy
+
+    def load_state(self, shards: ShardRouter):
+        """Rebuild last-fired times and open incidents from the incidents in every shard"""
+        last_fired, open_incidents, legacy = {}, {}, {}
+        for rows, shard_open, shard_legacy in shards.map(self._load_shard, shards):
+            # A dedupe key belongs to one host, so it only ever appears in one shard
+            last_fired.update(rows)
+            open_incidents.update(shard_open)
+            for name, fired in shard_legacy.items():
+                legacy[name] = max(fired, legacy.get(name, fired))
+        for name, fired in legacy.items():
+            last_fired.setdefault(name, fired)
+        with self._lock:
+            self._last_fired = {key: _naive(fired) for key, fired in last_fired.items()}
+            self._open = open_incidents
+            self._clear_since = {}
+
+    def evaluate(self, metrics: dict, host: str = "local") -> List[dict]:
+        """Return incident rows to insert for this sample and mark them as fired.
+
+        Repeat firings and resolutions are queued for apply_updates().
+        """
+        now = self.clock()
+        fired = []
+        with self._lock:
+            claimed = False
+            for rule in self.rules:
+                key = self.dedupe_key(rule, host)
+                active = rule.is_active(metrics, self._active.get(key, False))
+                self._active[key] = active
+                if not active:
+                    self._maybe_resolve(rule, key, now)
+                    continue
+                self._last_active[key] = now
+                self._clear_since.pop(key, None)
+                if claimed:
+                    continue
+                claimed = True
+                last = self._last_fired.get(key)
+                if last is not None and now - last < rule.cooldown:
+                    continue
+                self._last_fired[key] = now
+                if key in self._open:
+                    incident_id = self._open[key]
+                    if incident_id is not None:
+                        count, _ = self._repeats.get(incident_id, (0, now))
+                        self._repeats[incident_id] = (count + 1, now)
+                    continue
+                self._open[key] = None
+                fired.append({
+                    "timestamp": now,
+                    "severity": rule.severity,
+                    "message": rule.message.format_map(metrics),
+                    "status": "active",
+                    "dedupe_key": key,
+                    "occurrences": 1,
+                    "last_seen": now,
+                })
+        return fired
+
+    def _maybe_resolve(self, rule: IncidentRule, key: str, now: datetime):
+        incident_id = self._open.get(key)
+        if incident_id is None:  # nothing open, or its insert hasn't returned an id yet
+            return
+        clear_since = self._clear_since.setdefault(key, now)
+        if now - clear_since < rule.resolve_after:
+            return
+        del self._open[key]
+        del self._clear_since[key]
+        # Last active time is unknown if the rule hasn't fired since a restart; keep the stored one
+        self._resolves[incident_id] = (now, self._last_active.get(key))
+
+    @staticmethod
+    def worst_by_host(samples: List[dict], host: str = "local") -> Dict[str, dict]:
+        """Collapse a batch to one sample per host holding the worst value of each metric.
+
+        A per-sample "host" key overrides the host argument.
+        """
+        worst: Dict[str, dict] = {}
+        for metrics in samples:
+            sample_host = metrics.get("host", host)
+            current = worst.get(sample_host)
+            if current is None:
+                worst[sample_host] = dict(metrics)
+                continue
+            for field in METRIC_FIELDS:
+                if metrics[field] > current[field]:
+                    current[field] = metrics[field]
+            if metrics["timestamp"] > current["timestamp"]:
+                current["timestamp"] = metrics["timestamp"]
+        return worst
+
+    def record(self, shards: ShardRouter, rows: List[dict]) -> List[dict]:
+        """Insert fired incidents in one batch per shard and return them with their global ids"""
+        if not rows:
+            return []
+        ids: List[Optional[int]] = [None] * len(rows)
+
+        def insert_batch(db: Session, shard: int, indexes: List[int]):
+            local_ids = db.execute(
+                insert(Incident).returning(Incident.id, sort_by_parameter_order=True), [rows[i] for i in indexes]
+            ).scalars().all()
+            db.commit()
+            for i, local_id in zip(indexes, local_ids):
+                ids[i] = shards.global_id(shard, local_id)
+
+        try:
+            shards.for_each(shards.group(range(len(rows)), lambda i: self.host_of(rows[i]["dedupe_key"])),
+                            insert_batch)
+        finally:
+            # Incidents whose shard failed keep a None id and are forgotten
+            self.mark_opened(rows, ids)
+        return [dict(row, id=incident_id) for row, incident_id in zip(rows, ids)]
+
+    def mark_opened(self, rows: List[dict], ids: List[Optional[int]]):
+        """Attach ids to incidents returned by evaluate(); None forgets an incident that failed to insert"""
+        with self._lock:
+            for row, incident_id in zip(rows, ids):
+                key = row["dedupe_key"]
+                if key not in self._open or self._open[key] is not None:
+                    continue
+                if incident_id is None:
+                    del self._open[key]
+                else:
+                    self._open[key] = incident_id
+
+    def take_updates(self) -> Tuple[Dict[int, Tuple[int, datetime]], Dict[int, Tuple[datetime, Optional[datetime]]]]:
+        """Hand over queued repeat firings and resolutions, keyed by incident id"""
+        with self._lock:
+            repeats, self._repeats = self._repeats, {}
+            resolves, self._resolves = self._resolves, {}
+        return repeats, resolves
+
+    def apply_updates(self, shards: ShardRouter) -> List[int]:
+        """Write queued repeat firings and resolutions; returns the global ids of changed incidents"""
+        repeats, resolves = self.take_updates()
+        if not repeats and not resolves:
+            return []
+        batches: Dict[int, Tuple[list, list]] = {}
+        for incident_id, (count, seen) in repeats.items():
+            shard, local_id = shards.locate(incident_id)
+            batches.setdefault(shard, ([], []))[0].append({"incident_id": local_id, "count": count, "seen": seen})
+        for incident_id, (resolved, seen) in resolves.items():
+            shard, local_id = shards.locate(incident_id)
+            batches.setdefault(shard, ([], []))[1].append(
+                {"incident_id": local_id, "resolved": resolved, "seen": seen})
+        shards.for_each(batches, self._apply_shard)
+        return sorted(set(repeats) | set(resolves))
+
+    @staticmethod
+    def _apply_shard(db: Session, shard: int, batch: Tuple[list, list]):
+        repeats, resolves = batch
+        table = Incident.__table__
+        if repeats:
+            db.execute(
+                update(table).where(table.c.id == bindparam("incident_id")).values(
+                    occurrences=table.c.occurrences + bindparam("count"), last_seen=bindparam("seen")
+                ),
+                repeats,
+            )
+        if resolves:
+            db.execute(
+                update(table).where(table.c.id == bindparam("incident_id")).values(
+                    status="resolved", resolved_at=bindparam("resolved"),
+                    last_seen=func.coalesce(bindparam("seen", type_=table.c.last_seen.type), table.c.last_seen),
+                ),
+                resolves,
+            )
+        db.commit()
+
+    def maybe_archive(self, shards: ShardRouter) -> int:
+        """Run archive_resolved() at most once per archive interval"""
+        now = self.clock()
+        with self._lock:
+            if now < self._next_archive:
+                return 0
+            self._next_archive = now + self.archive_interval
+        return self.archive_resolved(shards, self.archive_after)
+
+    def archive_resolved(self, shards: ShardRouter, older_than: timedelta, batch_size: int = 1000) -> int:
+        """Move incidents resolved more than older_than ago into incident_archive, in every shard"""
+        now = self.clock()
+        return sum(shards.map(self._archive_shard, now, now - older_than, batch_size))
+
+    @staticmethod
+    def _archive_shard(db: Session, shard: int, now: datetime, cutoff: datetime, batch_size: int) -> int:
+        source = Incident.__table__
+        ids = db.execute(
+            select(source.c.id)
+            .where(source.c.status == "resolved", func.coalesce(source.c.resolved_at, source.c.timestamp) < cutoff)
+            .order_by(source.c.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return 0
+        columns = [column.name for column in source.columns]
+        archived_at = literal(now, IncidentArchive.archived_at.type).label("archived_at")
+        db.execute(insert(IncidentArchive.__table__).from_select(
+            columns + ["archived_at"],
+            select(*[source.c[name] for name in columns], archived_at).where(source.c.id.in_(ids)),
+        ))
+        db.execute(delete(source).where(source.c.id.in_(ids)))
+        db.commit()
+        return len(ids)
+
+
+def fetch_incidents(shards: ShardRouter, incident_ids: List[int]) -> List[dict]:
+    """Every column of the incidents with these global ids, keyed by name and with global ids"""
+    batches: Dict[int, List[int]] = {}
+    for incident_id in incident_ids:
+        shard, local_id = shards.locate(incident_id)
+        batches.setdefault(shard, []).append(local_id)
+
+    def fetch(db: Session, shard: int, local_ids: List[int]) -> List[dict]:
+        rows = db.execute(select(Incident.__table__).where(Incident.id.in_(local_ids))).mappings().all()
+        return [dict(row, id=shards.global_id(shard, row["id"])) for row in rows]
+
+    return [row for rows in shards.for_each(batches, fetch).values() for row in rows]
+
+
+def evaluate_samples(engine: IncidentEngine, forecaster, samples: List[dict], host: str = "local") -> List[dict]:
+    """Run a batch through the downtime forecaster and the incident rules.
+
+    Returns the incident rows to insert; repeat firings and resolutions are
+    queued on the engine.
+    """
+    rows = []
+    for sample_host, metrics in engine.worst_by_host(samples, host=host).items():
+        forecast = forecaster.observe(sample_host, metrics)
+        metrics.update(downtime_probability=forecast.probability, forecast_minutes=forecast.horizon_minutes)
+        rows.extend(engine.evaluate(metrics, host=sample_host))
+    return rows
+
+
+def _naive(value: datetime) -> datetime:
+    return value.replace(tzinfo=None) if value.tzinfo else value
@@ -0,0 +1,388 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+UNMATCHED_ROUTE = "<unmatched>"
+
+# [query count, query seconds] for the request being handled in this context
+_request_db: ContextVar[Optional[List[float]]] = ContextVar("request_db", default=None)
+
+
+class Histogram:
+    """Prometheus-style histogram; the caller holds the registry lock"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    inner = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return "{" + inner + "}" if inner else ""
+
+
+class StackSampler:
+    """Samples the event loop and worker thread stacks on a timer.
+
+    Samples are kept in a short ring buffer. When a request turns out to be
+    slow, the samples taken while it was in flight are aggregated into
+    collapsed stacks (one "frame;frame;frame count" line each, the format
+    flame graph tools read) and written to dump_dir. Samples cover whatever
+    the loop was running at the time, including concurrent requests.
+    """
+
+    def __init__(self, interval: float, dump_dir: str, history_seconds: float = 60):
+        self.interval = interval
+        self.dump_dir = dump_dir
+        self.dumps = 0
+        self._samples: deque = deque(maxlen=max(1, int(history_seconds / interval)))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop_thread_id: Optional[int] = None
+
+    def start(self):
+        if self._thread is None:
+            self._loop_thread_id = threading.get_ident()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _watched_threads(self) -> Dict[int, str]:
+        watched = {}
+        for thread in threading.enumerate():
+            if thread.ident == self._loop_thread_id:
+                watched[thread.ident] = "event-loop"
+            elif thread.name.startswith(("asyncio_", "bcrypt")):
+                watched[thread.ident] = thread.name
+        return watched
+
+    def _run(self):
+        watched, refreshed = {}, 0.0
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            if now - refreshed > 0.2:
+                watched, refreshed = self._watched_threads(), now
+            frames = sys._current_frames()
+            for ident, name in watched.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(name)
+                self._samples.append((now, ";".join(reversed(stack))))
+
+    def dump(self, method: str, path: str, started: float, elapsed: float) -> Optional[str]:
+        ended = started + elapsed
+        stacks = Counter(stack for taken, stack in list(self._samples) if started <= taken <= ended)
+        if not stacks:
+            return None
+        os.makedirs(self.dump_dir, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        slug = path.strip("/").replace("/", "_") or "root"
+        filename = os.path.join(self.dump_dir, f"{stamp}-{method}-{slug}.folded")
+        with open(filename, "w") as f:
+            f.write(f"# {method} {path} took {elapsed * 1000:.1f} ms, {sum(stacks.values())} samples\n")
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self.dumps += 1
+        return filename
+
+
+def _process_started_at() -> float:
+    """Epoch time the process was created, from /proc on Linux (10 ms resolution);
+    elsewhere the time this module was imported"""
+    try:
+        with open("/proc/self/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        age = uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return time.time() - max(0.0, age)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.time()
+
+
+class StartupTimer:
+    """Wall-clock breakdown of startup, from process creation to the first served request.
+
+    mark(phase) closes a phase at the current time, so phases follow each
+    other without gaps and add up to the time until the worker was ready.
+    """
+
+    def __init__(self):
+        self.process_started = _process_started_at()
+        self.phases: List[Tuple[str, float]] = []
+        self.first_request: Optional[float] = None  # seconds after process creation
+        self._last = self.process_started
+
+    def mark(self, phase: str):
+        now = time.time()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def ready(self) -> float:
+        return self._last - self.process_started
+
+    def summary(self) -> str:
+        return ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.phases)
+
+    def request_served(self):
+        if self.first_request is None:
+            self.first_request = time.time() - self.process_started
+            print(f"✅ First request served {self.first_request * 1000:.0f} ms after process start")
+
+
+class Instrumentation:
+    """Collects request, database and event-loop timings for /internal/metrics"""
+
+    def __init__(self, lag_interval: float = 0.5, slow_request_seconds: Optional[float] = None,
+                 sample_interval: float = 0.005, dump_dir: str = "./profiles"):
+        self.lag_interval = lag_interval
+        self.slow_request_seconds = slow_request_seconds
+        self.sampler = StackSampler(sample_interval, dump_dir) if slow_request_seconds is not None else None
+        self.requests: Dict[Tuple[str, str], Histogram] = {}
+        self.responses: Counter = Counter()  # (method, route, status) -> count
+        self.request_db: Dict[Tuple[str, str], List[float]] = {}  # -> [queries, seconds]
+        self.queries: Dict[str, Histogram] = {}
+        self.loop_lag = Histogram(LAG_BUCKETS)
+        self.loop_lag_last = 0.0
+        self.startup = StartupTimer()
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, float]]]] = []
+        self._lock = threading.Lock()
+        self._lag_task: Optional[asyncio.Task] = None
+
+    # Database
+
+    def instrument_engine(self, engine: Engine, name: str):
+        """Time every statement run on a (sync) engine"""
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            self.record_query(name, time.perf_counter() - conn.info["query_started"].pop())
+
+        # A failed statement never reaches after_cursor_execute
+        @event.listens_for(engine, "handle_error")
+        def handle_error(context):
+            started = context.connection.info.get("query_started") if context.connection else None
+            if started:
+                started.pop()
+
+    def record_query(self, engine_name: str, seconds: float):
+        with self._lock:
+            histogram = self.queries.get(engine_name)
+            if histogram is None:
+                histogram = self.queries[engine_name] = Histogram(DB_BUCKETS)
+            histogram.observe(seconds)
+        stats = _request_db.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += seconds
+
+    # Requests
+
+    def record_request(self, method: str, route: str, status: int, seconds: float, db: List[float]):
+        key = (method, route)
+        with self._lock:
+            histogram = self.requests.get(key)
+            if histogram is None:
+                histogram = self.requests[key] = Histogram(LATENCY_BUCKETS)
+                self.request_db[key] = [0, 0.0]
+            histogram.observe(seconds)
+            self.responses[(method, route, status)] += 1
+            totals = self.request_db[key]
+            totals[0] += db[0]
+            totals[1] += db[1]
+
+    # Event loop
+
+    async def _watch_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            lag = max(0.0, loop.time() - expected)
+            with self._lock:
+                self.loop_lag.observe(lag)
+                self.loop_lag_last = lag
+
+    async def start(self):
+        if self._lag_task is None:
+            self._lag_task = asyncio.create_task(self._watch_loop_lag())
+        if self.sampler is not None:
+            self.sampler.start()
+
+    async def stop(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            try:
+                await self._lag_task
+            except asyncio.CancelledError:
+                pass
+            self._lag_task = None
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    # Exposition
+
+    def add_collector(self, collect: Callable[[], Iterable[Tuple[str, str, str, float]]]):
+        """Register a callback returning (name, "gauge" or "counter", help, value) read at scrape time"""
+        self._collectors.append(collect)
+
+    @staticmethod
+    def _histogram_lines(name: str, labels: dict, histogram: Histogram) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_labels(**labels, le=le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum!r}")
+        lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+        return lines
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        out = []
+
+        def header(name: str, kind: str, text: str):
+            out.append(f"# HELP {name} {text}")
+            out.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            header("uptimeguard_http_request_duration_seconds", "histogram", "Request latency by route")
+            for (method, route), histogram in sorted(self.requests.items()):
+                out.extend(self._histogram_lines(
+                    "uptimeguard_http_request_duration_seconds", {"method": method, "route": route}, histogram))
+            header("uptimeguard_http_responses_total", "counter", "Responses by route and status code")
+            for (method, route, status), count in sorted(self.responses.items()):
+                out.append(f"uptimeguard_http_responses_total{_labels(method=method, route=route, status=status)} {count}")
+            header("uptimeguard_http_request_db_queries_total", "counter", "Database statements run while serving a route")
+            for (method, route), (queries, _) in sorted(self.request_db.items()):
+                out.append(f"uptimeguard_http_request_db_queries_total{_labels(method=method, route=route)} {int(queries)}")
+            header("uptimeguard_http_request_db_seconds_total", "counter", "Database time spent while serving a route")
+            for (method, route), (_, seconds) in sorted(self.request_db.items()):
+                out.append(f"uptimeguard_http_request_db_seconds_total{_labels(method=method, route=route)} {seconds!r}")
+            header("uptimeguard_db_query_duration_seconds", "histogram", "Database statement latency by engine")
+            for engine_name, histogram in sorted(self.queries.items()):
+                out.extend(self._histogram_lines(
+                    "uptimeguard_db_query_duration_seconds", {"engine": engine_name}, histogram))
+            header("uptimeguard_event_loop_lag_seconds", "histogram", "How late the event loop ran a timer")
+            out.extend(self._histogram_lines("uptimeguard_event_loop_lag_seconds", {}, self.loop_lag))
+            header("uptimeguard_event_loop_lag_last_seconds", "gauge", "Most recent event loop lag measurement")
+            out.append(f"uptimeguard_event_loop_lag_last_seconds {self.loop_lag_last!r}")
+        if self.sampler is not None:
+            header("uptimeguard_slow_request_profiles_total", "counter", "Stack profiles written for slow requests")
+            out.append(f"uptimeguard_slow_request_profiles_total {self.sampler.dumps}")
+        for phase, seconds in self.startup.phases:
+            header(f"uptimeguard_startup_{phase}_seconds", "gauge", f"Startup time spent in the {phase} phase")
+            out.append(f"uptimeguard_startup_{phase}_seconds {seconds!r}")
+        if self.startup.first_request is not None:
+            header("uptimeguard_startup_first_request_seconds", "gauge",
+                   "Time from process start until the first request was served")
+            out.append(f"uptimeguard_startup_first_request_seconds {self.startup.first_request!r}")
+
+        for collect in self._collectors:
+            for name, kind, text, value in collect():
+                header(name, kind, text)
+                out.append(f"{name} {value}")
+        return "\n".join(out) + "\n"
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware timing each HTTP request against its route template"""
+
+    def __init__(self, app, instrumentation: Instrumentation):
+        self.app = app
+        self.instrumentation = instrumentation
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        streaming = False
+
+        async def send_wrapper(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = any(
+                    key == b"content-type" and value.startswith(b"text/event-stream")
+                    for key, value in message.get("headers", [])
+                )
+            await send(message)
+
+        db = [0, 0.0]
+        token = _request_db.set(db)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_db.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            instrumentation = self.instrumentation
+            instrumentation.record_request(scope["method"], route_path, status, elapsed, db)
+            if instrumentation.startup.first_request is None:
+                instrumentation.startup.request_served()
+            slow = instrumentation.slow_request_seconds
+            if instrumentation.sampler is not None and not streaming and elapsed >= slow:
+                path = await asyncio.to_thread(
+                    instrumentation.sampler.dump, scope["method"], route_path, started, elapsed
+                )
+                if path:
+                    print(f"⚠️ Slow request {scope['method']} {scope['path']} took {elapsed * 1000:.0f} ms; "
+                          f"stacks written to {path}")
+
+
+def _slow_request_threshold() -> Optional[float]:
+    value = os.getenv("PROFILE_SLOW_REQUESTS_MS")
+    return float(value) / 1000 if value else None
+
+
+instrumentation = Instrumentation(
+    slow_request_seconds=_slow_request_threshold(),
+    sample_interval=float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000,
+    dump_dir=os.getenv("PROFILE_DUMP_DIR", "./profiles"),
+)
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from typing import Callable
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import MaintenanceState
+
+MaintenanceSnapshot = namedtuple(
+    "MaintenanceSnapshot", ["enabled", "eta_minutes", "enabled_at", "window_id", "version"]
+)
+
+
+class MaintenanceCache:
+    """In-process view of the MaintenanceState row.
+
+    Writers call invalidate() after committing, which reloads the local copy
+    and touches a signal file. Other workers call refresh() from the cluster
+    poll thread, notice the replaced file with a single stat() call and
+    reload. get() only returns the current snapshot, so request handlers never
+    block the event loop on the file system or the database.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], signal_path: str):
+        self.session_factory = session_factory
+        self.signal_path = signal_path
+        self._snapshot = None
+        self._signal = None
+        self._announced = None
+        self._lock = threading.Lock()
+
+    def _read_signal(self):
+        try:
+            stat = os.stat(self.signal_path)
+        except FileNotFoundError:
+            return None
+        # The file is replaced on every write, so the inode changes even when
+        # two writes land within the same mtime tick
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load(self, signal) -> MaintenanceSnapshot:
+        db = self.session_factory()
+        try:
+            state = db.query(MaintenanceState).first()
+        finally:
+            db.close()
+        version = self._snapshot.version + 1 if self._snapshot else 1
+        if state:
+            snapshot = MaintenanceSnapshot(state.enabled, state.eta_minutes, state.enabled_at, state.window_id, version)
+        else:
+            snapshot = MaintenanceSnapshot(False, 0, None, None, version)
+        self._snapshot = snapshot
+        self._signal = signal
+        return snapshot
+
+    def get(self) -> MaintenanceSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Only before startup has loaded it
+            return self.refresh()
+        return snapshot
+
+    def refresh(self) -> MaintenanceSnapshot:
+        """Reload if another worker signalled a change; blocking, so call it off the event loop"""
+        signal = self._read_signal()
+        snapshot = self._snapshot
+        if snapshot is not None and signal == self._signal:
+            return snapshot
+        with self._lock:
+            if self._snapshot is not None and self._signal == signal:
+                return self._snapshot
+            return self._load(signal)
+
+    def announce(self, snapshot: MaintenanceSnapshot) -> bool:
+        """True the first time this process sees a given maintenance state, so each change is broadcast once"""
+        key = (snapshot.enabled, snapshot.eta_minutes, snapshot.enabled_at)
+        with self._lock:
+            if key == self._announced:
+                return False
+            self._announced = key
+            return True
+
+    def invalidate(self) -> MaintenanceSnapshot:
+        """Reload after a write and signal other workers to do the same"""
+        with self._lock:
+            tmp_path = f"{self.signal_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(str(time.time_ns()))
+            os.replace(tmp_path, self.signal_path)
+            return self._load(self._read_signal())
+
+
+maintenance_cache = MaintenanceCache(
+    SessionLocal, os.getenv("MAINTENANCE_SIGNAL_FILE", "./uptimeguard.maintenance")
+)
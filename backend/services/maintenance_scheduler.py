@@ -0,0 +1,305 @@
+import asyncio
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from models import MaintenanceState, MaintenanceWindow
+
+PERIODS = {"daily": timedelta(days=1), "weekly": timedelta(weeks=1)}
+_EPOCH = datetime(1970, 1, 1)
+
+
+def recurrence_period(window) -> Optional[timedelta]:
+    """Time between occurrences, or None for a one-off window"""
+    period = PERIODS.get(window.recurrence)
+    return period * window.repeat_every if period else None
+
+
+def occurrence_at(window, moment: datetime) -> Optional[Tuple[datetime, datetime]]:
+    """(start, end) of the occurrence in progress at moment or the next one to start.
+
+    Computed arithmetically, so a window that has repeated for years costs the
+    same as a new one. None once the window has no occurrences left.
+    """
+    duration = timedelta(minutes=window.duration_minutes)
+    start = window.starts_at
+    period = recurrence_period(window)
+    if period is not None and start + duration <= moment:
+        start += period * ((moment - start - duration) // period + 1)
+    if start + duration <= moment or (window.ends_on is not None and start > window.ends_on):
+        return None
+    return start, start + duration
+
+
+def occurrences_between(window, start: datetime, end: datetime) -> Iterator[Tuple[datetime, datetime]]:
+    """Occurrences overlapping [start, end), oldest first"""
+    occurrence = occurrence_at(window, start)
+    while occurrence is not None and occurrence[0] < end:
+        yield occurrence
+        occurrence = occurrence_at(window, occurrence[1])
+
+
+def _timestamp(moment: datetime) -> float:
+    return (moment - _EPOCH).total_seconds()
+
+
+class Timer:
+    __slots__ = ("due", "callback", "slot")
+
+    def __init__(self, due: int, callback: Callable[[], None], slot: int):
+        self.due = due  # absolute tick
+        self.callback = callback
+        self.slot = slot
+
+
+class TimerWheel:
+    """Hashed timing wheel: O(1) schedule and cancel, one slot visited per tick.
+
+    A timer lands in slot due_tick % slots and fires when the cursor reaches
+    that slot on its due tick; timers further out than one revolution simply
+    stay in the slot for more laps. Callbacks run on the event loop.
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, slots: int = 512, clock: Callable[[], float] = time.time):
+        self.tick_seconds = tick_seconds
+        self.clock = clock
+        self._slots: List[Set[Timer]] = [set() for _ in range(slots)]
+        self._tick = int(clock() // tick_seconds)  # last tick processed
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return sum(len(slot) for slot in self._slots)
+
+    def schedule(self, when: float, callback: Callable[[], None]) -> Timer:
+        """Run callback at the first tick at or after the epoch time when; safe to call from worker threads"""
+        with self._lock:
+            due = max(math.ceil(when / self.tick_seconds), self._tick + 1)
+            timer = Timer(due, callback, due % len(self._slots))
+            self._slots[timer.slot].add(timer)
+        return timer
+
+    def cancel(self, timer: Optional[Timer]):
+        if timer is None:
+            return
+        with self._lock:
+            self._slots[timer.slot].discard(timer)
+
+    def advance(self, now: float) -> int:
+        """Fire every timer due by now; returns how many fired"""
+        target = int(now // self.tick_seconds)
+        fired = []
+        with self._lock:
+            if target - self._tick >= len(self._slots):
+                # Behind by a full revolution or more (e.g. after a suspend): sweep every slot once
+                slots = self._slots
+            else:
+                slots = [self._slots[tick % len(self._slots)] for tick in range(self._tick + 1, target + 1)]
+            for slot in slots:
+                due = [timer for timer in slot if timer.due <= target]
+                slot.difference_update(due)
+                fired.extend(due)
+            self._tick = max(self._tick, target)
+        fired.sort(key=lambda timer: timer.due)
+        for timer in fired:
+            try:
+                timer.callback()
+            except Exception as e:
+                print(f"❌ Timer callback failed: {e}")
+        return len(fired)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick_seconds - self.clock() % self.tick_seconds)
+            self.advance(self.clock())
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+class MaintenanceScheduler:
+    """Enables and disables maintenance for scheduled windows.
+
+    Every worker keeps the window list for the status page. Only the started
+    worker (the leader) arms timers: one per window, at the start of its next
+    occurrence and then at its end. Maintenance that was switched on by hand is
+    never taken over or switched off by a window.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], wheel: Optional[TimerWheel] = None,
+                 on_change: Optional[Callable[[], None]] = None):
+        self.session_factory = session_factory
+        self.wheel = wheel or TimerWheel()
+        self.on_change = on_change  # called in a worker thread after the maintenance row changed
+        self.windows: Dict[int, MaintenanceWindow] = {}
+        self._signature = None
+        self._timers: Dict[int, Timer] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.RLock()
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def refresh(self) -> bool:
+        """Reload windows if any were added or removed; True if they changed. Blocking"""
+        db = self.session_factory()
+        try:
+            signature = tuple(db.execute(
+                select(func.count(MaintenanceWindow.id), func.max(MaintenanceWindow.id))
+            ).one())
+            if signature == self._signature:
+                return False
+            windows = db.execute(select(MaintenanceWindow)).scalars().all()
+            db.expunge_all()
+        finally:
+            db.close()
+        with self._lock:
+            removed = set(self.windows) - {window.id for window in windows}
+            self.windows = {window.id: window for window in windows}
+            self._signature = signature
+            for window_id in removed:
+                self.wheel.cancel(self._timers.pop(window_id, None))
+            if self.running:
+                for window_id in self.windows:
+                    if window_id not in self._timers:
+                        self._arm(window_id)
+        if self.running:
+            for window_id in removed:
+                # A deleted window that is in progress ends now
+                self._end(window_id)
+        return True
+
+    async def start(self):
+        """Arm timers for every window; the caller must be the only worker doing so"""
+        self._loop = asyncio.get_running_loop()
+        await asyncio.to_thread(self.refresh)
+        with self._lock:
+            for window_id in self.windows:
+                self._arm(window_id)
+        self.wheel.start()
+
+    async def stop(self):
+        await self.wheel.stop()
+        with self._lock:
+            for timer in self._timers.values():
+                self.wheel.cancel(timer)
+            self._timers.clear()
+        self._loop = None
+
+    def _arm(self, window_id: int, after: Optional[datetime] = None):
+        """Set the window's timer for the start of its current or next occurrence"""
+        window = self.windows.get(window_id)
+        occurrence = occurrence_at(window, after or datetime.utcnow()) if window else None
+        self.wheel.cancel(self._timers.pop(window_id, None))
+        if occurrence is None:
+            return
+        start, end = occurrence
+        # A window already in progress (e.g. after a restart) begins on the next tick
+        self._timers[window_id] = self.wheel.schedule(
+            _timestamp(start), lambda: self._dispatch(self._begin, window_id, start, end)
+        )
+
+    def _dispatch(self, transition: Callable, *args):
+        # Timers fire on the event loop; the transitions write to the database
+        if self._loop is not None:
+            self._loop.run_in_executor(None, self._run_transition, transition, args)
+
+    @staticmethod
+    def _run_transition(transition: Callable, args: tuple):
+        try:
+            transition(*args)
+        except Exception as e:
+            print(f"❌ Scheduled maintenance transition failed: {e}")
+
+    def _begin(self, window_id: int, start: datetime, end: datetime):
+        with self._lock:
+            if window_id not in self.windows or not self.running:
+                return
+            self._timers[window_id] = self.wheel.schedule(
+                _timestamp(end), lambda: self._dispatch(self._finish, window_id, end)
+            )
+        db = self.session_factory()
+        try:
+            state = db.query(MaintenanceState).first()
+            if state is None:
+                state = MaintenanceState(enabled=False, eta_minutes=0)
+                db.add(state)
+            if state.enabled and (state.window_id != window_id or state.enabled_at == start):
+                # Already running, either by hand or for this very occurrence
+                return
+            state.enabled = True
+            state.eta_minutes = round((end - start).total_seconds() / 60)
+            state.enabled_at = start
+            state.window_id = window_id
+            db.commit()
+        finally:
+            db.close()
+        print(f"✅ Scheduled maintenance window {window_id} started")
+        self._notify()
+
+    def _finish(self, window_id: int, end: datetime):
+        self._end(window_id)
+        with self._lock:
+            if window_id in self.windows and self.running:
+                self._arm(window_id, after=end)
+
+    def _end(self, window_id: int):
+        """Switch maintenance off if this window switched it on"""
+        db = self.session_factory()
+        try:
+            state = db.query(MaintenanceState).first()
+            if state is None or not state.enabled or state.window_id != window_id:
+                return
+            state.enabled = False
+            state.eta_minutes = 0
+            state.enabled_at = None
+            state.window_id = None
+            db.commit()
+        finally:
+            db.close()
+        print(f"✅ Scheduled maintenance window {window_id} ended")
+        self._notify()
+
+    def _notify(self):
+        if self.on_change is not None:
+            try:
+                self.on_change()
+            except Exception as e:
+                print(f"❌ Maintenance change handler failed: {e}")
+
+    def timeline(self, now: datetime, horizon: timedelta, limit: int = 5) -> Dict[str, List[dict]]:
+        """Active, upcoming (within horizon) and past (within horizon) occurrences for the status page"""
+        active, upcoming, past = [], [], []
+        with self._lock:
+            windows = list(self.windows.values())
+        for window in windows:
+            pending = limit
+            for start, end in occurrences_between(window, now - horizon, now + horizon):
+                occurrence = {"window_id": window.id, "title": window.title, "starts_at": start, "ends_at": end}
+                if end <= now:
+                    past.append(occurrence)
+                elif start <= now:
+                    active.append(occurrence)
+                else:
+                    upcoming.append(occurrence)
+                    pending -= 1
+                    if not pending:
+                        break
+        upcoming.sort(key=lambda occurrence: occurrence["starts_at"])
+        past.sort(key=lambda occurrence: occurrence["ends_at"], reverse=True)
+        return {"active": active, "upcoming": upcoming[:limit], "past": past[:limit]}
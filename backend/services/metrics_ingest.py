@@ -0,0 +1,95 @@
+import asyncio
+from typing import Callable, List, Optional
+
+
+class IngestBuffer:
+    """Bounded in-memory buffer between the ingest endpoint and storage.
+
+    Requests only append to the buffer. A background task hands the buffered
+    samples to sink() in one call whenever flush_size samples are waiting or
+    flush_interval seconds have passed, so storage sees a few large
+    transactions instead of one per request. offer() refuses a batch when
+    buffered plus in-flight samples would exceed capacity. A batch the sink
+    fails on goes back to the front of the buffer and is retried on the next
+    tick, so samples already answered with 202 are kept; while it is stuck
+    the buffer fills up and offer() starts refusing.
+    """
+
+    def __init__(self, sink: Callable[[List[dict]], None], capacity: int = 200000,
+                 flush_size: int = 20000, flush_interval: float = 1.0):
+        self.sink = sink
+        self.capacity = capacity
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.accepted = 0
+        self.rejected = 0
+        self.write_failures = 0
+        self._pending: List[dict] = []
+        self._in_flight = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def buffered(self) -> int:
+        return len(self._pending) + self._in_flight
+
+    def offer(self, samples: List[dict]) -> bool:
+        """Buffer a batch; False means the caller should back off and retry"""
+        if self.buffered + len(samples) > self.capacity:
+            self.rejected += len(samples)
+            return False
+        self._pending.extend(samples)
+        self.accepted += len(samples)
+        if len(self._pending) >= self.flush_size and self._wake is not None:
+            self._wake.set()
+        return True
+
+    async def flush(self) -> bool:
+        """Hand everything buffered to the sink; False if it failed and the batch was kept"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return True
+            self._in_flight = len(batch)
+            try:
+                await asyncio.to_thread(self.sink, batch)
+                return True
+            except Exception as e:
+                self.write_failures += 1
+                # Ahead of anything offered meanwhile; offer() counted both against capacity
+                self._pending[:0] = batch
+                print(f"❌ Writing {len(batch)} ingested samples failed, retrying: {e}")
+                return False
+            finally:
+                self._in_flight = 0
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not await self.flush():
+                # A full buffer would wake the task again at once; give storage a moment
+                await asyncio.sleep(self.flush_interval)
+
+    async def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if not await self.flush():
+            print(f"❌ {len(self._pending)} ingested samples could not be written before shutdown")
@@ -0,0 +1,128 @@
+import asyncio
+from array import array
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+METRIC_FIELDS = ("cpu", "ram", "response_time", "error_rate", "db_latency")
+STATUSES = ("operational", "degraded", "down", "maintenance")
+_STATUS_CODES = {name: code for code, name in enumerate(STATUSES)}
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class MetricsRingBuffer:
+    """Fixed-size ring buffer of metric samples backed by flat arrays"""
+
+    def __init__(self, capacity: int = 1200):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._columns = {field: array("d", bytes(8 * capacity)) for field in METRIC_FIELDS}
+        # Microseconds since the epoch, so timestamps round-trip exactly
+        self._timestamps = array("q", bytes(8 * capacity))
+        self._statuses = array("b", bytes(capacity))
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, metrics: dict):
+        """Overwrite the oldest slot with a new sample"""
+        i = self._next
+        for field in METRIC_FIELDS:
+            self._columns[field][i] = metrics[field]
+        self._timestamps[i] = (metrics["timestamp"] - _EPOCH) // _MICROSECOND
+        self._statuses[i] = _STATUS_CODES[metrics["status"]]
+        self._next = (i + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def _row(self, i: int) -> dict:
+        row = {
+            "status": STATUSES[self._statuses[i]],
+            "timestamp": _EPOCH + timedelta(microseconds=self._timestamps[i]),
+        }
+        for field in METRIC_FIELDS:
+            row[field] = self._columns[field][i]
+        return row
+
+    def latest(self) -> Optional[dict]:
+        """Return the newest sample, or None if nothing has been recorded"""
+        if not self._size:
+            return None
+        return self._row((self._next - 1) % self.capacity)
+
+    def window(self, n: int) -> List[dict]:
+        """Return up to the last n samples, oldest first"""
+        n = max(0, min(n, self._size))
+        start = self._next - n
+        return [self._row((start + k) % self.capacity) for k in range(n)]
+
+
+class MetricsSampler:
+    """Takes a metrics sample at a fixed tick and keeps recent history in a ring buffer"""
+
+    def __init__(self, sample_fn: Callable[[], dict], interval: float = 3.0, capacity: int = 1200):
+        self.sample_fn = sample_fn
+        self.interval = interval
+        self.buffer = MetricsRingBuffer(capacity)
+        self._listeners: List[Callable[[dict], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_listener(self, callback: Callable[[dict], None]):
+        """Register a callback invoked on the event loop with every new sample"""
+        self._listeners.append(callback)
+
+    def latest(self) -> Optional[dict]:
+        return self.buffer.latest()
+
+    def record(self, metrics: dict):
+        """Store a sample produced elsewhere (e.g. by another worker) and notify listeners; call on the event loop"""
+        self.buffer.append(metrics)
+        for callback in self._listeners:
+            try:
+                callback(metrics)
+            except Exception as e:
+                print(f"❌ Metrics listener failed: {e}")
+
+    async def tick(self) -> dict:
+        # sample_fn talks to the database, so keep it off the event loop
+        metrics = await asyncio.to_thread(self.sample_fn)
+        self.record(metrics)
+        return metrics
+
+    async def _run(self, sample_now: bool = False):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        if sample_now:
+            next_tick -= self.interval
+        while True:
+            # Schedule against a fixed grid so slow ticks don't drift the series
+            next_tick += self.interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f"❌ Metrics sampling failed: {e}")
+
+    async def start(self, wait: bool = True):
+        """Take the first sample immediately, then keep sampling in the background;
+        with wait=False the first sample is taken in the background too"""
+        if self._task is not None:
+            return
+        if wait:
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f"❌ Initial metrics sample failed: {e}")
+        self._task = asyncio.create_task(self._run(sample_now=not wait))
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -1,32 +1,76 @@
 import random
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 
+# A sample is down/degraded when any of these metrics exceeds its limit
+DOWN_THRESHOLDS = {"error_rate": 15, "response_time": 2000}
+DEGRADED_THRESHOLDS = {"error_rate": 5, "response_time": 1200}
+
+def classify_status(error_rate: float, response_time: float) -> str:
+    """Overall status implied by a sample's error rate and response time"""
+    if error_rate > DOWN_THRESHOLDS["error_rate"] or response_time > DOWN_THRESHOLDS["response_time"]:
+        return "down"
+    if error_rate > DEGRADED_THRESHOLDS["error_rate"] or response_time > DEGRADED_THRESHOLDS["response_time"]:
+        return "degraded"
+    return "operational"
+
+class SystemClock:
+    """Wall-clock time, as naive UTC"""
+
+    def time(self) -> float:
+        return time.time()
+
+    def now(self) -> datetime:
+        return datetime.utcnow()
+
+
+class SimulatedClock:
+    """Clock that only moves when advanced, for reproducible and faster-than-real-time runs"""
+
+    def __init__(self, start: datetime, step_seconds: float = 0.0):
+        self.start = start
+        self.step_seconds = step_seconds  # advanced automatically after every now() when > 0
+        self._elapsed = 0.0
+
+    def advance(self, seconds: float):
+        self._elapsed += seconds
+
+    def time(self) -> float:
+        return (self.start - datetime(1970, 1, 1)).total_seconds() + self._elapsed
+
+    def now(self) -> datetime:
+        current = self.start + timedelta(seconds=self._elapsed)
+        self._elapsed += self.step_seconds
+        return current
+
+
 class MetricsSimulator:
-    def __init__(self):
+    def __init__(self, seed: Optional[int] = None, clock=None):
+        self.rng = random.Random(seed)  # per-instance stream, so a seed reproduces the series
+        self.clock = clock or SystemClock()
         self.base_cpu = 30.0
         self.base_ram = 45.0
         self.base_response_time = 150.0
         self.base_error_rate = 0.5
         self.base_db_latency = 25.0
-        self.last_update = time.time()
+        self.last_update = self.clock.time()
         self.spike_active = False
         self.spike_end_time = 0
         
     def _generate_smooth_value(self, base: float, min_val: float, max_val: float, variation: float = 0.1) -> float:
         """Generate smoothly varying values"""
-        change = random.uniform(-variation, variation) * base
+        change = self.rng.uniform(-variation, variation) * base
         new_base = base + change
         new_base = max(min_val, min(max_val, new_base))
         return round(new_base, 2)
     
     def _check_spike(self) -> bool:
         """Randomly trigger spikes"""
-        current_time = time.time()
-        if not self.spike_active and random.random() < 0.05:  # 5% chance
+        current_time = self.clock.time()
+        if not self.spike_active and self.rng.random() < 0.05:  # 5% chance
             self.spike_active = True
-            self.spike_end_time = current_time + random.uniform(10, 30)  # 10-30 seconds
+            self.spike_end_time = current_time + self.rng.uniform(10, 30)  # 10-30 seconds
             return True
         if self.spike_active and current_time > self.spike_end_time:
             self.spike_active = False
@@ -37,12 +81,12 @@ class MetricsSimulator:
         if maintenance_enabled:
             return {
                 "status": "maintenance",
-                "cpu": round(random.uniform(10, 30), 2),
-                "ram": round(random.uniform(20, 40), 2),
-                "response_time": round(random.uniform(200, 500), 2),
-                "error_rate": round(random.uniform(0, 2), 2),
-                "db_latency": round(random.uniform(30, 60), 2),
-                "timestamp": datetime.utcnow()
+                "cpu": round(self.rng.uniform(10, 30), 2),
+                "ram": round(self.rng.uniform(20, 40), 2),
+                "response_time": round(self.rng.uniform(200, 500), 2),
+                "error_rate": round(self.rng.uniform(0, 2), 2),
+                "db_latency": round(self.rng.uniform(30, 60), 2),
+                "timestamp": self.clock.now()
             }
         
         spike = self._check_spike()
@@ -56,11 +100,11 @@ class MetricsSimulator:
         
         # Apply spike if active
         if spike:
-            cpu = min(95, self.base_cpu * random.uniform(1.5, 2.5))
-            ram = min(90, self.base_ram * random.uniform(1.3, 1.8))
-            response_time = min(2000, self.base_response_time * random.uniform(2, 4))
-            error_rate = min(20, self.base_error_rate * random.uniform(3, 6))
-            db_latency = min(200, self.base_db_latency * random.uniform(2, 3))
+            cpu = min(95, self.base_cpu * self.rng.uniform(1.5, 2.5))
+            ram = min(90, self.base_ram * self.rng.uniform(1.3, 1.8))
+            response_time = min(2000, self.base_response_time * self.rng.uniform(2, 4))
+            error_rate = min(20, self.base_error_rate * self.rng.uniform(3, 6))
+            db_latency = min(200, self.base_db_latency * self.rng.uniform(2, 3))
         else:
             cpu = self.base_cpu
             ram = self.base_ram
@@ -68,20 +112,12 @@ class MetricsSimulator:
             error_rate = self.base_error_rate
             db_latency = self.base_db_latency
         
-        # Determine status
-        if error_rate > 15 or response_time > 2000:
-            status = "down"
-        elif error_rate > 5 or response_time > 1200:
-            status = "degraded"
-        else:
-            status = "operational"
-        
         return {
-            "status": status,
+            "status": classify_status(error_rate, response_time),
             "cpu": round(cpu, 2),
             "ram": round(ram, 2),
             "response_time": round(response_time, 2),
             "error_rate": round(error_rate, 2),
             "db_latency": round(db_latency, 2),
-            "timestamp": datetime.utcnow()
+            "timestamp": self.clock.now()
         }
@@ -0,0 +1,316 @@
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from database import ShardRouter
+from models import MetricSample, MetricRollup
+from services.metrics_sampler import METRIC_FIELDS
+
+# Bucket widths in seconds; 0 stands for the raw samples table
+ROLLUP_RESOLUTIONS = (60, 300, 3600)
+DEFAULT_RETENTION = {
+    0: timedelta(days=1),
+    60: timedelta(days=7),
+    300: timedelta(days=30),
+    3600: timedelta(days=365),
+}
+_BASE_RESOLUTION = ROLLUP_RESOLUTIONS[0]
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _bucket_start(timestamp: datetime, resolution: int) -> datetime:
+    seconds = int((timestamp - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=seconds - seconds % resolution)
+
+
+def _p95(values: List[float]) -> float:
+    """Nearest-rank 95th percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+
+def _weighted_p95(values: List[Tuple[float, int]]) -> float:
+    """Nearest-rank 95th percentile of (value, weight) pairs"""
+    ordered = sorted(values)
+    rank = math.ceil(0.95 * sum(weight for _, weight in ordered))
+    seen = 0
+    for value, weight in ordered:
+        seen += weight
+        if seen >= rank:
+            return value
+    return ordered[-1][0]
+
+
+def choose_resolution(start: datetime, end: datetime, step_seconds: int, now: datetime,
+                      retention: Dict[int, Optional[timedelta]], max_points: int) -> int:
+    """Pick the coarsest rollup no coarser than the requested step, then coarsen it until its
+    retention still covers start and the range fits in max_points buckets.
+
+    Raw samples (0) have no fixed spacing, so their cap is enforced while reading.
+    Raises ValueError when even the coarsest rollup cannot serve the range.
+    """
+    span = (min(end, now) - start).total_seconds()
+    candidates = (0, *ROLLUP_RESOLUTIONS)
+    requested = max(r for r in candidates if r <= step_seconds)
+    for resolution in candidates[candidates.index(requested):]:
+        keep = retention.get(resolution)
+        if keep is not None and start < now - keep:
+            continue  # already evicted at this resolution
+        if resolution and math.ceil(span / resolution) + 1 > max_points:
+            continue
+        return resolution
+    raise ValueError(
+        f"No stored resolution covers {start.isoformat()} to {end.isoformat()} in at most {max_points} points"
+    )
+
+
+def _rollup_upsert():
+    """Insert rollups; a bucket written before (e.g. left open at shutdown) is merged with the new part"""
+    table = MetricRollup.__table__
+    statement = sqlite_insert(table)
+    old, new = table.c, statement.excluded
+    total = old.sample_count + new.sample_count
+    merged = {
+        "sample_count": total,
+        "down_samples": old.down_samples + new.down_samples,
+        "maintenance_samples": old.maintenance_samples + new.maintenance_samples,
+    }
+    for field in METRIC_FIELDS:
+        a, b = old[f"{field}_p95"], new[f"{field}_p95"]
+        merged[f"{field}_min"] = func.min(old[f"{field}_min"], new[f"{field}_min"])
+        merged[f"{field}_max"] = func.max(old[f"{field}_max"], new[f"{field}_max"])
+        merged[f"{field}_avg"] = func.round(
+            (old[f"{field}_avg"] * old.sample_count + new[f"{field}_avg"] * new.sample_count) * 1.0 / total, 4)
+        # Count-weighted nearest-rank p95 of the two parts, as in _weighted_p95
+        lower_weight = case((a <= b, old.sample_count), else_=new.sample_count)
+        merged[f"{field}_p95"] = case((lower_weight * 100 >= total * 95, func.min(a, b)), else_=func.max(a, b))
+    return statement.on_conflict_do_update(index_elements=[old.host, old.resolution, old.bucket_start], set_=merged)
+
+
+class MetricsStore:
+    """Persists metric samples in batches and maintains 1m/5m/1h rollups.
+
+    Only the open 1m bucket per host keeps raw values; 5m and 1h buckets are
+    merged from closed 1m rollups, which keeps memory flat with many hosts.
+    Buckets are written once they close; flush(close_open=True) at shutdown
+    also writes the open ones, and a bucket that reopens after a restart is
+    merged into the stored row. Rows go to their host's shard; a flush
+    writes the shards in parallel, one transaction each.
+    """
+
+    def __init__(self, shards: ShardRouter, batch_size: int = 100,
+                 flush_interval: float = 30.0, retention: Optional[Dict[int, timedelta]] = None,
+                 eviction_interval: float = 600.0, max_points: int = 10000):
+        self.shards = shards
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention = retention or DEFAULT_RETENTION
+        self.eviction_interval = eviction_interval
+        self.max_points = max_points
+        self._pending_samples: List[dict] = []
+        self._pending_rollups: List[dict] = []
+        # host -> (bucket_start, {field: [values], "status": [statuses]}) for the open 1m bucket
+        self._open_minutes: Dict[str, Tuple[datetime, Dict[str, List[float]]]] = {}
+        # (host, resolution) -> (bucket_start, [closed 1m rollups]) for coarser buckets
+        self._open_buckets: Dict[Tuple[str, int], Tuple[datetime, List[dict]]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._last_eviction: Optional[float] = None
+
+    def add(self, metrics: dict, host: str = "local"):
+        """Queue one sample; flushes when the batch is full or the interval has elapsed"""
+        self.add_many([metrics], host=host)
+
+    def add_many(self, samples: List[dict], host: str = "local"):
+        """Queue many samples; a per-sample "host" key overrides the host argument"""
+        with self._lock:
+            for metrics in samples:
+                sample_host = metrics.get("host", host)
+                row = {field: metrics[field] for field in METRIC_FIELDS}
+                row.update(host=sample_host, timestamp=metrics["timestamp"], status=metrics["status"])
+                self._pending_samples.append(row)
+                self._accumulate(sample_host, metrics)
+            due = (len(self._pending_samples) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def _accumulate(self, host: str, metrics: dict):
+        start = _bucket_start(metrics["timestamp"], _BASE_RESOLUTION)
+        current = self._open_minutes.get(host)
+        if current is not None and start < current[0]:
+            # Bucket already closed; late samples are kept raw but not rolled up
+            return
+        if current is None or current[0] != start:
+            if current is not None:
+                self._close_minute(host, *current)
+            current = (start, {field: [] for field in (*METRIC_FIELDS, "status")})
+            self._open_minutes[host] = current
+        values = current[1]
+        for field in METRIC_FIELDS:
+            values[field].append(metrics[field])
+        values["status"].append(metrics["status"])
+
+    def _close_minute(self, host: str, start: datetime, values: Dict[str, List[float]]):
+        minute = self._summarize(host, _BASE_RESOLUTION, start, values)
+        self._pending_rollups.append(minute)
+        for resolution in ROLLUP_RESOLUTIONS[1:]:
+            bucket_start = _bucket_start(start, resolution)
+            key = (host, resolution)
+            current = self._open_buckets.get(key)
+            if current is not None and bucket_start < current[0]:
+                continue
+            if current is None or current[0] != bucket_start:
+                if current is not None:
+                    self._pending_rollups.append(self._combine(host, resolution, *current))
+                current = (bucket_start, [])
+                self._open_buckets[key] = current
+            current[1].append(minute)
+
+    @staticmethod
+    def _summarize(host: str, resolution: int, start: datetime, values: Dict[str, List[float]]) -> dict:
+        row = {
+            "host": host,
+            "resolution": resolution,
+            "bucket_start": start,
+            "sample_count": len(values[METRIC_FIELDS[0]]),
+            "down_samples": values["status"].count("down"),
+            "maintenance_samples": values["status"].count("maintenance"),
+        }
+        for field in METRIC_FIELDS:
+            series = values[field]
+            row[f"{field}_min"] = min(series)
+            row[f"{field}_max"] = max(series)
+            row[f"{field}_avg"] = round(sum(series) / len(series), 4)
+            row[f"{field}_p95"] = _p95(series)
+        return row
+
+    @staticmethod
+    def _combine(host: str, resolution: int, start: datetime, minutes: List[dict]) -> dict:
+        """Merge closed 1m rollups; p95 is the count-weighted p95 of the minute p95s"""
+        count = sum(m["sample_count"] for m in minutes)
+        row = {
+            "host": host,
+            "resolution": resolution,
+            "bucket_start": start,
+            "sample_count": count,
+            "down_samples": sum(m["down_samples"] for m in minutes),
+            "maintenance_samples": sum(m["maintenance_samples"] for m in minutes),
+        }
+        for field in METRIC_FIELDS:
+            row[f"{field}_min"] = min(m[f"{field}_min"] for m in minutes)
+            row[f"{field}_max"] = max(m[f"{field}_max"] for m in minutes)
+            row[f"{field}_avg"] = round(sum(m[f"{field}_avg"] * m["sample_count"] for m in minutes) / count, 4)
+            row[f"{field}_p95"] = _weighted_p95([(m[f"{field}_p95"], m["sample_count"]) for m in minutes])
+        return row
+
+    def flush(self, close_open: bool = False):
+        """Write pending samples and closed rollups in a single transaction per shard;
+        close_open also writes the buckets still filling (at shutdown)"""
+        with self._flush_lock:
+            with self._lock:
+                if close_open:
+                    self._close_open_buckets()
+                samples, self._pending_samples = self._pending_samples, []
+                rollups, self._pending_rollups = self._pending_rollups, []
+                self._last_flush = time.monotonic()
+            evict = (self._last_eviction is None
+                     or time.monotonic() - self._last_eviction >= self.eviction_interval)
+            if not samples and not rollups and not evict:
+                return
+            sample_groups = self.shards.group(samples, lambda row: row["host"])
+            rollup_groups = self.shards.group(rollups, lambda row: row["host"])
+            batches = {
+                shard: (sample_groups.get(shard), rollup_groups.get(shard), evict)
+                for shard in (range(self.shards.count) if evict else set(sample_groups) | set(rollup_groups))
+            }
+            try:
+                self.shards.for_each(batches, self._write)
+            finally:
+                if evict:
+                    self._last_eviction = time.monotonic()
+
+    def _close_open_buckets(self):
+        for host, current in self._open_minutes.items():
+            self._close_minute(host, *current)
+        self._open_minutes.clear()
+        for (host, resolution), current in self._open_buckets.items():
+            self._pending_rollups.append(self._combine(host, resolution, *current))
+        self._open_buckets.clear()
+
+    def _write(self, db: Session, shard: int, batch: tuple):
+        samples, rollups, evict = batch
+        # Core table inserts skip the ORM bulk bookkeeping, which dominates large ingest batches
+        if samples:
+            db.execute(insert(MetricSample.__table__), samples)
+        if rollups:
+            db.execute(_ROLLUP_UPSERT, rollups)
+        if evict:
+            self._evict(db)
+        db.commit()
+
+    def _evict(self, db: Session):
+        now = datetime.utcnow()
+        raw_retention = self.retention.get(0)
+        if raw_retention is not None:
+            db.execute(delete(MetricSample).where(MetricSample.timestamp < now - raw_retention))
+        for resolution in ROLLUP_RESOLUTIONS:
+            keep = self.retention.get(resolution)
+            if keep is None:
+                continue
+            db.execute(delete(MetricRollup).where(
+                MetricRollup.resolution == resolution,
+                MetricRollup.bucket_start < now - keep,
+            ))
+
+    def query_range(self, db: Session, start: datetime, end: datetime, step_seconds: int,
+                    host: str = "local", now: Optional[datetime] = None) -> Tuple[int, List[dict]]:
+        """Return (resolution, points) for [start, end) from the finest stored data that still
+        covers start within max_points; raises ValueError if nothing does (see choose_resolution)"""
+        now = now or datetime.utcnow()
+        resolution = choose_resolution(start, end, step_seconds, now, self.retention, self.max_points)
+        if resolution == 0:
+            rows = db.execute(
+                select(MetricSample.timestamp, *[getattr(MetricSample, f) for f in METRIC_FIELDS])
+                .where(MetricSample.host == host, MetricSample.timestamp >= start, MetricSample.timestamp < end)
+                .order_by(MetricSample.timestamp)
+                .limit(self.max_points + 1)
+            ).all()
+            if len(rows) > self.max_points:
+                # Too dense to return raw; minute rollups outlive raw samples, so they cover start too
+                return self.query_range(db, start, end, _BASE_RESOLUTION, host, now)
+            points = []
+            for row in rows:
+                point = {"timestamp": row[0], "samples": 1}
+                for field, value in zip(METRIC_FIELDS, row[1:]):
+                    point[field] = {"min": value, "max": value, "avg": value, "p95": value}
+                points.append(point)
+            return resolution, points
+
+        rollups = db.execute(
+            select(MetricRollup)
+            .where(
+                MetricRollup.host == host,
+                MetricRollup.resolution == resolution,
+                MetricRollup.bucket_start >= _bucket_start(start, resolution),
+                MetricRollup.bucket_start < end,
+            )
+            .order_by(MetricRollup.bucket_start)
+        ).scalars().all()
+        points = []
+        for rollup in rollups:
+            point = {"timestamp": rollup.bucket_start, "samples": rollup.sample_count}
+            for field in METRIC_FIELDS:
+                point[field] = {
+                    stat: getattr(rollup, f"{field}_{stat}") for stat in ("min", "max", "avg", "p95")
+                }
+            points.append(point)
+        return resolution, points
+
+
+_ROLLUP_UPSERT = _rollup_upsert()
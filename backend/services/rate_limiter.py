@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+
+class SlidingWindowLimiter:
+    """Counts events per key over a sliding window, tracking at most max_keys keys"""
+
+    def __init__(self, limit: int, window_seconds: float, max_keys: int = 50000):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._events: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self, key: str, now: float) -> deque:
+        events = self._events.get(key)
+        if events is None:
+            events = deque()
+            self._events[key] = events
+            while len(self._events) > self.max_keys:
+                self._events.popitem(last=False)
+        else:
+            self._events.move_to_end(key)
+        cutoff = now - self.window_seconds
+        while events and events[0] <= cutoff:
+            events.popleft()
+        return events
+
+    def retry_after(self, key: str) -> Optional[float]:
+        """Seconds until the key may try again, or None if it is under the limit"""
+        now = time.monotonic()
+        with self._lock:
+            events = self._prune(key, now)
+            if len(events) < self.limit:
+                return None
+            return max(0.0, events[0] + self.window_seconds - now)
+
+    def hit(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            self._prune(key, now).append(now)
+
+    def reset(self, key: str):
+        with self._lock:
+            self._events.pop(key, None)
+
+
+class LoginRateLimiter:
+    """Limits failed logins per identity and total attempts per client IP"""
+
+    def __init__(self, identity_limit: int = 5, ip_limit: int = 30, window_seconds: float = 60):
+        self.identities = SlidingWindowLimiter(identity_limit, window_seconds)
+        self.ips = SlidingWindowLimiter(ip_limit, window_seconds)
+        self.throttled = 0
+
+    def check(self, identity: str, ip: str) -> Optional[float]:
+        """Record an attempt; return a Retry-After in seconds if it should be refused"""
+        identity = identity.lower()
+        wait = max(self.identities.retry_after(identity) or 0, self.ips.retry_after(ip) or 0)
+        if wait > 0:
+            self.throttled += 1
+            return wait
+        self.ips.hit(ip)
+        return None
+
+    def record_failure(self, identity: str):
+        self.identities.hit(identity.lower())
+
+    def record_success(self, identity: str):
+        self.identities.reset(identity.lower())
@@ -0,0 +1,88 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Dict, Hashable, Optional
+from fastapi import Request, Response
+from services.fast_json import dumps
+
+CachedResponse = namedtuple("CachedResponse", ["body", "etag", "headers"])
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison against an If-None-Match header, as RFC 9110 prescribes for GET"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class ResponseCache:
+    """Pre-serialized JSON bodies for polled GET endpoints, keyed by data version.
+
+    Each namespace (e.g. "incidents") has a version that writers bump after
+    committing. An entry is only served while its namespace is still at the
+    version it was built for, so an unchanged poll costs a dict lookup instead
+    of a query plus serialization. Entries are bounded by an LRU.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._versions: Dict[str, int] = {}
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def bump(self, namespace: str):
+        """Invalidate every cached response in a namespace; safe to call from worker threads"""
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def clear(self):
+        """Drop every cached body, e.g. after switching encoders"""
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, namespace: str, key: Hashable, version: int) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((namespace, key))
+            self.hits += 1
+            return entry[1]
+
+    def put(self, namespace: str, key: Hashable, version: int, data,
+            headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+        """Serialize data once and remember it for this version.
+
+        Pass the version read before loading data: if a writer bumped it in the
+        meantime the entry is already stale and the next request rebuilds it.
+        """
+        # Same bytes FastAPI's JSONResponse would produce, so caching is invisible to clients
+        body = dumps(data)
+        # Strong ETag from the bytes themselves, so every worker agrees on it
+        etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        cached = CachedResponse(body, etag, headers or {})
+        with self._lock:
+            self._entries[(namespace, key)] = (version, cached)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cached
+
+    @staticmethod
+    def respond(request: Request, cached: CachedResponse) -> Response:
+        """200 with the cached body, or 304 if the client already has it"""
+        # no-cache lets browsers keep the body but revalidate on every poll
+        headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), cached.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(cached.body, media_type="application/json", headers={**cached.headers, **headers})
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,235 @@
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+import numpy as np
+from sqlalchemy import select, union_all
+from sqlalchemy.orm import Session
+from database import shards
+from models import Incident, IncidentArchive, UpdateOutcome
+
+FEATURE_NAMES = [
+    "is_major",
+    "is_hotfix",
+    "db_migration",
+    "critical_services",
+    "long_deploy",
+    "very_long_deploy",
+    "log_expected_minutes",
+    "keyword_hits",
+    "many_services",
+    "service_count",
+]
+# An update is labelled as having caused an incident if a high/critical one
+# opened within this window after deployment (unless the outcome says otherwise)
+INCIDENT_WINDOW = timedelta(minutes=60)
+INCIDENT_SEVERITIES = ("high", "critical")
+MIN_TRAINING_SAMPLES = 20
+
+
+def feature_vector(update_type: str, db_migration: bool, critical_count: int, expected_minutes: int,
+                   keyword_count: int, service_count: int) -> List[float]:
+    return [
+        float(update_type == "major"),
+        float(update_type == "hotfix"),
+        float(db_migration),
+        float(critical_count),
+        float(expected_minutes > 15),
+        float(expected_minutes > 30),
+        math.log1p(max(0, expected_minutes)),
+        float(keyword_count),
+        float(service_count > 3),
+        float(service_count),
+    ]
+
+
+class RiskModel:
+    """Logistic regression over FEATURE_NAMES with standardization folded into the weights"""
+
+    def __init__(self, version: int, params: np.ndarray, meta: dict):
+        n = len(FEATURE_NAMES)
+        # params layout: [bias, weights(n), mean(n), std(n)]; may be a read-only memmap
+        bias, weights, mean, std = params[0], params[1:n + 1], params[n + 1:2 * n + 1], params[2 * n + 1:]
+        folded = np.asarray(weights / std, dtype=np.float64)
+        self.version = version
+        self.meta = meta
+        self.weights = folded
+        self.bias = float(bias - np.dot(folded, mean))
+        # Plain Python tuple: for ten features this beats a NumPy call per request
+        self._weights = tuple(float(w) for w in folded)
+
+    def probability(self, features: Sequence[float]) -> float:
+        z = self.bias
+        for w, x in zip(self._weights, features):
+            z += w * x
+        return 1.0 / (1.0 + math.exp(-max(-60.0, min(60.0, z))))
+
+    def probabilities(self, matrix: np.ndarray) -> np.ndarray:
+        z = np.clip(matrix @ self.weights + self.bias, -60.0, 60.0)
+        return 1.0 / (1.0 + np.exp(-z))
+
+
+def train_logistic(X: np.ndarray, y: np.ndarray, l2: float = 0.01, iterations: int = 2000,
+                   learning_rate: float = 0.5) -> np.ndarray:
+    """Fit standardized logistic regression by batch gradient descent; returns packed params"""
+    mean = X.mean(axis=0)
+    std = X.std(axis=0)
+    std[std == 0] = 1.0
+    Xs = (X - mean) / std
+    weights = np.zeros(X.shape[1])
+    bias = 0.0
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-np.clip(Xs @ weights + bias, -60.0, 60.0)))
+        error = p - y
+        weights -= learning_rate * (Xs.T @ error / len(y) + l2 * weights)
+        bias -= learning_rate * error.mean()
+    return np.concatenate([[bias], weights, mean, std])
+
+
+class RiskModelRegistry:
+    """Versioned model artifacts on disk with hot-swapping.
+
+    Each version is a raw .npy parameter array (memory-mapped on load) plus a
+    JSON sidecar. A CURRENT file names the active version; it is replaced
+    atomically on publish and re-checked at most every check_interval seconds,
+    so new models go live in every worker without a restart.
+    """
+
+    def __init__(self, directory: str, check_interval: float = 5.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._model: Optional[RiskModel] = None
+        self._signal = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def _current_path(self) -> str:
+        return os.path.join(self.directory, "CURRENT")
+
+    def _paths(self, version: int):
+        base = os.path.join(self.directory, f"risk-model-v{version}")
+        return f"{base}.npy", f"{base}.json"
+
+    def current(self) -> Optional[RiskModel]:
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._model
+        with self._lock:
+            self._next_check = now + self.check_interval
+            try:
+                stat = os.stat(self._current_path)
+            except FileNotFoundError:
+                return self._model
+            signal = (stat.st_ino, stat.st_mtime_ns)
+            if signal != self._signal:
+                try:
+                    self._model = self._load()
+                    self._signal = signal
+                except (OSError, ValueError) as e:
+                    print(f"❌ Could not load risk model, keeping previous: {e}")
+            return self._model
+
+    def _load(self) -> RiskModel:
+        with open(self._current_path) as f:
+            version = int(f.read().strip())
+        params_path, meta_path = self._paths(version)
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("features") != FEATURE_NAMES:
+            raise ValueError(f"model v{version} was trained on different features")
+        return RiskModel(version, np.load(params_path, mmap_mode="r"), meta)
+
+    def publish(self, params: np.ndarray, meta: dict) -> int:
+        """Write a new artifact version and make it current"""
+        os.makedirs(self.directory, exist_ok=True)
+        versions = [
+            int(name[len("risk-model-v"):-len(".npy")])
+            for name in os.listdir(self.directory)
+            if name.startswith("risk-model-v") and name.endswith(".npy")
+        ]
+        version = max(versions, default=0) + 1
+        params_path, meta_path = self._paths(version)
+        np.save(params_path, np.asarray(params, dtype=np.float64))
+        with open(meta_path, "w") as f:
+            json.dump(dict(meta, version=version, features=FEATURE_NAMES), f, indent=2)
+        tmp_path = f"{self._current_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(version))
+        os.replace(tmp_path, self._current_path)
+        self._next_check = 0.0
+        return version
+
+
+def _incident_times(db: Session, shard: int, since: datetime) -> list:
+    """Qualifying incident times in one shard, oldest first; archived incidents still count"""
+    times = union_all(*(
+        select(model.timestamp.label("timestamp"))
+        .where(model.severity.in_(INCIDENT_SEVERITIES), model.timestamp >= since)
+        for model in (Incident, IncidentArchive)
+    )).subquery()
+    return db.execute(select(times.c.timestamp).order_by(times.c.timestamp)).scalars().all()
+
+
+def load_training_data(db: Session, predictor):
+    """Build (X, y) from recorded update outcomes joined against later incidents"""
+    outcomes = db.execute(select(UpdateOutcome).order_by(UpdateOutcome.deployed_at)).scalars().all()
+    if not outcomes:
+        return np.empty((0, len(FEATURE_NAMES))), np.empty(0)
+    incident_times = shards.map(_incident_times, outcomes[0].deployed_at)
+    incident_times = np.array([t.replace(tzinfo=None) for t in heapq.merge(*incident_times)],
+                              dtype="datetime64[us]")
+
+    rows, labels = [], []
+    for outcome in outcomes:
+        services = [s for s in outcome.services_affected.split(",") if s]
+        rows.append(feature_vector(
+            outcome.update_type, outcome.db_migration, len(predictor.critical_services(services)),
+            outcome.expected_minutes, len(predictor.find_keywords(outcome.description)), len(services),
+        ))
+        if outcome.caused_incident is not None:
+            labels.append(float(outcome.caused_incident))
+            continue
+        start = np.datetime64(outcome.deployed_at.replace(tzinfo=None), "us")
+        lo, hi = np.searchsorted(incident_times, [start, start + np.timedelta64(INCIDENT_WINDOW)])
+        labels.append(float(hi > lo))
+    return np.array(rows, dtype=np.float64), np.array(labels, dtype=np.float64)
+
+
+def train_and_publish(db: Session, predictor, registry: RiskModelRegistry) -> dict:
+    X, y = load_training_data(db, predictor)
+    if len(y) < MIN_TRAINING_SAMPLES or y.min() == y.max():
+        raise ValueError(
+            f"Need at least {MIN_TRAINING_SAMPLES} outcomes covering both good and bad deployments "
+            f"(have {len(y)})"
+        )
+    params = train_logistic(X, y)
+    model = RiskModel(0, params, {})
+    accuracy = float(((model.probabilities(X) >= 0.5) == (y == 1)).mean())
+    meta = {
+        "trained_at": datetime.utcnow().isoformat(),
+        "samples": int(len(y)),
+        "positive_rate": round(float(y.mean()), 4),
+        "training_accuracy": round(accuracy, 4),
+    }
+    meta["version"] = registry.publish(params, meta)
+    return meta
+
+
+if __name__ == "__main__":
+    import sys
+    from database import SessionLocal
+    from services.risk_predictor import RiskPredictor
+
+    if sys.argv[1:] != ["train"]:
+        sys.exit("usage: python -m services.risk_model train")
+    session = SessionLocal()
+    try:
+        print(train_and_publish(session, RiskPredictor(), RiskModelRegistry(
+            os.getenv("RISK_MODEL_DIR", "./risk_models"))))
+    finally:
+        session.close()
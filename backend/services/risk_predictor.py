@@ -1,69 +1,158 @@
-import random
-from typing import List
+import re
+from typing import List, Optional
+import numpy as np
+from services.risk_model import RiskModelRegistry, feature_vector
+
+CRITICAL_SERVICES = frozenset(["payments", "database", "auth"])
+HIGH_RISK_KEYWORDS = ["schema", "migration", "refactor", "breaking", "restructure"]
+UPDATE_TYPE_SCORES = {"major": 25, "hotfix": 15}  # anything else is scored as minor
 
 class RiskPredictor:
-    def __init__(self):
-        pass
-    
+    def __init__(self, model_registry: Optional[RiskModelRegistry] = None):
+        self.model_registry = model_registry
+        # Lookahead so overlapping keywords (e.g. "refactorestructure") are all found
+        self._keyword_pattern = re.compile(
+            "(?=(" + "|".join(re.escape(kw) for kw in HIGH_RISK_KEYWORDS) + "))"
+        )
+
+    def find_keywords(self, description: str) -> List[str]:
+        """High-risk keywords present in the description, in HIGH_RISK_KEYWORDS order"""
+        hits = set(self._keyword_pattern.findall(description.lower()))
+        return [kw for kw in HIGH_RISK_KEYWORDS if kw in hits]
+
+    @staticmethod
+    def critical_services(services_affected: List[str]) -> List[str]:
+        return [s for s in services_affected if s.lower() in CRITICAL_SERVICES]
+
     def predict_risk(self, update_title: str, update_type: str, services_affected: List[str],
                     db_migration: bool, expected_minutes: int, description: str) -> dict:
-        """Rule-based risk prediction (can be replaced with ML later)"""
-        risk_score = 0
+        """Risk prediction from the trained model when one is published, rules otherwise"""
+        affected_critical = self.critical_services(services_affected)
+        found_keywords = self.find_keywords(description)
+
+        risk_score = UPDATE_TYPE_SCORES.get(update_type, 5)
+        if db_migration:
+            risk_score += 30
+        risk_score += 20 * len(affected_critical)
+        if expected_minutes > 15:
+            risk_score += 15
+        if found_keywords:
+            risk_score += 10
+        if len(services_affected) > 3:
+            risk_score += 10
+
+        model_note = None
+        model = self.model_registry.current() if self.model_registry else None
+        if model is not None:
+            probability = model.probability(feature_vector(
+                update_type, db_migration, len(affected_critical), expected_minutes,
+                len(found_keywords), len(services_affected),
+            ))
+            risk_score = round(100 * probability)
+            model_note = self._model_note(model.version, probability)
+
+        predicted_min = max(1, int(expected_minutes * 0.8))  # 20% less than expected
+        predicted_max = int(expected_minutes * (1.4 + (risk_score / 100) * 0.3))  # 40-70% more
+        return self._explain(update_type, db_migration, affected_critical, expected_minutes,
+                             found_keywords, len(services_affected), risk_score,
+                             predicted_min, predicted_max, model_note)
+
+    def predict_batch(self, updates: List[dict]) -> List[dict]:
+        """Score many updates at once; results are returned in input order.
+
+        Features are extracted into columns and scored with array arithmetic.
+        Only the human-readable reasons are assembled per update.
+        """
+        if not updates:
+            return []
+        affected_critical = [self.critical_services(u["services_affected"]) for u in updates]
+        found_keywords = [self.find_keywords(u["description"]) for u in updates]
+
+        type_score = np.fromiter((UPDATE_TYPE_SCORES.get(u["update_type"], 5) for u in updates),
+                                 dtype=np.int64, count=len(updates))
+        migration = np.fromiter((bool(u["db_migration"]) for u in updates), dtype=bool, count=len(updates))
+        critical_count = np.fromiter((len(c) for c in affected_critical), dtype=np.int64, count=len(updates))
+        expected = np.fromiter((u["expected_minutes"] for u in updates), dtype=np.int64, count=len(updates))
+        keyword_hit = np.fromiter((bool(k) for k in found_keywords), dtype=bool, count=len(updates))
+        service_count = np.fromiter((len(u["services_affected"]) for u in updates),
+                                    dtype=np.int64, count=len(updates))
+
+        risk_score = (type_score + 30 * migration + 20 * critical_count + 15 * (expected > 15)
+                      + 10 * keyword_hit + 10 * (service_count > 3))
+
+        model_notes = [None] * len(updates)
+        model = self.model_registry.current() if self.model_registry else None
+        if model is not None:
+            features = np.array([
+                feature_vector(u["update_type"], bool(migration[i]), int(critical_count[i]), int(expected[i]),
+                               len(found_keywords[i]), int(service_count[i]))
+                for i, u in enumerate(updates)
+            ])
+            probabilities = model.probabilities(features)
+            # Same rounding as the single-update path (round half to even)
+            risk_score = np.round(100 * probabilities).astype(np.int64)
+            model_notes = [self._model_note(model.version, p) for p in probabilities]
+        predicted_min = np.maximum(1, (expected * 0.8).astype(np.int64))
+        predicted_max = (expected * (1.4 + (risk_score / 100) * 0.3)).astype(np.int64)
+
+        return [
+            self._explain(u["update_type"], bool(migration[i]), affected_critical[i], int(expected[i]),
+                          found_keywords[i], int(service_count[i]), int(risk_score[i]),
+                          int(predicted_min[i]), int(predicted_max[i]), model_notes[i])
+            for i, u in enumerate(updates)
+        ]
+
+    @staticmethod
+    def _model_note(version: int, probability: float) -> str:
+        return f"Risk model v{version} estimates a {probability:.0%} chance of an incident"
+
+    @staticmethod
+    def _explain(update_type: str, db_migration: bool, affected_critical: List[str], expected_minutes: int,
+                 found_keywords: List[str], service_count: int, risk_score: int,
+                 predicted_min: int, predicted_max: int, model_note: Optional[str] = None) -> dict:
         reasons = []
         recommendations = []
-        
+
         # Update type scoring
         if update_type == "major":
-            risk_score += 25
             reasons.append("Major updates have higher risk of breaking changes")
             recommendations.append("Consider staging environment testing before production")
         elif update_type == "hotfix":
-            risk_score += 15
             reasons.append("Hotfixes are often rushed and may introduce new issues")
             recommendations.append("Ensure comprehensive testing despite urgency")
         else:  # minor
-            risk_score += 5
             reasons.append("Minor updates typically have lower risk")
-        
+
         # Database migration scoring
         if db_migration:
-            risk_score += 30
             reasons.append("Database migrations increase rollback complexity")
             recommendations.append("Create database backup before migration")
             recommendations.append("Test migration on staging environment first")
             recommendations.append("Have rollback script ready")
-        
+
         # Critical services scoring
-        critical_services = ["payments", "database", "auth"]
-        affected_critical = [s for s in services_affected if s.lower() in critical_services]
         if affected_critical:
-            risk_score += 20 * len(affected_critical)
             reasons.append(f"Critical services affected: {', '.join(affected_critical)}")
             recommendations.append("Schedule update during low-traffic period")
             recommendations.append("Enable maintenance mode before deployment")
-        
+
         # Expected duration scoring
         if expected_minutes > 15:
-            risk_score += 15
             reasons.append("Longer deployment windows increase exposure to issues")
             recommendations.append("Break down into smaller, incremental updates if possible")
-        elif expected_minutes > 30:
-            risk_score += 10  # Additional for very long deployments
-        
+
         # Description keyword analysis
-        description_lower = description.lower()
-        high_risk_keywords = ["schema", "migration", "refactor", "breaking", "restructure"]
-        found_keywords = [kw for kw in high_risk_keywords if kw in description_lower]
         if found_keywords:
-            risk_score += 10
             reasons.append(f"Description contains high-risk keywords: {', '.join(found_keywords)}")
-        
+
         # Multiple services affected
-        if len(services_affected) > 3:
-            risk_score += 10
+        if service_count > 3:
             reasons.append("Multiple services affected increases coordination complexity")
             recommendations.append("Consider deploying services sequentially")
-        
+
+        if model_note:
+            reasons.append(model_note)
+
         # Determine risk level
         if risk_score <= 30:
             risk_level = "Low"
@@ -73,18 +162,11 @@ class RiskPredictor:
             risk_level = "High"
             recommendations.append("Consider postponing if not critical")
             recommendations.append("Ensure full team is available during deployment")
-        
-        # Calculate predicted downtime range
-        base_minutes = expected_minutes
-        # Add buffer based on risk
-        risk_multiplier = 1 + (risk_score / 100) * 0.5  # Up to 50% additional time
-        predicted_min = max(1, int(base_minutes * 0.8))  # 20% less than expected
-        predicted_max = int(base_minutes * (1.4 + (risk_score / 100) * 0.3))  # 40-70% more
-        
+
         # Add default recommendations
         if not recommendations:
             recommendations.append("Standard deployment procedures should be sufficient")
-        
+
         return {
             "risk_score": min(100, risk_score),
             "risk_level": risk_level,
@@ -0,0 +1,323 @@
+"""Deterministic scenario replay: days of metrics generated at once, then fed offline
+through the incident engine and the downtime forecaster.
+
+    python -m services.scenario_replay scenarios/example.json
+    python -m services.scenario_replay scenarios/example.json --pipelines
+"""
+import argparse
+import json
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+from services.downtime_forecaster import DowntimeForecaster
+from services.fleet_simulator import BASELINES, MAINTENANCE_RANGES, SPIKES
+from services.incident_engine import IncidentEngine, IncidentRule, evaluate_samples
+from services.metrics_sampler import METRIC_FIELDS, STATUSES
+from services.metrics_simulator import DEGRADED_THRESHOLDS, DOWN_THRESHOLDS
+
+EVENT_TYPES = ("spike", "ramp", "outage", "maintenance")
+# Mean-reverting log-space noise per metric: (per-step autocorrelation, stationary std of log value)
+_PROCESS = {
+    "cpu": (0.995, 0.25),
+    "ram": (0.998, 0.15),
+    "response_time": (0.99, 0.3),
+    "error_rate": (0.99, 0.6),
+    "db_latency": (0.99, 0.3),
+}
+# Values reported during an outage unless the event overrides them (±20% jitter)
+_OUTAGE = {"error_rate": 60.0, "response_time": 5000.0}
+_LIMITS = {"cpu": 100.0, "ram": 100.0, "error_rate": 100.0}
+_DOWN = STATUSES.index("down")
+_DEGRADED = STATUSES.index("degraded")
+_OPERATIONAL = STATUSES.index("operational")
+_IN_MAINTENANCE = STATUSES.index("maintenance")
+
+
+class ScenarioEvent:
+    """One scripted change to the metrics of some (default: all) hosts over a time window.
+
+    spike multiplies metrics by factors for the whole window, ramp grows the
+    multiplier linearly from 1 to factors across it, outage pins metrics to
+    values, and maintenance reports maintenance readings.
+    """
+
+    def __init__(self, type: str, at_minutes: float, duration_minutes: float, hosts: Optional[List[str]] = None,
+                 factors: Optional[Dict[str, float]] = None, values: Optional[Dict[str, float]] = None):
+        if type not in EVENT_TYPES:
+            raise ValueError(f"unknown event type {type!r} (choose from {', '.join(EVENT_TYPES)})")
+        for metric in list(factors or {}) + list(values or {}):
+            if metric not in METRIC_FIELDS:
+                raise ValueError(f"unknown metric {metric!r} in {type} event")
+        self.type = type
+        self.at = timedelta(minutes=at_minutes)
+        self.duration = timedelta(minutes=duration_minutes)
+        self.hosts = hosts
+        if factors is None and type in ("spike", "ramp"):
+            factors = {field: (low + high) / 2 for field, (low, high, _) in SPIKES.items()}
+        self.factors = factors or {}
+        self.values = dict(_OUTAGE, **(values or {})) if type == "outage" else (values or {})
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ScenarioEvent":
+        return cls(**data)
+
+
+class Scenario:
+    """A replayable run: time span, sampling interval, hosts, seed and scripted events"""
+
+    def __init__(self, start: str, duration_hours: float, interval_seconds: float = 3, hosts=1,
+                 seed: int = 0, random_spikes: bool = True, events: Optional[List[dict]] = None,
+                 name: str = "scenario"):
+        self.name = name
+        self.start = datetime.fromisoformat(start)
+        self.duration = timedelta(hours=duration_hours)
+        self.interval = interval_seconds
+        self.hosts = [f"host-{i:05d}" for i in range(hosts)] if isinstance(hosts, int) else list(hosts)
+        self.seed = seed
+        self.random_spikes = random_spikes
+        self.events = [ScenarioEvent.from_dict(event) for event in events or []]
+        for event in self.events:
+            unknown = set(event.hosts or ()) - set(self.hosts)
+            if unknown:
+                raise ValueError(f"{event.type} event names unknown hosts: {', '.join(sorted(unknown))}")
+
+    @property
+    def steps(self) -> int:
+        return int(self.duration.total_seconds() // self.interval)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Scenario":
+        return cls(**data)
+
+
+def load_scenario(path: str) -> Scenario:
+    with open(path) as f:
+        return Scenario.from_dict(json.load(f))
+
+
+class ReplayResult:
+    """Metrics for every host at every step, as (hosts, steps) arrays"""
+
+    def __init__(self, scenario: Scenario, values: Dict[str, np.ndarray], status: np.ndarray):
+        self.scenario = scenario
+        self.hosts = scenario.hosts
+        self.values = values
+        self.status = status
+        self.offsets = np.arange(status.shape[1]) * scenario.interval  # seconds since scenario start
+
+    @property
+    def steps(self) -> int:
+        return self.status.shape[1]
+
+    @property
+    def samples(self) -> int:
+        return self.status.size
+
+    def timestamp(self, step: int) -> datetime:
+        return self.scenario.start + timedelta(seconds=float(self.offsets[step]))
+
+    def samples_at(self, step: int) -> List[dict]:
+        """One sample dict per host, shaped like MetricsSimulator output plus a host key"""
+        timestamp = self.timestamp(step)
+        columns = {field: self.values[field][:, step].tolist() for field in METRIC_FIELDS}
+        statuses = self.status[:, step].tolist()
+        return [
+            dict({field: columns[field][h] for field in METRIC_FIELDS},
+                 host=host, status=STATUSES[statuses[h]], timestamp=timestamp)
+            for h, host in enumerate(self.hosts)
+        ]
+
+    def iter_samples(self) -> Iterator[List[dict]]:
+        for step in range(self.steps):
+            yield self.samples_at(step)
+
+
+def _ar1(shape, phi: float, std: float, rng: np.random.Generator) -> np.ndarray:
+    """Stationary AR(1) series along the last axis, computed in blocks without a per-step loop.
+
+    Within a block z[k] = phi^k * cumsum(eps[j] / phi^j), so only the value
+    carried between blocks needs a (short) Python loop. Blocks are sized so
+    phi^-k stays small enough not to lose precision.
+    """
+    hosts, steps = shape
+    block = int(max(16, min(1024, 20 / -math.log(phi))))
+    blocks = -(-steps // block)
+    eps = rng.standard_normal((hosts, blocks, block)) * std * math.sqrt(1 - phi * phi)
+    k = np.arange(block)
+    within = phi ** k * np.cumsum(eps * phi ** -k, axis=-1)
+    carry = np.empty((hosts, blocks))
+    previous = rng.standard_normal(hosts) * std  # start from the stationary distribution
+    decay = phi ** block
+    for b in range(blocks):
+        carry[:, b] = previous
+        previous = within[:, b, -1] + decay * previous
+    series = within + phi ** (k + 1) * carry[:, :, None]
+    return series.reshape(hosts, blocks * block)[:, :steps]
+
+
+def _window(scenario: Scenario, event: ScenarioEvent):
+    """Host indices and step slice an event covers"""
+    hosts = np.arange(len(scenario.hosts)) if event.hosts is None else np.array(
+        [scenario.hosts.index(host) for host in event.hosts])
+    first = math.ceil(event.at.total_seconds() / scenario.interval)
+    last = math.ceil((event.at + event.duration).total_seconds() / scenario.interval)
+    return hosts, slice(max(0, first), max(0, min(scenario.steps, last)))
+
+
+def replay(scenario: Scenario) -> ReplayResult:
+    """Generate every sample of a scenario with vectorized NumPy; the seed fixes the output"""
+    rng = np.random.default_rng(scenario.seed)
+    shape = (len(scenario.hosts), scenario.steps)
+    offsets = np.arange(scenario.steps) * scenario.interval
+
+    values = {}
+    for field in METRIC_FIELDS:
+        base, lo, hi, _ = BASELINES[field]
+        phi, std = _PROCESS[field]
+        values[field] = np.clip(base * np.exp(_ar1(shape, phi, std, rng)), lo, hi)
+
+    if scenario.random_spikes:
+        # As in the live simulator: 5% chance per sample of a 10-30 s spike
+        starting = rng.random(shape) < 0.05
+        ends = np.where(starting, offsets + rng.uniform(10, 30, shape), -np.inf)
+        spiking = np.maximum.accumulate(ends, axis=1) > offsets
+        for field, (low, high, cap) in SPIKES.items():
+            spiked = np.minimum(cap, values[field] * rng.uniform(low, high, shape))
+            values[field] = np.where(spiking, spiked, values[field])
+
+    maintenance = np.zeros(shape, dtype=bool)
+    for event in scenario.events:
+        hosts, steps = _window(scenario, event)
+        if steps.start >= steps.stop or not len(hosts):
+            continue
+        cells = np.ix_(hosts, np.arange(steps.start, steps.stop))
+        width = steps.stop - steps.start
+        if event.type == "maintenance":
+            maintenance[cells] = True
+            for field, (lo, hi) in MAINTENANCE_RANGES.items():
+                values[field][cells] = rng.uniform(lo, hi, (len(hosts), width))
+        elif event.type == "outage":
+            for field, value in event.values.items():
+                values[field][cells] = value * rng.uniform(0.8, 1.2, (len(hosts), width))
+        else:
+            progress = np.linspace(1 / width, 1, width) if event.type == "ramp" else np.ones(width)
+            for field, factor in event.factors.items():
+                values[field][cells] = values[field][cells] * (1 + (factor - 1) * progress)
+
+    for field in METRIC_FIELDS:
+        if field in _LIMITS:
+            np.minimum(values[field], _LIMITS[field], out=values[field])
+        values[field] = np.round(values[field], 2)
+
+    error_rate, response_time = values["error_rate"], values["response_time"]
+    status = np.select(
+        [
+            maintenance,
+            (error_rate > DOWN_THRESHOLDS["error_rate"]) | (response_time > DOWN_THRESHOLDS["response_time"]),
+            (error_rate > DEGRADED_THRESHOLDS["error_rate"])
+            | (response_time > DEGRADED_THRESHOLDS["response_time"]),
+        ],
+        [_IN_MAINTENANCE, _DOWN, _DEGRADED],
+        _OPERATIONAL,
+    ).astype(np.int8)
+    return ReplayResult(scenario, values, status)
+
+
+def run_pipelines(result: ReplayResult, rules: Optional[List[IncidentRule]] = None,
+                  forecaster: Optional[DowntimeForecaster] = None) -> dict:
+    """Feed a replay through the forecaster and incident rules in simulated time, without a database.
+
+    Returns the incidents the engine would have written (with grouping and
+    auto-resolution applied) and how many outages the early warning rule
+    anticipated.
+    """
+    current = [result.scenario.start]
+    engine = IncidentEngine(rules=rules, clock=lambda: current[0])
+    forecaster = forecaster or DowntimeForecaster()
+    incidents: Dict[int, dict] = {}
+
+    for step in range(result.steps):
+        current[0] = result.timestamp(step)
+        rows = evaluate_samples(engine, forecaster, result.samples_at(step))
+        ids = list(range(len(incidents) + 1, len(incidents) + 1 + len(rows)))
+        engine.mark_opened(rows, ids)
+        for row, incident_id in zip(rows, ids):
+            incidents[incident_id] = dict(row, id=incident_id, resolved_at=None)
+        repeats, resolves = engine.take_updates()
+        for incident_id, (count, seen) in repeats.items():
+            incidents[incident_id]["occurrences"] += count
+            incidents[incident_id]["last_seen"] = seen
+        for incident_id, (resolved, seen) in resolves.items():
+            incidents[incident_id].update(status="resolved", resolved_at=resolved)
+            if seen is not None:
+                incidents[incident_id]["last_seen"] = seen
+
+    by_rule: Dict[str, int] = {}
+    for incident in incidents.values():
+        rule = incident["dedupe_key"].split("@", 1)[0]
+        by_rule[rule] = by_rule.get(rule, 0) + 1
+    return {
+        "incidents": sorted(incidents.values(), key=lambda incident: incident["id"]),
+        "by_rule": by_rule,
+        "outages": _warning_coverage(result, incidents.values(), forecaster.horizon_minutes),
+    }
+
+
+def _warning_coverage(result: ReplayResult, incidents, horizon_minutes: float) -> dict:
+    """Outages (runs of "down" samples) and how many an early warning preceded within the horizon"""
+    down = result.status == _DOWN
+    starts = down & ~np.concatenate([np.zeros((down.shape[0], 1), dtype=bool), down[:, :-1]], axis=1)
+    warnings: Dict[str, List[datetime]] = {}
+    for incident in incidents:
+        rule, _, host = incident["dedupe_key"].partition("@")
+        if rule == "downtime_forecast":
+            warnings.setdefault(host or "local", []).append(incident["timestamp"])
+    horizon = timedelta(minutes=horizon_minutes)
+    total, warned, leads = 0, 0, []
+    for h, step in zip(*np.nonzero(starts)):
+        total += 1
+        began = result.timestamp(int(step))
+        earlier = [t for t in warnings.get(result.hosts[h], ()) if began - horizon <= t <= began]
+        if earlier:
+            warned += 1
+            leads.append((began - min(earlier)).total_seconds() / 60)
+    return {
+        "total": total,
+        "warned": warned,
+        "median_lead_minutes": round(float(np.median(leads)), 2) if leads else None,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m services.scenario_replay", description=__doc__.split("\n")[0])
+    parser.add_argument("scenario", help="scenario JSON file")
+    parser.add_argument("--pipelines", action="store_true", help="also run the incident and forecast pipelines")
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario)
+    started = time.perf_counter()
+    result = replay(scenario)
+    elapsed = time.perf_counter() - started
+    counts = np.bincount(result.status.ravel(), minlength=len(STATUSES))
+    print(f"✅ {scenario.name}: {result.samples:,} samples ({len(result.hosts)} hosts x {result.steps:,} steps) "
+          f"in {elapsed:.2f}s ({result.samples / elapsed:,.0f} samples/s)")
+    print("   " + ", ".join(f"{name} {count:,}" for name, count in zip(STATUSES, counts)))
+
+    if args.pipelines:
+        started = time.perf_counter()
+        summary = run_pipelines(result)
+        elapsed = time.perf_counter() - started
+        print(f"✅ Pipelines: {len(summary['incidents'])} incidents in {elapsed:.2f}s "
+              f"({result.samples / elapsed:,.0f} samples/s)")
+        for rule, count in sorted(summary["by_rule"].items()):
+            print(f"   {rule}: {count}")
+        outages = summary["outages"]
+        print(f"   outages: {outages['total']}, early warning for {outages['warned']}, "
+              f"median lead {outages['median_lead_minutes']} min")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,294 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+from database import ShardRouter
+from models import SlaDay, StatusInterval
+
+# What an interval can be; maintenance is split by whether a scheduled window switched it on
+STATUS_KINDS = ("operational", "degraded", "down", "maintenance", "scheduled_maintenance")
+_KIND_INDEX = {kind: i for i, kind in enumerate(STATUS_KINDS)}
+_SECONDS_COLUMNS = [getattr(SlaDay, f"{kind}_seconds") for kind in STATUS_KINDS]
+_CUM_COLUMNS = [getattr(SlaDay, f"cum_{kind}_seconds") for kind in STATUS_KINDS]
+
+# Which maintenance is left out of the availability calculation; the rest counts as downtime
+MAINTENANCE_POLICIES = {
+    "scheduled": ("scheduled_maintenance",),  # only announced windows are excluded
+    "all": ("maintenance", "scheduled_maintenance"),
+    "none": (),
+}
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+
+def _split_days(start: datetime, end: datetime):
+    """(day, seconds) pieces of [start, end) cut at UTC midnight"""
+    while start < end:
+        boundary = _day_start(start.date() + timedelta(days=1))
+        piece_end = min(end, boundary)
+        yield start.date(), (piece_end - start).total_seconds()
+        start = piece_end
+
+
+def availability(seconds: List[float], policy: str) -> dict:
+    """Uptime, downtime and excluded seconds plus availability in percent for per-kind seconds"""
+    by_kind = dict(zip(STATUS_KINDS, seconds))
+    excluded_kinds = MAINTENANCE_POLICIES[policy]
+    uptime = by_kind["operational"] + by_kind["degraded"]
+    excluded = sum(by_kind[kind] for kind in excluded_kinds)
+    downtime = sum(by_kind.values()) - uptime - excluded
+    counted = uptime + downtime
+    return {
+        "availability": round(100.0 * uptime / counted, 4) if counted > 0 else None,
+        "uptime_seconds": round(uptime, 3),
+        "downtime_seconds": round(downtime, 3),
+        "excluded_seconds": round(excluded, 3),
+        "seconds": {kind: round(value, 3) for kind, value in by_kind.items()},
+    }
+
+
+class _Run:
+    """The open interval of one host"""
+    __slots__ = ("kind", "started_at", "last_seen", "row_id")
+
+    def __init__(self, kind: str, started_at: datetime, last_seen: datetime, row_id: Optional[int] = None):
+        self.kind = kind
+        self.started_at = started_at
+        self.last_seen = last_seen
+        self.row_id = row_id
+
+
+class SlaEngine:
+    """Availability per host from run-length status intervals.
+
+    Consecutive samples with the same status collapse into one interval, so
+    storage grows with status changes rather than samples. The time between
+    two samples counts towards the earlier sample's status; a gap longer than
+    max_gap counts as unobserved. Seconds are also added to one SlaDay row per
+    host and day whose cum_* columns hold running totals, so a report over
+    any window costs two indexed lookups for the whole days plus the few
+    intervals overlapping its partial first and last day.
+
+    Only the leader worker adds samples; any worker can run reports. A
+    host's rows live in its shard, so reports run against that shard alone.
+    """
+
+    def __init__(self, shards: ShardRouter, max_gap: float = 60.0, flush_interval: float = 30.0):
+        self.shards = shards
+        self.max_gap = timedelta(seconds=max_gap)
+        self.flush_interval = flush_interval
+        self._runs: Dict[str, _Run] = {}
+        self._closed: List[Tuple[str, _Run, datetime]] = []  # (host, run, ended_at) awaiting a write
+        self._dirty: set = set()  # hosts whose open run changed since the last flush
+        self._pending_days: Dict[Tuple[str, date], List[float]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    @staticmethod
+    def _latest_intervals(db: Session, shard: int) -> list:
+        latest = select(func.max(StatusInterval.id)).group_by(StatusInterval.host)
+        return db.execute(
+            select(StatusInterval.id, StatusInterval.host, StatusInterval.status,
+                   StatusInterval.started_at, StatusInterval.ended_at)
+            .where(StatusInterval.id.in_(latest))
+        ).all()
+
+    def load_state(self, shards: ShardRouter):
+        """Resume each host's latest interval, e.g. after a restart or when taking over as leader"""
+        rows = [row for shard_rows in shards.map(self._latest_intervals) for row in shard_rows]
+        with self._lock:
+            self._runs = {
+                host: _Run(status, _naive(started_at), _naive(ended_at), row_id)
+                for row_id, host, status, started_at, ended_at in rows
+            }
+            self._closed.clear()
+            self._dirty.clear()
+            self._pending_days.clear()
+
+    def add_many(self, samples: List[dict], host: str = "local", scheduled_maintenance: bool = False):
+        """Record samples in time order per host; a per-sample "host" key overrides host.
+
+        scheduled_maintenance marks "maintenance" samples as falling inside a scheduled window.
+        """
+        with self._lock:
+            for metrics in samples:
+                status = metrics["status"]
+                if status == "maintenance" and scheduled_maintenance:
+                    status = "scheduled_maintenance"
+                self._observe(metrics.get("host", host), status, metrics["timestamp"])
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def _observe(self, host: str, kind: str, timestamp: datetime):
+        run = self._runs.get(host)
+        if run is None:
+            self._runs[host] = _Run(kind, timestamp, timestamp)
+            self._dirty.add(host)
+            return
+        if timestamp <= run.last_seen:
+            return  # late or duplicate sample; the interval already covers it
+        contiguous = timestamp - run.last_seen <= self.max_gap
+        if contiguous:
+            self._account(host, run.kind, run.last_seen, timestamp)
+        if contiguous and kind == run.kind:
+            run.last_seen = timestamp
+        else:
+            self._closed.append((host, run, timestamp if contiguous else run.last_seen))
+            self._runs[host] = _Run(kind, timestamp, timestamp)
+        self._dirty.add(host)
+
+    def _account(self, host: str, kind: str, start: datetime, end: datetime):
+        index = _KIND_INDEX[kind]
+        for day, seconds in _split_days(start, end):
+            pending = self._pending_days.get((host, day))
+            if pending is None:
+                pending = self._pending_days[(host, day)] = [0.0] * len(STATUS_KINDS)
+            pending[index] += seconds
+
+    def flush(self):
+        """Write closed intervals, checkpoint open ones and add the pending seconds to the day rows"""
+        with self._flush_lock:
+            with self._lock:
+                closed, self._closed = self._closed, []
+                open_runs = [(host, self._runs[host]) for host in self._dirty]
+                self._dirty = set()
+                days, self._pending_days = self._pending_days, {}
+                self._last_flush = time.monotonic()
+                checkpoints = [(host, run, run.last_seen) for host, run in open_runs]
+            if not closed and not open_runs and not days:
+                return
+            intervals = self.shards.group(closed + checkpoints, lambda item: item[0])
+            day_rows = self.shards.group(sorted(days.items()), lambda item: item[0][0])
+            self.shards.for_each(
+                {shard: (intervals.get(shard, []), day_rows.get(shard, []))
+                 for shard in set(intervals) | set(day_rows)},
+                self._write,
+            )
+
+    def _write(self, db: Session, shard: int, batch: tuple):
+        intervals, days = batch
+        inserted = []
+        for host, run, ended_at in intervals:
+            if run.row_id is None:
+                row_id = db.execute(insert(StatusInterval).values(
+                    host=host, status=run.kind, started_at=run.started_at, ended_at=ended_at,
+                )).inserted_primary_key[0]
+                inserted.append((run, row_id))
+            else:
+                db.execute(update(StatusInterval).where(StatusInterval.id == run.row_id)
+                           .values(ended_at=ended_at))
+        for (host, day), seconds in days:
+            self._add_day(db, host, day, seconds)
+        db.commit()
+        # Only once committed, or a failed flush would leave runs pointing at rolled back rows
+        for run, row_id in inserted:
+            run.row_id = row_id
+
+    @staticmethod
+    def _add_day(db: Session, host: str, day: date, seconds: List[float]):
+        deltas = {f"{kind}_seconds": value for kind, value in zip(STATUS_KINDS, seconds)}
+        cum_deltas = {f"cum_{kind}_seconds": value for kind, value in zip(STATUS_KINDS, seconds)}
+        existing = db.execute(
+            select(SlaDay.id).where(SlaDay.host == host, SlaDay.day == day)
+        ).scalar()
+        if existing is None:
+            previous = db.execute(
+                select(*_CUM_COLUMNS).where(SlaDay.host == host, SlaDay.day < day)
+                .order_by(SlaDay.day.desc()).limit(1)
+            ).first() or [0.0] * len(STATUS_KINDS)
+            db.execute(insert(SlaDay).values(
+                host=host, day=day, **deltas,
+                **{name: base + cum_deltas[name] for name, base in zip(cum_deltas, previous)},
+            ))
+        else:
+            db.execute(update(SlaDay).where(SlaDay.id == existing).values(
+                **{name: getattr(SlaDay, name) + value for name, value in {**deltas, **cum_deltas}.items()}
+            ))
+        # Running totals of later days include this one; only backfilled samples get here
+        db.execute(update(SlaDay).where(SlaDay.host == host, SlaDay.day > day).values(
+            **{name: getattr(SlaDay, name) + value for name, value in cum_deltas.items()}
+        ))
+
+    @staticmethod
+    def _cumulative_before(db: Session, host: str, day: date) -> List[float]:
+        row = db.execute(
+            select(*_CUM_COLUMNS).where(SlaDay.host == host, SlaDay.day < day)
+            .order_by(SlaDay.day.desc()).limit(1)
+        ).first()
+        return list(row) if row else [0.0] * len(STATUS_KINDS)
+
+    @staticmethod
+    def _overlapping(db: Session, host: str, start: datetime, end: datetime,
+                     limit: Optional[int] = None) -> List[tuple]:
+        """(status, started_at, ended_at) of the intervals overlapping [start, end), oldest first"""
+        columns = (StatusInterval.status, StatusInterval.started_at, StatusInterval.ended_at)
+        # Intervals of a host never overlap, so at most one that started earlier reaches into the window
+        before = db.execute(
+            select(*columns).where(StatusInterval.host == host, StatusInterval.started_at < start)
+            .order_by(StatusInterval.started_at.desc()).limit(1)
+        ).all()
+        inside = select(*columns).where(
+            StatusInterval.host == host, StatusInterval.started_at >= start, StatusInterval.started_at < end,
+        ).order_by(StatusInterval.started_at)
+        if limit is not None:
+            inside = inside.limit(limit)
+        rows = [row for row in before if _naive(row[2]) > start] + db.execute(inside).all()
+        return [(status, _naive(started_at), _naive(ended_at)) for status, started_at, ended_at in rows]
+
+    def _interval_seconds(self, db: Session, host: str, start: datetime, end: datetime) -> List[float]:
+        """Per-kind seconds of the intervals overlapping [start, end), clipped to it"""
+        totals = [0.0] * len(STATUS_KINDS)
+        if start >= end:
+            return totals
+        for status, started_at, ended_at in self._overlapping(db, host, start, end):
+            overlap = (min(ended_at, end) - max(started_at, start)).total_seconds()
+            if overlap > 0:
+                totals[_KIND_INDEX[status]] += overlap
+        return totals
+
+    def report(self, db: Session, host: str, start: datetime, end: datetime, policy: str = "scheduled") -> dict:
+        """Availability over [start, end) as of the last flush"""
+        first_day = start.date() if start == _day_start(start.date()) else start.date() + timedelta(days=1)
+        last_day = end.date()  # exclusive
+        if first_day < last_day:
+            later = self._cumulative_before(db, host, last_day)
+            earlier = self._cumulative_before(db, host, first_day)
+            seconds = [b - a for a, b in zip(earlier, later)]
+            edges = [(start, _day_start(first_day)), (_day_start(last_day), end)]
+        else:
+            seconds = [0.0] * len(STATUS_KINDS)
+            edges = [(start, end)]
+        for edge_start, edge_end in edges:
+            for i, value in enumerate(self._interval_seconds(db, host, edge_start, edge_end)):
+                seconds[i] += value
+        result = availability(seconds, policy)
+        observed = sum(seconds)
+        result.update(
+            host=host, start=start, end=end, policy=policy,
+            unobserved_seconds=round(max(0.0, (end - start).total_seconds() - observed), 3),
+        )
+        return result
+
+    def daily(self, db: Session, host: str, first_day: date, last_day: date, policy: str = "scheduled") -> List[dict]:
+        """One row per day in [first_day, last_day] that has data, oldest first"""
+        rows = db.execute(
+            select(SlaDay.day, *_SECONDS_COLUMNS)
+            .where(SlaDay.host == host, SlaDay.day >= first_day, SlaDay.day <= last_day)
+            .order_by(SlaDay.day)
+        ).all()
+        return [dict(availability(list(row[1:]), policy), date=row[0]) for row in rows]
+
+    def intervals(self, db: Session, host: str, start: datetime, end: datetime, limit: int = 1000) -> List[dict]:
+        """Status intervals overlapping [start, end), oldest first"""
+        rows = self._overlapping(db, host, start, end, limit)[:limit]
+        return [{"status": status, "started_at": started, "ended_at": ended} for status, started, ended in rows]
+
+
+def _naive(value: datetime) -> datetime:
+    return value.replace(tzinfo=None) if value.tzinfo is not None else value
@@ -0,0 +1,199 @@
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import func, select, union_all
+from sqlalchemy.orm import Session
+from database import ShardRouter, merge_newest_first
+from models import Incident, IncidentArchive, MetricRollup, MetricSample
+
+_SAMPLES, _DOWN, _MAINTENANCE, _INCIDENTS = range(4)
+
+
+class StatusTimeline:
+    """Per-day uptime and incident counts behind the public status page.
+
+    load() rebuilds the counters once from hourly rollups, the raw samples
+    since the last closed hour and the incident tables. After that every
+    sample and incident adds to today's counters, so producing the page never
+    scans history. Uptime is the share of sampled time that was not down,
+    with maintenance left out. Incidents are counted across every shard.
+    """
+
+    def __init__(self, shards: ShardRouter, days: int = 30, sample_interval: float = 3.0,
+                 recent_incidents: int = 5, refresh_interval: float = 60.0):
+        self.shards = shards
+        self.days = days
+        self.sample_interval = sample_interval
+        self.recent_limit = recent_incidents
+        self.refresh_interval = refresh_interval
+        self.status: Optional[str] = None  # latest local sample
+        self._counters: Dict[date, List[int]] = {}
+        self._recent: List[dict] = []
+        self._last_incident_ids: Dict[int, int] = {}  # newest local incident id per shard
+        self._last_refresh: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def _day(self, day: date) -> List[int]:
+        counters = self._counters.get(day)
+        if counters is None:
+            counters = self._counters[day] = [0, 0, 0, 0]
+            oldest = day - timedelta(days=self.days)
+            for stale in [d for d in self._counters if d <= oldest]:
+                del self._counters[stale]
+        return counters
+
+    def load(self, host: str = "local", now: Optional[datetime] = None):
+        """Rebuild the counters; blocking"""
+        now = now or datetime.utcnow()
+        since = datetime.combine(now.date() - timedelta(days=self.days - 1), datetime.min.time())
+        db = self.shards.session(self.shards.shard_for(host))
+        try:
+            rollups, samples = self._load_samples(db, host, now, since)
+        finally:
+            db.close()
+        incidents = self.shards.map(self._load_incidents, since)
+
+        counters: Dict[date, List[int]] = {}
+        for day, count, down, maintenance in rollups:
+            c = counters.setdefault(date.fromisoformat(day), [0, 0, 0, 0])
+            c[_SAMPLES] += count or 0
+            c[_DOWN] += down or 0
+            c[_MAINTENANCE] += maintenance or 0
+        for day, status, count in samples:
+            c = counters.setdefault(date.fromisoformat(day), [0, 0, 0, 0])
+            c[_SAMPLES] += count
+            if status == "down":
+                c[_DOWN] += count
+            elif status == "maintenance":
+                c[_MAINTENANCE] += count
+        for incident_days, _, _ in incidents:
+            for day, count in incident_days:
+                counters.setdefault(date.fromisoformat(day), [0, 0, 0, 0])[_INCIDENTS] += count
+        recent = merge_newest_first((rows for _, rows, _ in incidents),
+                                    key=lambda row: (row["timestamp"], row["id"]), limit=self.recent_limit)
+        with self._lock:
+            self._counters = counters
+            self._recent = recent
+            self._last_incident_ids = {shard: last_id for shard, (_, _, last_id) in enumerate(incidents)}
+
+    @staticmethod
+    def _load_samples(db: Session, host: str, now: datetime, since: datetime):
+        # Hourly rollups cover whole hours until raw samples take over; raw samples are kept for a day
+        cutoff = max(since, (now - timedelta(hours=23)).replace(minute=0, second=0, microsecond=0))
+        rollups = db.execute(
+            select(
+                func.date(MetricRollup.bucket_start),
+                func.sum(MetricRollup.sample_count),
+                func.sum(MetricRollup.down_samples),
+                func.sum(MetricRollup.maintenance_samples),
+            )
+            .where(
+                MetricRollup.host == host,
+                MetricRollup.resolution == 3600,
+                MetricRollup.bucket_start >= since,
+                MetricRollup.bucket_start < cutoff,
+            )
+            .group_by(func.date(MetricRollup.bucket_start))
+        ).all()
+        samples = db.execute(
+            select(func.date(MetricSample.timestamp), MetricSample.status, func.count())
+            .where(MetricSample.host == host, MetricSample.timestamp >= cutoff)
+            .group_by(func.date(MetricSample.timestamp), MetricSample.status)
+        ).all()
+        return rollups, samples
+
+    def _load_incidents(self, db: Session, shard: int, since: datetime):
+        """(incidents per day, newest incidents with global ids, newest local id) of one shard"""
+        incident_days = union_all(
+            select(Incident.timestamp.label("timestamp")).where(Incident.timestamp >= since),
+            select(IncidentArchive.timestamp).where(IncidentArchive.timestamp >= since),
+        ).subquery()
+        days = db.execute(
+            select(func.date(incident_days.c.timestamp), func.count())
+            .group_by(func.date(incident_days.c.timestamp))
+        ).all()
+        recent = [
+            dict(self._incident_row(incident), id=self.shards.global_id(shard, incident.id))
+            for incident in db.execute(
+                select(Incident).order_by(Incident.timestamp.desc(), Incident.id.desc()).limit(self.recent_limit)
+            ).scalars()
+        ]
+        last_id = db.execute(select(func.max(Incident.id))).scalar() or 0
+        return days, recent, last_id
+
+    @staticmethod
+    def _incident_row(incident) -> dict:
+        return {
+            "id": incident.id,
+            "timestamp": incident.timestamp,
+            "severity": incident.severity,
+            "message": incident.message,
+            "status": incident.status,
+            "occurrences": incident.occurrences,
+            "last_seen": incident.last_seen,
+            "resolved_at": incident.resolved_at,
+        }
+
+    def record_sample(self, metrics: dict) -> bool:
+        """Count one local sample; True when the page should be rebuilt
+        (status changed, a new day started or the refresh interval passed)"""
+        timestamp = metrics["timestamp"]
+        status = metrics["status"]
+        with self._lock:
+            day = timestamp.date()
+            new_day = day not in self._counters
+            counters = self._day(day)
+            counters[_SAMPLES] += 1
+            if status == "down":
+                counters[_DOWN] += 1
+            elif status == "maintenance":
+                counters[_MAINTENANCE] += 1
+            changed = status != self.status or new_day
+            self.status = status
+            if (changed or self._last_refresh is None
+                    or (timestamp - self._last_refresh).total_seconds() >= self.refresh_interval):
+                self._last_refresh = timestamp
+                return True
+            return False
+
+    def record_incident(self, incident):
+        """Count a new incident or update a recent one (any object with IncidentResponse fields)"""
+        row = self._incident_row(incident)
+        shard, local_id = self.shards.locate(row["id"])
+        with self._lock:
+            if local_id > self._last_incident_ids.get(shard, 0):
+                self._last_incident_ids[shard] = local_id
+                self._day(row["timestamp"].date())[_INCIDENTS] += 1
+            recent = [row] + [r for r in self._recent if r["id"] != row["id"]]
+            recent.sort(key=lambda r: (r["timestamp"], r["id"]), reverse=True)
+            self._recent = recent[:self.recent_limit]
+
+    def _uptime(self, samples: int, down: int, maintenance: int) -> Optional[float]:
+        counted = samples - maintenance
+        return round(100.0 * (counted - down) / counted, 3) if counted > 0 else None
+
+    def snapshot(self, now: Optional[datetime] = None) -> dict:
+        """Uptime, per-day rows (oldest first) and recent incidents as of now"""
+        today = (now or datetime.utcnow()).date()
+        minutes = self.sample_interval / 60
+        with self._lock:
+            rows = [
+                (today - timedelta(days=offset), self._counters.get(today - timedelta(days=offset), [0, 0, 0, 0]))
+                for offset in range(self.days - 1, -1, -1)
+            ]
+            recent = list(self._recent)
+        days = [
+            {
+                "date": day.isoformat(),
+                "uptime": self._uptime(*counters[:3]),
+                "down_minutes": round(counters[_DOWN] * minutes, 1),
+                "maintenance_minutes": round(counters[_MAINTENANCE] * minutes, 1),
+                "incidents": counters[_INCIDENTS],
+            }
+            for day, counters in rows
+        ]
+        uptime = {}
+        for label, span in (("today", 1), ("7d", 7), (f"{self.days}d", self.days)):
+            totals = [sum(counters[i] for _, counters in rows[-span:]) for i in (_SAMPLES, _DOWN, _MAINTENANCE)]
+            uptime[label] = self._uptime(*totals)
+        return {"status": self.status, "uptime": uptime, "days": days, "incidents": recent}
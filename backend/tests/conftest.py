@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# The app reads its configuration at import time: point it at throwaway state
+# before any test module imports database.py
+_workdir = tempfile.TemporaryDirectory(prefix="uptimeguard-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir.name, 'test.db')}"
+os.environ["MAINTENANCE_SIGNAL_FILE"] = os.path.join(_workdir.name, "maintenance")
+os.environ["RISK_MODEL_DIR"] = os.path.join(_workdir.name, "risk_models")
+os.environ["CLUSTER_LOCK_FILE"] = os.path.join(_workdir.name, "uptimeguard.leader")
+os.environ["MULTI_WORKER"] = "0"
+# One sample at startup and no more, so responses can be compared with the database
+os.environ["METRICS_SAMPLE_INTERVAL"] = "3600"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,205 @@
+"""The plain-row encoders and FAST_JSON must not change a single response byte.
+
+Every body is compared with what FastAPI sends for the endpoint's
+response_model: the model validated, run through jsonable_encoder and
+rendered by JSONResponse.
+"""
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from functools import partial
+
+import anyio.from_thread
+import httpx
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from schemas import IncidentResponse, MaintenanceResponse, MetricsResponse
+from services import fast_json
+from services.response_cache import response_cache
+
+INCIDENT_FIELDS = tuple(IncidentResponse.model_fields)
+MESSAGES = [
+    "Error rate spike detected: 12.50%",
+    "Überlast ✓ – 日本語 \"quoted\" \\ back\\slash\nnew line\ttab",
+    "🚨 <b>&amp;</b>   \x00",
+    "",
+]
+DATETIMES = [
+    datetime(2024, 1, 1),
+    datetime(2024, 1, 1, 12, 30, 45, 123456),
+    datetime(2024, 1, 1, 12, 30, 45, 5),
+    datetime(2024, 1, 1, tzinfo=timezone.utc),
+    datetime(2024, 6, 1, 8, 0, 0, 250000, tzinfo=timezone.utc),
+    datetime(2024, 6, 1, 8, 0, 0, 250000, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+    datetime(2024, 6, 1, 8, tzinfo=timezone(timedelta(hours=-3))),
+    datetime(2024, 6, 1, 8, tzinfo=timezone(timedelta(seconds=30))),
+]
+FLOATS = [0.0, -0.0, 1e-05, 0.0001, 0.1, 12.5, 97.123456789, 123456789.0, 9.999e15, 1e16, 1.5e16]
+
+
+def pydantic_body(model, data) -> bytes:
+    if isinstance(data, list):
+        return JSONResponse(jsonable_encoder([model.model_validate(item) for item in data])).body
+    return JSONResponse(jsonable_encoder(model.model_validate(data))).body
+
+
+@pytest.fixture(params=[False, True], ids=["FAST_JSON=0", "FAST_JSON=1"])
+def fast_json_mode(request, monkeypatch):
+    if request.param and fast_json.orjson is None:
+        pytest.skip("orjson is not installed")
+    monkeypatch.setattr(fast_json, "FAST_JSON", request.param)
+    # Bodies cached by an earlier test were encoded in the other mode
+    response_cache.clear()
+    return request.param
+
+
+class AppClient:
+    """Blocking calls into the in-process app, served like benchmarks/http_bench.py does"""
+
+    def __init__(self, portal, http: httpx.AsyncClient):
+        self.portal = portal
+        self.http = http
+
+    def get(self, path: str, **kwargs) -> httpx.Response:
+        return self.portal.call(partial(self.http.get, path, **kwargs))
+
+    def post(self, path: str, **kwargs) -> httpx.Response:
+        return self.portal.call(partial(self.http.post, path, **kwargs))
+
+
+@pytest.fixture(scope="module")
+def client():
+    from main import app
+    from routes.metrics_routes import sampler
+    with anyio.from_thread.start_blocking_portal() as portal:
+        lifespan = portal.wrap_async_context_manager(app.router.lifespan_context(app))
+        http = portal.wrap_async_context_manager(
+            httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test"))
+        with lifespan, http as http_client:
+            # Startup samples in the background; wait so it cannot add incidents mid-test
+            deadline = time.monotonic() + 10
+            while sampler.latest() is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            yield AppClient(portal, http_client)
+
+
+@pytest.fixture(scope="module")
+def incidents(client):
+    """Incidents with edge-case values, as IncidentResponse models newest first"""
+    from database import SessionLocal
+    from models import Incident
+    rng = random.Random(19)
+    start = datetime(2024, 3, 1, 9)
+    db = SessionLocal()
+    try:
+        for i in range(120):
+            # Whole seconds, microseconds and shared timestamps, so cursors break ties on the id
+            timestamp = start + timedelta(seconds=rng.randrange(600), microseconds=rng.choice([0, 0, 7, 999999]))
+            resolved = i % 3 == 0
+            db.add(Incident(
+                timestamp=timestamp,
+                severity=rng.choice(["low", "medium", "high", "critical"]),
+                message=MESSAGES[i % len(MESSAGES)] + f" #{i}",
+                status="resolved" if resolved else "active",
+                occurrences=rng.randint(1, 20),
+                last_seen=timestamp + timedelta(minutes=5) if i % 2 else None,
+                resolved_at=timestamp + timedelta(minutes=9, microseconds=1) if resolved else None,
+            ))
+        db.commit()
+        rows = db.query(Incident).order_by(Incident.timestamp.desc(), Incident.id.desc()).all()
+        models = [IncidentResponse.model_validate(row) for row in rows]
+    finally:
+        db.close()
+    response_cache.bump("incidents")
+    return models
+
+
+def test_incident_pages_match_pydantic(client, incidents, fast_json_mode):
+    cursor, offset = None, 0
+    while True:
+        response = client.get("/incidents", params={"limit": 25, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = incidents[offset:offset + 25]
+        assert response.content == JSONResponse(jsonable_encoder(page)).body
+        offset += len(page)
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert offset == len(incidents)
+
+
+def test_filtered_incidents_match_pydantic(client, incidents, fast_json_mode):
+    response = client.get("/incidents", params={"severity": ["high", "critical"], "limit": 500})
+    expected = [incident for incident in incidents if incident.severity in ("high", "critical")]
+    assert response.content == JSONResponse(jsonable_encoder(expected)).body
+
+
+@pytest.mark.parametrize("value", FLOATS)
+def test_live_metrics_match_pydantic(client, fast_json_mode, value):
+    from routes.metrics_routes import sampler
+    metrics = {"status": "operational", "cpu": value, "ram": 41.5, "response_time": 180,
+               "error_rate": value, "db_latency": 12.25, "timestamp": datetime(2024, 1, 1, 0, 0, 0, 120)}
+    # Followers record the leader's samples the same way, on the event loop
+    client.portal.call(sampler.record, metrics)
+    response = client.get("/metrics/live")
+    assert response.status_code == 200
+    assert response.content == pydantic_body(MetricsResponse, metrics)
+
+
+def test_maintenance_matches_pydantic(client, fast_json_mode):
+    from services.maintenance_cache import maintenance_cache
+    response = client.get("/maintenance")
+    assert response.content == pydantic_body(MaintenanceResponse, maintenance_cache.get()._asdict())
+
+    token = client.post("/auth/login", json={"email": "admin@uptimeguard.ai", "password": "admin123"}).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+    assert client.post("/maintenance/enable", json={"eta_minutes": 15}, headers=headers).status_code == 200
+    try:
+        response = client.get("/maintenance")
+        snapshot = maintenance_cache.get()
+        assert snapshot.enabled_at is not None
+        assert response.content == pydantic_body(MaintenanceResponse, snapshot._asdict())
+    finally:
+        client.post("/maintenance/disable", headers=headers)
+
+
+@pytest.mark.parametrize("message", MESSAGES)
+@pytest.mark.parametrize("timestamp", DATETIMES, ids=str)
+def test_row_encoder_matches_pydantic(fast_json_mode, timestamp, message):
+    rows = [
+        (1, timestamp, "high", message, "active", 1, None, None),
+        (2, timestamp, "low", message, "resolved", 4, timestamp + timedelta(microseconds=1), timestamp),
+    ]
+    data = [dict(zip(INCIDENT_FIELDS, row)) for row in rows]
+    assert fast_json.dumps(data) == pydantic_body(IncidentResponse, data)
+    assert fast_json.render_json(data) == pydantic_body(IncidentResponse, data)
+
+
+@pytest.mark.parametrize("value", FLOATS)
+def test_model_dump_encoder_matches_pydantic(fast_json_mode, value):
+    metrics = {"status": "degraded", "cpu": value, "ram": value, "response_time": 250, "error_rate": 0,
+               "db_latency": value, "timestamp": datetime(2024, 2, 29, 23, 59, 59, 999999)}
+    assert fast_json.dumps(MetricsResponse(**metrics).model_dump()) == pydantic_body(MetricsResponse, metrics)
+
+
+@pytest.mark.parametrize("maintenance", [
+    {"enabled": False, "eta_minutes": None, "enabled_at": None, "window_id": None},
+    {"enabled": True, "eta_minutes": 30, "enabled_at": datetime(2024, 5, 5, 5, 5, 5, 5), "window_id": 3},
+    {"enabled": True, "eta_minutes": 0, "enabled_at": datetime(2024, 5, 5, tzinfo=timezone.utc), "window_id": None},
+])
+def test_response_class_matches_json_response(fast_json_mode, maintenance):
+    """Endpoints that return dicts go through FastJSONResponse after FastAPI's own encoding"""
+    content = jsonable_encoder(MaintenanceResponse(**maintenance))
+    assert fast_json.FastJSONResponse(content).body == JSONResponse(content).body
+
+
+def test_plain_rows_take_the_orjson_path():
+    """Guard against the comparisons above only ever exercising the fallback encoder"""
+    row = dict(zip(INCIDENT_FIELDS, (1, datetime(2024, 1, 1, 0, 0, 0, 5), "high", MESSAGES[1], "active", 1,
+                                     None, datetime(2024, 1, 1, tzinfo=timezone.utc))))
+    metrics = MetricsResponse(status="operational", cpu=12.5, ram=0.1, response_time=180, error_rate=0.0,
+                              db_latency=97.123456789, timestamp=datetime(2024, 1, 1)).model_dump()
+    assert fast_json._orjson_compatible([row])
+    assert fast_json._orjson_compatible(metrics)
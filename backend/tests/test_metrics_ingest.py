@@ -0,0 +1,30 @@
+import asyncio
+
+from services.metrics_ingest import IngestBuffer
+
+
+def test_failed_writes_are_retried_in_order():
+    written, failures = [], {"left": 2}
+
+    def sink(batch):
+        if failures["left"]:
+            failures["left"] -= 1
+            raise RuntimeError("database is locked")
+        written.extend(batch)
+
+    async def scenario():
+        buffer = IngestBuffer(sink, capacity=10, flush_size=100, flush_interval=0.01)
+        assert buffer.offer([{"n": n} for n in range(6)])
+        assert not await buffer.flush()
+        # The kept batch still counts against capacity, so agents get a 429 instead of data loss
+        assert buffer.buffered == 6
+        assert not buffer.offer([{"n": 99}] * 5)
+        assert buffer.offer([{"n": 6}, {"n": 7}])
+        assert not await buffer.flush()
+        assert await buffer.flush()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert [sample["n"] for sample in written] == list(range(8))
+    assert buffer.write_failures == 2
+    assert buffer.buffered == 0
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, select
+
+from services.metrics_store import DEFAULT_RETENTION, choose_resolution
+
+NOW = datetime(2024, 3, 1, 12, 0)
+
+
+@pytest.mark.parametrize("days, step, expected", [
+    (1 / 24, 1, 0),     # raw samples are kept for a day
+    (5, 1, 60),         # raw samples are gone, minute rollups are not
+    (20, 60, 300),      # minute rollups are kept for 7 days
+    (60, 60, 3600),     # and 5m ones for 30
+    (1 / 24, 600, 300),
+])
+def test_resolution_covers_start(days, step, expected):
+    start = NOW - timedelta(days=days)
+    assert choose_resolution(start, NOW, step, NOW, DEFAULT_RETENTION, 10000) == expected
+
+
+def test_resolution_coarsens_to_stay_under_the_point_cap():
+    start = NOW - timedelta(days=2)
+    assert choose_resolution(start, NOW, 60, NOW, DEFAULT_RETENTION, 10000) == 60
+    assert choose_resolution(start, NOW, 60, NOW, DEFAULT_RETENTION, 500) == 3600
+
+
+def test_no_resolution_left():
+    with pytest.raises(ValueError):
+        choose_resolution(NOW - timedelta(days=400), NOW, 60, NOW, DEFAULT_RETENTION, 10000)
+    with pytest.raises(ValueError):
+        choose_resolution(NOW - timedelta(days=300), NOW, 60, NOW, DEFAULT_RETENTION, 100)
+
+
+def _sample(timestamp, cpu):
+    return dict(timestamp=timestamp, status="operational", cpu=cpu, ram=50.0, response_time=120.0,
+                error_rate=0.5, db_latency=20.0)
+
+
+def test_open_buckets_written_at_shutdown_merge_when_reopened():
+    from main import prepare_database
+    from database import shards
+    from models import MetricRollup, MetricSample
+    from services.metrics_store import MetricsStore
+
+    prepare_database()
+    host = "merge-test"
+    minute = datetime.utcnow().replace(minute=7, second=0, microsecond=0) - timedelta(hours=2)
+    first = [_sample(minute + timedelta(seconds=5), 10.0), _sample(minute + timedelta(seconds=15), 90.0)]
+    second = [_sample(minute + timedelta(seconds=25), 20.0), _sample(minute + timedelta(seconds=35), 30.0)]
+
+    def rollups():
+        with shards.session(shards.shard_for(host)) as db:
+            rows = db.execute(select(MetricRollup).where(MetricRollup.host == host)
+                              .order_by(MetricRollup.resolution)).scalars().all()
+            return [(r.resolution, r.sample_count, r.cpu_min, r.cpu_max, r.cpu_avg, r.cpu_p95) for r in rows]
+
+    try:
+        # Two restarts inside the same minute, so every bucket is written open, then reopened
+        for part in (first, second):
+            store = MetricsStore(shards, batch_size=1000, flush_interval=3600)
+            store.add_many(part, host=host)
+            store.flush(close_open=True)
+        merged = rollups()
+        assert [row[0] for row in merged] == [60, 300, 3600]
+        assert all(row[1:] == (4, 10.0, 90.0, 37.5, 90.0) for row in merged)
+    finally:
+        with shards.session(shards.shard_for(host)) as db:
+            db.execute(delete(MetricRollup).where(MetricRollup.host == host))
+            db.execute(delete(MetricSample).where(MetricSample.host == host))
+            db.commit()
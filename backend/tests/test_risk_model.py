@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete
+
+DEPLOYED_AT = datetime(2022, 5, 2, 10, 0)
+
+
+@pytest.fixture
+def db():
+    from main import prepare_database
+    from database import SessionLocal
+    prepare_database()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def test_archived_incidents_still_label_their_deploy(db):
+    from database import shards
+    from models import Incident, IncidentArchive, UpdateOutcome
+    from services.incident_engine import IncidentEngine
+    from services.risk_model import load_training_data
+    from services.risk_predictor import RiskPredictor
+
+    outcome = dict(update_type="major", services_affected="payments,api", db_migration=True,
+                   expected_minutes=20, description="Schema migration")
+    db.add_all([
+        UpdateOutcome(update_title="broke production", deployed_at=DEPLOYED_AT, **outcome),
+        UpdateOutcome(update_title="went fine", deployed_at=DEPLOYED_AT + timedelta(days=1), **outcome),
+    ])
+    db.add(Incident(timestamp=DEPLOYED_AT + timedelta(minutes=10), severity="critical", message="API down",
+                    status="resolved", resolved_at=DEPLOYED_AT + timedelta(minutes=40)))
+    db.commit()
+    try:
+        _, labels = load_training_data(db, RiskPredictor())
+        assert labels.tolist() == [1.0, 0.0]
+
+        # Only this incident is old enough for an engine living a day after the deploy
+        engine = IncidentEngine(clock=lambda: DEPLOYED_AT + timedelta(days=1))
+        assert engine.archive_resolved(shards, timedelta(hours=1)) == 1
+        assert db.query(Incident).filter(Incident.message == "API down").count() == 0
+
+        _, labels = load_training_data(db, RiskPredictor())
+        assert labels.tolist() == [1.0, 0.0]
+    finally:
+        db.execute(delete(UpdateOutcome).where(UpdateOutcome.deployed_at < DEPLOYED_AT + timedelta(days=2)))
+        db.execute(delete(IncidentArchive).where(IncidentArchive.message == "API down"))
+        db.execute(delete(Incident).where(Incident.message == "API down"))
+        db.commit()
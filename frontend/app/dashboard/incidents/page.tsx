@@ -1,7 +1,7 @@
 'use client';
 
 import { useState, useEffect } from 'react';
-import { getIncidents } from '@/lib/api';
+import { getIncidents, subscribeToEvents } from '@/lib/api';
 import IncidentTable from '@/components/IncidentTable';
 
 export default function IncidentsPage() {
@@ -10,8 +10,9 @@ export default function IncidentsPage() {
 
   useEffect(() => {
     loadIncidents();
-    const interval = setInterval(loadIncidents, 5000);
-    return () => clearInterval(interval);
+    return subscribeToEvents({
+      onIncident: (incident) => setIncidents((prev) => [incident, ...prev.filter((i: any) => i.id !== incident.id)] as any),
+    });
   }, []);
 
   const loadIncidents = async () => {
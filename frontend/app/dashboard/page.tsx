@@ -1,7 +1,7 @@
 'use client';
 
 import { useState, useEffect } from 'react';
-import { getLiveMetrics, getIncidents } from '@/lib/api';
+import { getLiveMetrics, getIncidents, subscribeToEvents } from '@/lib/api';
 import MetricCard from '@/components/MetricCard';
 import ChartPanel from '@/components/ChartPanel';
 import IncidentTable from '@/components/IncidentTable';
@@ -38,10 +38,26 @@ export default function DashboardPage() {
 
   useEffect(() => {
     loadData();
-    const interval = setInterval(loadData, 3000); // Poll every 3 seconds
-    return () => clearInterval(interval);
+    // Server pushes every new sample and incident, so no polling is needed
+    return subscribeToEvents({
+      onMetrics: applyMetrics,
+      onIncident: (incident) => setIncidents((prev) => [incident, ...prev.filter((i: any) => i.id !== incident.id)].slice(0, 10) as any),
+    });
   }, []);
 
+  const applyMetrics = (metricsData: Metrics) => {
+    setMetrics(metricsData);
+
+    // Update charts (keep last 30 readings)
+    const now = new Date().toISOString();
+    setChartData((prev) => ({
+      cpu: [...prev.cpu.slice(-29), { time: now, value: metricsData.cpu }],
+      ram: [...prev.ram.slice(-29), { time: now, value: metricsData.ram }],
+      responseTime: [...prev.responseTime.slice(-29), { time: now, value: metricsData.response_time }],
+      errorRate: [...prev.errorRate.slice(-29), { time: now, value: metricsData.error_rate }],
+    }));
+  };
+
   const loadData = async () => {
     try {
       const [metricsData, incidentsData] = await Promise.all([
@@ -49,17 +65,8 @@ export default function DashboardPage() {
         getIncidents(),
       ]);
 
-      setMetrics(metricsData);
+      applyMetrics(metricsData);
       setIncidents(incidentsData.slice(0, 10));
-
-      // Update charts (keep last 30 readings)
-      const now = new Date().toISOString();
-      setChartData((prev) => ({
-        cpu: [...prev.cpu.slice(-29), { time: now, value: metricsData.cpu }],
-        ram: [...prev.ram.slice(-29), { time: now, value: metricsData.ram }],
-        responseTime: [...prev.responseTime.slice(-29), { time: now, value: metricsData.response_time }],
-        errorRate: [...prev.errorRate.slice(-29), { time: now, value: metricsData.error_rate }],
-      }));
     } catch (error) {
       console.error('Failed to load data:', error);
     }
@@ -1,20 +1,27 @@
 'use client';
 
 import { useState, useEffect } from 'react';
-import { getLiveMetrics, getMaintenanceStatus, getIncidents } from '@/lib/api';
+import { getStatusPage, subscribeToEvents } from '@/lib/api';
 
 export default function StatusPage() {
+  const [page, setPage] = useState<any>(null);
   const [status, setStatus] = useState<any>(null);
-  const [maintenance, setMaintenance] = useState<any>(null);
-  const [incidents, setIncidents] = useState([]);
   const [timeRemaining, setTimeRemaining] = useState(0);
 
   useEffect(() => {
     loadStatus();
-    const interval = setInterval(loadStatus, 3000);
-    return () => clearInterval(interval);
+    // The page document is rebuilt server-side on every change and revalidated with its ETag,
+    // so refetching it on maintenance and incident events is cheap
+    return subscribeToEvents({
+      onMetrics: setStatus,
+      onMaintenance: () => loadStatus(),
+      onIncident: () => loadStatus(),
+    });
   }, []);
 
+  const maintenance = page?.maintenance;
+  const incidents = page?.incidents ?? [];
+
   useEffect(() => {
     if (maintenance?.enabled && maintenance?.enabled_at) {
       const calculateTimeRemaining = () => {
@@ -26,30 +33,33 @@ export default function StatusPage() {
       };
 
       calculateTimeRemaining();
-      const timer = setInterval(calculateTimeRemaining, 1000);
+      // The ETA is shown in whole minutes
+      const timer = setInterval(calculateTimeRemaining, 15000);
       return () => clearInterval(timer);
     }
   }, [maintenance]);
 
   const loadStatus = async () => {
     try {
-      const [metrics, maintenanceData, incidentsData] = await Promise.all([
-        getLiveMetrics(),
-        getMaintenanceStatus(),
-        getIncidents(),
-      ]);
-      setStatus(metrics);
-      setMaintenance(maintenanceData);
-      setIncidents(incidentsData.slice(0, 5));
+      const data = await getStatusPage();
+      setPage(data);
+      setStatus((prev: any) => prev ?? (data.status ? { status: data.status, timestamp: data.generated_at } : null));
     } catch (error: any) {
       console.error('Failed to load status:', error);
-      // Don't set status to null on error, keep showing loading or error state
-      if (!status) {
-        // Only show error on first load
-      }
+      // Keep showing the last document (or the loading state) on error
     }
   };
 
+  const getUptimeColor = (uptime: number | null) => {
+    if (uptime === null) return 'bg-gray-200';
+    if (uptime >= 99.9) return 'bg-green-500';
+    if (uptime >= 99) return 'bg-yellow-400';
+    return 'bg-red-500';
+  };
+
+  const formatWindow = (window: any) =>
+    `${new Date(window.starts_at).toLocaleString()} – ${new Date(window.ends_at).toLocaleTimeString()}`;
+
   const getStatusColor = (status: string) => {
     switch (status) {
       case 'operational':
@@ -80,7 +90,7 @@ export default function StatusPage() {
     }
   };
 
-  if (!status) {
+  if (!page || !status) {
     return (
       <div className="min-h-screen bg-gradient-to-br from-blue-50 to-indigo-100 flex items-center justify-center">
         <div className="text-center">
@@ -147,6 +157,57 @@ export default function StatusPage() {
           )}
         </div>
 
+        {/* Uptime */}
+        <div className="bg-white rounded-2xl shadow-xl p-8 mb-8">
+          <div className="flex items-baseline justify-between mb-6">
+            <h3 className="text-2xl font-bold text-gray-800">Uptime</h3>
+            <div className="flex gap-4 text-sm text-gray-600">
+              {Object.entries(page.uptime).map(([label, value]: [string, any]) => (
+                <span key={label}>
+                  {label}: <span className="font-semibold">{value === null ? '—' : `${value.toFixed(2)}%`}</span>
+                </span>
+              ))}
+            </div>
+          </div>
+          <div className="flex gap-1 h-10">
+            {page.days.map((day: any) => (
+              <div
+                key={day.date}
+                className={`flex-1 rounded ${getUptimeColor(day.uptime)}`}
+                title={`${day.date}: ${day.uptime === null ? 'no data' : `${day.uptime}% uptime`}, ${day.incidents} incident(s), ${day.maintenance_minutes} min maintenance`}
+              ></div>
+            ))}
+          </div>
+          <div className="flex justify-between text-xs text-gray-400 mt-2">
+            <span>{page.days.length} days ago</span>
+            <span>Today</span>
+          </div>
+        </div>
+
+        {/* Scheduled Maintenance */}
+        {(page.windows.upcoming.length > 0 || page.windows.past.length > 0) && (
+          <div className="bg-white rounded-2xl shadow-xl p-8 mb-8">
+            <h3 className="text-2xl font-bold text-gray-800 mb-6">Scheduled Maintenance</h3>
+            {[...page.windows.active, ...page.windows.upcoming].map((window: any) => (
+              <div key={`${window.window_id}-${window.starts_at}`} className="flex justify-between p-3 mb-2 bg-blue-50 rounded-lg">
+                <span className="text-gray-800">{window.title}</span>
+                <span className="text-sm text-gray-600">{formatWindow(window)}</span>
+              </div>
+            ))}
+            {page.windows.past.length > 0 && (
+              <>
+                <h4 className="text-sm font-semibold text-gray-500 mt-4 mb-2">Completed</h4>
+                {page.windows.past.map((window: any) => (
+                  <div key={`${window.window_id}-${window.starts_at}`} className="flex justify-between p-3 mb-2 text-gray-500">
+                    <span>{window.title}</span>
+                    <span className="text-sm">{formatWindow(window)}</span>
+                  </div>
+                ))}
+              </>
+            )}
+          </div>
+        )}
+
         {/* Recent Incidents */}
         <div className="bg-white rounded-2xl shadow-xl p-8">
           <h3 className="text-2xl font-bold text-gray-800 mb-6">Recent Incidents</h3>
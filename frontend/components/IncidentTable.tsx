@@ -6,6 +6,7 @@ interface Incident {
   severity: string;
   message: string;
   status: string;
+  occurrences?: number;
 }
 
 interface IncidentTableProps {
@@ -60,7 +61,12 @@ export default function IncidentTable({ incidents }: IncidentTableProps) {
                       {incident.severity}
                     </span>
                   </td>
-                  <td className="px-6 py-4 text-sm text-gray-700">{incident.message}</td>
+                  <td className="px-6 py-4 text-sm text-gray-700">
+                    {incident.message}
+                    {(incident.occurrences ?? 1) > 1 && (
+                      <span className="ml-2 text-xs text-gray-500">×{incident.occurrences}</span>
+                    )}
+                  </td>
                   <td className="px-6 py-4 whitespace-nowrap">
                     <span className={`px-2 py-1 text-xs font-semibold rounded-full ${
                       incident.status === 'active' 
@@ -1,17 +1,75 @@
 'use client';
 
 import { useState, useEffect } from 'react';
-import { getMaintenanceStatus, enableMaintenance, disableMaintenance } from '@/lib/api';
+import {
+  getMaintenanceStatus,
+  enableMaintenance,
+  disableMaintenance,
+  getMaintenanceWindows,
+  createMaintenanceWindow,
+  deleteMaintenanceWindow,
+} from '@/lib/api';
 
 export default function MaintenanceControl() {
   const [maintenance, setMaintenance] = useState<any>(null);
   const [etaMinutes, setEtaMinutes] = useState(10);
   const [loading, setLoading] = useState(false);
+  const [windows, setWindows] = useState<any[]>([]);
+  const [windowTitle, setWindowTitle] = useState('');
+  const [windowStart, setWindowStart] = useState('');
+  const [windowMinutes, setWindowMinutes] = useState(30);
+  const [recurrence, setRecurrence] = useState<'none' | 'daily' | 'weekly'>('none');
 
   useEffect(() => {
     loadMaintenanceStatus();
+    loadWindows();
   }, []);
 
+  const loadWindows = async () => {
+    try {
+      setWindows(await getMaintenanceWindows());
+    } catch (error) {
+      console.error('Failed to load maintenance windows:', error);
+    }
+  };
+
+  const handleSchedule = async () => {
+    if (!windowTitle || !windowStart) {
+      alert('Enter a title and a start time');
+      return;
+    }
+    setLoading(true);
+    try {
+      await createMaintenanceWindow({
+        title: windowTitle,
+        starts_at: new Date(windowStart).toISOString(),
+        duration_minutes: windowMinutes,
+        recurrence,
+      });
+      setWindowTitle('');
+      await loadWindows();
+    } catch (error: any) {
+      console.error('Failed to schedule maintenance:', error);
+      alert(error.response?.data?.detail || 'Failed to schedule maintenance');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  const handleDeleteWindow = async (id: number) => {
+    setLoading(true);
+    try {
+      await deleteMaintenanceWindow(id);
+      await loadWindows();
+      await loadMaintenanceStatus();
+    } catch (error) {
+      console.error('Failed to delete maintenance window:', error);
+      alert('Failed to delete maintenance window');
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const loadMaintenanceStatus = async () => {
     try {
       const status = await getMaintenanceStatus();
@@ -104,6 +162,76 @@ export default function MaintenanceControl() {
           </button>
         </div>
       </div>
+
+      <div className="mt-8 pt-6 border-t border-gray-200">
+        <h4 className="text-md font-semibold text-gray-800 mb-4">Scheduled Windows</h4>
+        <p className="text-sm text-gray-600 mb-4">
+          Maintenance is switched on and off automatically for each window.
+        </p>
+        <div className="grid grid-cols-2 gap-3 mb-3">
+          <input
+            type="text"
+            placeholder="Title"
+            value={windowTitle}
+            onChange={(e) => setWindowTitle(e.target.value)}
+            className="col-span-2 px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent"
+          />
+          <input
+            type="datetime-local"
+            value={windowStart}
+            onChange={(e) => setWindowStart(e.target.value)}
+            className="px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent"
+          />
+          <input
+            type="number"
+            value={windowMinutes}
+            onChange={(e) => setWindowMinutes(parseInt(e.target.value) || 0)}
+            className="px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent"
+            min="1"
+            title="Duration (minutes)"
+          />
+          <select
+            value={recurrence}
+            onChange={(e) => setRecurrence(e.target.value as 'none' | 'daily' | 'weekly')}
+            className="px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent"
+          >
+            <option value="none">Once</option>
+            <option value="daily">Daily</option>
+            <option value="weekly">Weekly</option>
+          </select>
+          <button
+            onClick={handleSchedule}
+            disabled={loading}
+            className="px-4 py-2 bg-blue-500 text-white rounded-lg hover:bg-blue-600 disabled:bg-gray-300 disabled:cursor-not-allowed transition-colors"
+          >
+            Schedule
+          </button>
+        </div>
+        {windows.length === 0 ? (
+          <p className="text-sm text-gray-500">No scheduled windows</p>
+        ) : (
+          <ul className="space-y-2">
+            {windows.map((window: any) => (
+              <li key={window.id} className="flex items-center justify-between p-3 bg-gray-50 rounded-lg">
+                <div>
+                  <p className="text-sm font-medium text-gray-800">{window.title}</p>
+                  <p className="text-xs text-gray-600">
+                    {window.next_start ? `Next: ${new Date(window.next_start).toLocaleString()}` : 'Finished'}
+                    {' · '}{window.duration_minutes} min{window.recurrence !== 'none' && ` · ${window.recurrence}`}
+                  </p>
+                </div>
+                <button
+                  onClick={() => handleDeleteWindow(window.id)}
+                  disabled={loading}
+                  className="text-sm text-red-600 hover:text-red-800 disabled:text-gray-300"
+                >
+                  Delete
+                </button>
+              </li>
+            ))}
+          </ul>
+        )}
+      </div>
     </div>
   );
 }
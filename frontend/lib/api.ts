@@ -32,6 +32,26 @@ export const getLiveMetrics = async () => {
   return response.data;
 };
 
+// Live event stream: pushes metrics samples, new incidents and maintenance changes
+type StreamHandler = (data: any) => void;
+
+export const subscribeToEvents = (handlers: {
+  onMetrics?: StreamHandler;
+  onIncident?: StreamHandler;
+  onMaintenance?: StreamHandler;
+}) => {
+  const source = new EventSource(`${API_BASE_URL}/metrics/stream`);
+  const listen = (event: string, handler?: StreamHandler) => {
+    if (handler) {
+      source.addEventListener(event, (e) => handler(JSON.parse((e as MessageEvent).data)));
+    }
+  };
+  listen('metrics', handlers.onMetrics);
+  listen('incident', handlers.onIncident);
+  listen('maintenance', handlers.onMaintenance);
+  return () => source.close();
+};
+
 // Incidents
 export const getIncidents = async () => {
   const response = await api.get('/incidents');
@@ -59,15 +79,53 @@ export const disableMaintenance = async () => {
   return response.data;
 };
 
+export interface MaintenanceWindowInput {
+  title: string;
+  starts_at: string; // ISO 8601
+  duration_minutes: number;
+  recurrence: 'none' | 'daily' | 'weekly';
+  repeat_every?: number;
+  ends_on?: string | null;
+}
+
+export const getMaintenanceWindows = async () => {
+  const response = await api.get('/maintenance/windows');
+  return response.data;
+};
+
+export const createMaintenanceWindow = async (data: MaintenanceWindowInput) => {
+  const response = await api.post('/maintenance/windows', data);
+  return response.data;
+};
+
+export const deleteMaintenanceWindow = async (id: number) => {
+  const response = await api.delete(`/maintenance/windows/${id}`);
+  return response.data;
+};
+
+// Status page: status, uptime per day, maintenance windows and recent incidents in one cached document
+export const getStatusPage = async () => {
+  const response = await api.get('/status');
+  return response.data;
+};
+
 // Prediction
-export const predictUpdateRisk = async (data: {
+export interface UpdateRiskInput {
   update_title: string;
   update_type: string;
   services_affected: string[];
   db_migration: boolean;
   expected_minutes: number;
   description: string;
-}) => {
+}
+
+export const predictUpdateRisk = async (data: UpdateRiskInput) => {
   const response = await api.post('/predict/update-risk', data);
   return response.data;
 };
+
+// Scores a whole release train in one request; results keep the input order
+export const predictUpdateRiskBatch = async (updates: UpdateRiskInput[]) => {
+  const response = await api.post('/predict/update-risk/batch', updates);
+  return response.data;
+};